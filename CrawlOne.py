@@ -10,7 +10,10 @@ from pathlib import Path
 
 import requests
 
+from crawl_profile import CrawlProfiler
 from crawler_core import CrawlerConfig, ForumCrawler, sanitize_name
+from CrawlSHT import finish_profile
+from output_sink import OUTPUT_FORMATS, OUTPUT_SUFFIXES, open_output_sink, thread_record
 
 def parse_args():
     """
@@ -23,20 +26,28 @@ def parse_args():
     parser.add_argument('--image-cookie', default=os.environ.get("CRAWLER_IMAGE_COOKIE"), help='下载图片使用的Cookie')
     parser.add_argument('--save-images', action='store_true', help='是否保存图片')
     parser.add_argument('--output-file', default=None, help='磁力链接输出文件路径')
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='text',
+                        help='输出格式：text 每行一个磁力链接（默认）；jsonl/parquet 输出包含地址、标题、图片数的结构化记录')
     parser.add_argument('--image-dir', default=None, help='图片保存目录')
+    parser.add_argument('--profile', action='store_true',
+                        help='性能分析：记录连接、首字节、下载、解析、提取、图片下载和写文件耗时，导出 Chrome trace 时间线')
+    parser.add_argument('--profile-output', default=None,
+                        help='时间线文件路径（默认 data/profile_<时间戳>.trace.json）')
+    parser.add_argument('--cprofile', default=None, metavar='PATH', help='同时用 cProfile 分析并把统计写入 PATH')
     return parser.parse_args()
 
 
 def parse_content(crawler: ForumCrawler, url: str, *, save_images=False, image_dir=None):
     """
-    通过共享crawler抓取磁力链接并可选保存图片。
+    通过共享crawler抓取磁力链接并可选保存图片，返回 (磁力链接列表, 帖子详情)。
     """
     print(f"\n正在爬取网址: {url}")
     try:
-        magnets, image_urls, soup = crawler.fetch_thread_details(url)
+        details = crawler.fetch_thread_details(url)
     except requests.RequestException as exc:
         print(f"ERROR: 无法访问网页: {exc}")
-        return []
+        return [], None
+    magnets, image_urls = details.magnets, details.image_urls
 
     if magnets:
         print(f"\n===== 提取磁力链接（{len(magnets)} 条）=====")
@@ -52,7 +63,7 @@ def parse_content(crawler: ForumCrawler, url: str, *, save_images=False, image_d
 
         if image_dir is None:
             now = datetime.datetime.now().strftime("%Y_%m_%d_%H_%M_%S")
-            title = soup.title.text if soup.title else "thread"
+            title = details.title or "thread"
             image_dir = Path("data/figures") / f"{sanitize_name(title)}_{now}"
         else:
             image_dir = Path(image_dir)
@@ -66,12 +77,12 @@ def parse_content(crawler: ForumCrawler, url: str, *, save_images=False, image_d
     elif save_images:
         print("\n未找到可下载的图片")
 
-    return magnets
+    return list(magnets), details
 
 
-def save_magnet_links(magnet_links, output_file=None):
+def save_magnet_links(magnet_links, output_file=None, output_format='text', details=None, profiler=None):
     """
-    保存磁力链接到文件
+    保存磁力链接到文件；非 text 格式写入一条带帖子信息的结构化记录
     """
     if not magnet_links:
         return
@@ -80,17 +91,19 @@ def save_magnet_links(magnet_links, output_file=None):
         # 使用当前时间创建文件名
         now = datetime.datetime.now()
         formatted_datetime = now.strftime("%Y_%m_%d_%H_%M_%S")
-        output_file = f"data/magnet_file_{formatted_datetime}.txt"
-    
-    # 确保输出目录存在
-    output_dir = os.path.dirname(output_file)
-    if output_dir and not os.path.exists(output_dir):
-        os.makedirs(output_dir)
+        prefix = 'magnet_file' if output_format == 'text' else 'records'
+        output_file = f"data/{prefix}_{formatted_datetime}{OUTPUT_SUFFIXES[output_format]}"
     
+    if details is not None:
+        record = thread_record(
+            details.url, title=details.title, magnets=magnet_links,
+            image_count=len(details.image_urls), fetch_seconds=details.fetch_seconds,
+        )
+    else:
+        record = thread_record('', magnets=magnet_links)
     try:
-        with open(output_file, 'w', encoding='utf-8') as f:
-            for magnet_link in magnet_links:
-                f.write(magnet_link + '\n')
+        with open_output_sink(output_file, output_format, profiler=profiler) as sink:
+            sink.write(record)
         print(f"\n磁力链接已保存到: {output_file}")
     except Exception as e:
         print(f"ERROR: 保存磁力链接失败: {str(e)}")
@@ -110,9 +123,14 @@ def main():
         image_cookie=args.image_cookie,
     )
     crawler = ForumCrawler(config)
+    profiler = CrawlProfiler() if args.profile or args.cprofile else None
+    if profiler is not None:
+        crawler.attach_profiler(profiler)
+        if args.cprofile:
+            profiler.start_cprofile()
 
     # 爬取内容
-    magnet_links = parse_content(
+    magnet_links, details = parse_content(
         crawler,
         url=args.url,
         save_images=args.save_images,
@@ -120,7 +138,7 @@ def main():
     )
 
     # 保存磁力链接
-    save_magnet_links(magnet_links, args.output_file)
+    save_magnet_links(magnet_links, args.output_file, args.format, details, profiler)
     
     print(f"\n===== 爬取完成 =====")
     print(f"磁力链接数量: {len(magnet_links)}")
@@ -128,6 +146,10 @@ def main():
         print("图片保存: 已启用")
     else:
         print("图片保存: 未启用")
+    if profiler is not None:
+        now = datetime.datetime.now().strftime("%Y_%m_%d_%H_%M_%S")
+        trace_path = Path(args.profile_output or f"data/profile_{now}.trace.json")
+        finish_profile(profiler, trace_path, args.cprofile)
 
 
 if __name__ == '__main__':
@@ -4,15 +4,41 @@
 from __future__ import annotations
 
 import argparse
+import asyncio
 import datetime
+import json
+import multiprocessing
 import os
+import socket
 import time
+from contextlib import closing
 from pathlib import Path
 from typing import Iterable
 
 import requests
 
-from crawler_core import CrawlerConfig, ForumCrawler, sanitize_name
+from crawler_core import PARSER_BACKENDS, AsyncForumCrawler, CrawlerConfig, ForumCrawler, sanitize_name
+from checkpoint import CrawlCheckpoint, latest_checkpoint
+from crawl_profile import CrawlProfiler
+from image_filter import DEFAULT_IMAGE_DENY_PATTERNS
+from magnet_store import DEFAULT_MAGNET_INDEX_PATH, MagnetDedupStore
+from output_sink import OUTPUT_FORMATS, OUTPUT_SUFFIXES, OutputSink, open_output_sink, thread_record
+from thread_index import DEFAULT_INDEX_PATH, ThreadIndex
+from work_queue import DEFAULT_QUEUE_PATH, Lease, WorkQueue, open_work_queue
+
+# options the async engine does not implement (no retries or circuit breaker,
+# page cache, image store, checkpoints, or requests transport tuning)
+THREAD_ENGINE_OPTIONS = (
+    "--incremental",
+    "--max-retries",
+    "--cache-dir",
+    "--cache-ttl",
+    "--image-store",
+    "--checkpoint",
+    "--http2",
+    "--pool-size",
+    "--no-compress",
+)
 
 
 def build_parser() -> argparse.ArgumentParser:
@@ -28,6 +54,32 @@ def build_parser() -> argparse.ArgumentParser:
         help="下载图片时使用的Cookie",
     )
     parser.add_argument("--output", help="磁力链接输出文件路径")
+    parser.add_argument(
+        "--format",
+        choices=OUTPUT_FORMATS,
+        default="text",
+        help="输出格式：text 每行一个磁力链接（默认）；jsonl 每个帖子一条记录（地址、标题、磁力链接、图片数、抓取耗时）；"
+        "parquet 同 jsonl 的列式文件（需要 pyarrow）",
+    )
+    parser.add_argument(
+        "--metrics-output",
+        default=None,
+        help="爬取结束时写入的指标摘要 JSON（请求耗时分布、字节数、状态码、解析耗时等），默认与输出文件同名的 .metrics.json",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="性能分析：记录每个帖子的连接、首字节、下载、解析、提取、图片下载和写文件耗时，"
+        "导出 Chrome trace 时间线（默认与输出文件同名的 .trace.json）",
+    )
+    parser.add_argument("--profile-output", default=None, help="--profile 时间线文件路径")
+    parser.add_argument(
+        "--cprofile",
+        default=None,
+        metavar="PATH",
+        help="同时用 cProfile 分析主线程并把统计写入 PATH（python -m pstats 查看）；"
+        "--concurrency 1 时抓取和解析都在主线程中",
+    )
     parser.add_argument(
         "--save-images",
         action="store_true",
@@ -38,93 +90,836 @@ def build_parser() -> argparse.ArgumentParser:
         default="data/figures",
         help="保存图片的根目录（仅在 --save-images 开启时使用）",
     )
+    parser.add_argument(
+        "--image-store",
+        default=None,
+        help="按内容哈希去重的图片仓库目录（如 data/figures/_blobs），帖子目录中保存硬链接",
+    )
+    parser.add_argument(
+        "--image-min-size",
+        type=parse_image_size,
+        default=None,
+        metavar="WxH",
+        help="跳过宽或高小于该尺寸的图片（如 200x200），先用 Range 请求读取文件头判断尺寸，不下载整张图",
+    )
+    parser.add_argument(
+        "--image-min-bytes",
+        type=int,
+        default=0,
+        help="跳过小于该字节数的图片（依据 Content-Length）",
+    )
+    parser.add_argument(
+        "--image-max-bytes",
+        type=int,
+        default=None,
+        help="跳过大于该字节数的图片（依据 Content-Length）",
+    )
+    parser.add_argument(
+        "--image-deny",
+        action="append",
+        default=[],
+        metavar="PATTERN",
+        help="图片地址匹配该正则时跳过，可重复；默认已跳过表情、头像、主题图标等站点静态图片",
+    )
+    parser.add_argument(
+        "--no-default-image-deny",
+        action="store_true",
+        help="不使用默认的静态图片过滤规则，只应用 --image-deny",
+    )
     parser.add_argument(
         "--delay",
         type=float,
-        default=1.0,
-        help="每个页面之间的延迟，单位秒",
+        default=0.0,
+        help="每个页面之间额外的固定延迟，单位秒（默认 0，请求节奏由自适应限速控制）",
+    )
+    parser.add_argument(
+        "--rate-limit",
+        type=float,
+        default=4.0,
+        help="每个主机的初始请求速率（次/秒），随响应延迟和 429/503 自动调整；0 表示不限速",
+    )
+    parser.add_argument(
+        "--max-rate",
+        type=float,
+        default=32.0,
+        help="自适应限速允许提升到的最高速率（次/秒）",
+    )
+    parser.add_argument(
+        "--parse-workers",
+        type=int,
+        default=0,
+        help="解析帖子 HTML 的进程数，可利用多核（0 表示在抓取线程中直接解析）",
+    )
+    parser.add_argument(
+        "--max-retries",
+        type=int,
+        default=3,
+        help="连接重置、超时、429/5xx 等临时错误的最大重试次数（指数退避加随机抖动）",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=4,
+        help="同时抓取帖子详情的线程数（1 表示顺序抓取）",
+    )
+    parser.add_argument(
+        "--image-workers",
+        type=int,
+        default=4,
+        help="单个帖子内并行下载图片的线程数",
+    )
+    parser.add_argument(
+        "--pool-size",
+        type=int,
+        default=0,
+        help="每个主机保持的空闲连接数（0 表示按 --concurrency/--image-workers 自动设置）",
+    )
+    parser.add_argument(
+        "--dns-cache-ttl",
+        type=float,
+        default=300.0,
+        help="DNS 解析结果缓存秒数（0 表示不缓存）",
+    )
+    parser.add_argument(
+        "--no-compress",
+        action="store_true",
+        help="不请求 gzip/deflate 压缩的页面响应",
+    )
+    parser.add_argument(
+        "--http2",
+        action="store_true",
+        help='使用 HTTP/2 多路复用连接（需要 pip install "httpx[http2]"）',
+    )
+    parser.add_argument(
+        "--parser",
+        choices=PARSER_BACKENDS,
+        default="lxml",
+        help="HTML 解析后端：soup 完整解析，strainer 只解析所需标签，lxml 直接使用 XPath（最快）",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=None,
+        help="帖子页面磁盘缓存目录（如 data/http_cache），不设置则不缓存",
+    )
+    parser.add_argument(
+        "--cache-ttl",
+        type=float,
+        default=None,
+        help="缓存有效期（秒），期内直接使用缓存；过期后通过 ETag/Last-Modified 条件请求校验",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="增量模式：跳过索引中已爬取的帖子，某页全部为已知帖子时停止翻页（仅 thread 引擎）",
+    )
+    parser.add_argument(
+        "--index-path",
+        default=DEFAULT_INDEX_PATH,
+        help="已爬取帖子索引（SQLite）的路径",
+    )
+    parser.add_argument(
+        "--dedup-index",
+        default=DEFAULT_MAGNET_INDEX_PATH,
+        help="按 info-hash 去重的磁力索引文件路径（跨多次运行生效）",
     )
+    parser.add_argument(
+        "--no-dedup",
+        action="store_true",
+        help="关闭磁力链接去重，原样写出所有磁力链接",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        default=None,
+        help="检查点文件路径（默认 data/checkpoint_<时间戳>.json），记录翻页进度、待处理帖子和输出偏移",
+    )
+    parser.add_argument(
+        "--resume",
+        nargs="?",
+        const="latest",
+        default=None,
+        metavar="CHECKPOINT",
+        help="从检查点恢复中断的爬取，沿用原来的参数和输出文件；不带路径时使用 data/ 下最新的未完成检查点",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=("thread", "async"),
+        default="thread",
+        help="抓取引擎：thread 使用线程池，async 使用 asyncio（需要 aiohttp）",
+    )
+    parser.add_argument(
+        "--max-connections",
+        type=int,
+        default=100,
+        help="async 引擎的总并发连接上限",
+    )
+    parser.add_argument(
+        "--per-host-connections",
+        type=int,
+        default=10,
+        help="async 引擎对单个主机的并发连接上限",
+    )
+    parser.add_argument(
+        "--role",
+        choices=("standalone", "coordinator", "worker"),
+        default="standalone",
+        help="分布式模式：coordinator 把论坛页写入共享队列并汇总结果，worker 从队列领取任务抓取",
+    )
+    parser.add_argument(
+        "--queue",
+        default=DEFAULT_QUEUE_PATH,
+        help="共享任务队列：SQLite 文件路径或 redis://host:6379/0",
+    )
+    parser.add_argument(
+        "--local-workers",
+        type=int,
+        default=0,
+        help="coordinator 在本机额外启动的 worker 进程数",
+    )
+    parser.add_argument(
+        "--lease-timeout",
+        type=float,
+        default=300.0,
+        help="worker 领取任务后的租约时长（秒），超时未确认的任务重新入队",
+    )
+    parser.add_argument(
+        "--max-attempts",
+        type=int,
+        default=3,
+        help="任务失败后最多尝试的次数，超过后记为失败",
+    )
+    parser.add_argument("--worker-id", default=None, help="worker 标识（默认 主机名-进程号）")
     return parser
 
 
-def resolve_output_path(output: str | None) -> Path:
+def resolve_output_path(output: str | None, output_format: str = "text") -> Path:
     if output:
         path = Path(output)
     else:
         timestamp = datetime.datetime.now().strftime("%Y_%m_%d_%H_%M_%S")
-        path = Path("data") / f"magnet_file_{timestamp}.txt"
+        prefix = "magnet_file" if output_format == "text" else "records"
+        path = Path("data") / f"{prefix}_{timestamp}{OUTPUT_SUFFIXES[output_format]}"
     path.parent.mkdir(parents=True, exist_ok=True)
     return path
 
 
-def crawl_forum(args: argparse.Namespace) -> None:
-    config = CrawlerConfig(
+def parse_image_size(value: str) -> tuple[int, int]:
+    width, sep, height = value.lower().partition("x")
+    if not sep or not width.isdigit() or not height.isdigit():
+        raise argparse.ArgumentTypeError(f"图片尺寸格式应为 宽x高，如 200x200: {value}")
+    return int(width), int(height)
+
+
+def build_config(args: argparse.Namespace) -> CrawlerConfig:
+    min_width, min_height = args.image_min_size or (0, 0)
+    deny_patterns = () if args.no_default_image_deny else DEFAULT_IMAGE_DENY_PATTERNS
+    return CrawlerConfig(
         base_url=args.base_url.rstrip("/"),
         cookie=args.cookie,
         image_cookie=args.image_cookie,
+        concurrency=max(1, args.concurrency),
+        image_workers=max(1, args.image_workers),
+        parser_backend=args.parser,
+        cache_dir=args.cache_dir,
+        cache_ttl=args.cache_ttl,
+        image_store_dir=args.image_store if args.save_images else None,
+        rate_limit=args.rate_limit,
+        max_rate=args.max_rate,
+        max_retries=max(0, args.max_retries),
+        parse_workers=max(0, args.parse_workers),
+        image_deny_patterns=(*deny_patterns, *args.image_deny),
+        image_min_bytes=max(0, args.image_min_bytes),
+        image_max_bytes=args.image_max_bytes,
+        image_min_width=min_width,
+        image_min_height=min_height,
+        pool_maxsize=max(0, args.pool_size),
+        dns_cache_ttl=max(0.0, args.dns_cache_ttl),
+        compress=not args.no_compress,
+        http2=args.http2,
     )
-    crawler = ForumCrawler(config)
-    output_path = resolve_output_path(args.output)
-    image_root = None
+
+
+def resolve_image_root(args: argparse.Namespace) -> Path | None:
+    if not args.save_images:
+        return None
+    timestamp = datetime.datetime.now().strftime("%Y_%m_%d_%H_%M_%S")
+    image_root = Path(args.figures_dir) / f"forum_{args.forum_id}_{timestamp}"
+    image_root.mkdir(parents=True, exist_ok=True)
+    return image_root
+
+
+def print_summary(
+    args: argparse.Namespace,
+    total_magnets: int,
+    total_images: int,
+    image_root,
+    output_path,
+    cache_stats: dict[str, int] | None = None,
+    duplicates: int | None = None,
+    image_store_stats: dict[str, int] | None = None,
+    rate_stats: dict[str, dict[str, float]] | None = None,
+    retry_stats: dict[str, int] | None = None,
+) -> None:
+    print("\n===== 爬取完成 =====")
+    print(f"磁力链接总数: {total_magnets}")
+    if duplicates is not None:
+        print(f"重复磁力链接（已跳过）: {duplicates}")
     if args.save_images:
-        timestamp = datetime.datetime.now().strftime("%Y_%m_%d_%H_%M_%S")
-        image_root = Path(args.figures_dir) / f"forum_{args.forum_id}_{timestamp}"
-        image_root.mkdir(parents=True, exist_ok=True)
+        print(f"成功保存图片: {total_images}")
+        print(f"图片根目录: {image_root}")
+    if image_store_stats:
+        print(
+            f"图片仓库: 新增 {image_store_stats['new_blobs']}，内容重复 {image_store_stats['duplicate_blobs']}，"
+            f"URL 命中免下载 {image_store_stats['url_hits']}"
+        )
+    if cache_stats and args.cache_dir:
+        print(
+            f"缓存命中: {cache_stats['hits']} (其中条件请求校验 {cache_stats['revalidated']})，"
+            f"未命中: {cache_stats['misses']}"
+        )
+    for host, stats in (rate_stats or {}).items():
+        print(
+            f"限速 {host}: 请求 {stats['requests']} 次，被限流 {stats['throttled']} 次，"
+            f"结束时速率 {stats['rate']} 次/秒"
+        )
+    if retry_stats and any(retry_stats.values()):
+        print(
+            f"重试: {retry_stats['retries']} 次，恢复 {retry_stats['recovered']} 个请求，"
+            f"放弃 {retry_stats['gave_up']} 个；熔断 {retry_stats['circuit_opens']} 次，"
+            f"熔断期间跳过 {retry_stats['short_circuited']} 个请求"
+        )
+    print(f"输出文件: {output_path}")
+
+
+def dump_metrics(crawler: ForumCrawler | AsyncForumCrawler, path: Path, counters: dict | None = None) -> None:
+    """Write the crawler's metrics plus pacing/retry/cache stats as one JSON summary."""
+    summary = {
+        "created_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "counters": counters or {},
+        "metrics": crawler.metrics.summary(),
+        "rate": crawler.rate_stats(),
+        "retry": crawler.retry_stats(),
+        "cache": crawler.cache_stats(),
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(summary, ensure_ascii=False, indent=1), encoding="utf-8")
+    latency = summary["metrics"].get("crawler_request_seconds", {})
+    parts = [
+        f"{name.split('=', 1)[-1]} {stats['count']} 次 p50 {stats['p50']}s p95 {stats['p95']}s"
+        for name, stats in sorted(latency.items())
+    ]
+    if parts:
+        print("请求耗时: " + "；".join(parts))
+    connections = summary["metrics"].get("crawler_connections_opened_total", {})
+    if connections:
+        requests_sent = sum(stats["count"] for stats in latency.values())
+        print(f"新建连接: {int(sum(connections.values()))} 个（共 {requests_sent} 次请求）")
+    filtered = summary["metrics"].get("crawler_images_filtered_total", {})
+    if filtered:
+        names = {"url": "地址规则", "size": "文件大小", "dimensions": "图片尺寸"}
+        print("过滤图片: " + "，".join(
+            f"{names.get(key.split('=', 1)[-1], key)} {int(count)} 张" for key, count in sorted(filtered.items())
+        ))
+    print(f"指标摘要: {path}")
+
+
+# summary labels for crawl_profile.SPAN_CATEGORIES
+PROFILE_CATEGORY_NAMES = {"network": "网络", "parse": "解析", "disk": "磁盘", "pacing": "限速/重试等待"}
+
+
+def finish_profile(profiler: CrawlProfiler, trace_path: Path, cprofile_path: str | None = None) -> None:
+    """Write the Chrome trace (and cProfile stats) and print where the time went."""
+    if cprofile_path:
+        profiler.dump_cprofile(cprofile_path)
+    profiler.export_chrome_trace(trace_path)
+    categories = profiler.summary()["categories"]
+    total = sum(categories.values())
+    if total:
+        parts = [
+            f"{PROFILE_CATEGORY_NAMES.get(name, name)} {seconds:.3f}s（{seconds / total:.0%}）"
+            for name, seconds in sorted(categories.items(), key=lambda item: -item[1])
+        ]
+        print("耗时分布（各线程累计）: " + "，".join(parts))
+    print(f"性能时间线: {trace_path}（在 chrome://tracing 或 ui.perfetto.dev 中打开）")
+    if cprofile_path:
+        print(f"cProfile 统计: {cprofile_path}")
+
+
+def open_dedup_store(args: argparse.Namespace) -> MagnetDedupStore | None:
+    return None if args.no_dedup else MagnetDedupStore(args.dedup_index)
+
+
+def write_thread(
+    sink: OutputSink, thread_url: str, magnets, dedup: MagnetDedupStore | None, uncommitted: list, **fields
+) -> int:
+    """Write the thread's record with the magnets not seen before and report how many those are.
+
+    The new magnets are appended to uncommitted; hand that list to
+    ``commit_magnets`` once the sink has flushed the record.
+    """
+    magnets = list(magnets)
+    fresh = dedup.filter(magnets) if dedup is not None and magnets else magnets
+    sink.write(thread_record(thread_url, magnets=fresh, **fields))
+    uncommitted.extend(fresh)
+    if not magnets:
+        print("     未发现磁力链接")
+        return 0
+    duplicates = len(magnets) - len(fresh)
+    suffix = f"（跳过重复 {duplicates} 条）" if duplicates else ""
+    print(f"     已写入 {len(fresh)} 条磁力链接{suffix}")
+    return len(fresh)
+
+
+def commit_magnets(dedup: MagnetDedupStore | None, uncommitted: list) -> None:
+    """Store the magnets written since the last call in the dedup index; call once their records are safe on disk."""
+    if dedup is not None:
+        dedup.commit(uncommitted)
+    uncommitted.clear()
+
+
+def start_checkpoint(args: argparse.Namespace, output_path: Path, image_root: Path | None) -> CrawlCheckpoint:
+    timestamp = datetime.datetime.now().strftime("%Y_%m_%d_%H_%M_%S")
+    run_args = {key: value for key, value in vars(args).items() if key != "resume"}
+    return CrawlCheckpoint(
+        path=args.checkpoint or str(Path("data") / f"checkpoint_{timestamp}.json"),
+        next_page=args.start_page,
+        end_page=args.end_page,
+        params={
+            "args": run_args,
+            "output": str(output_path),
+            "image_root": str(image_root) if image_root is not None else None,
+        },
+    )
+
+
+def crawl_forum(args: argparse.Namespace, checkpoint: CrawlCheckpoint | None = None) -> None:
+    """Crawl the page range in args; pass a loaded checkpoint to resume an interrupted run."""
+    config = build_config(args)
+    crawler = ForumCrawler(config)
+    try:
+        if checkpoint is not None:
+            output_path = Path(checkpoint.params["output"])
+            image_root = Path(checkpoint.params["image_root"]) if checkpoint.params.get("image_root") else None
+            checkpoint.repair_outputs()
+            append = True
+            print(f"从检查点恢复: {checkpoint.path}（下一页 {checkpoint.next_page}，待处理帖子 "
+                  f"{sum(len(paths) for paths in checkpoint.pending.values())} 个）")
+        else:
+            output_path = resolve_output_path(args.output, args.format)
+            image_root = resolve_image_root(args)
+            checkpoint = start_checkpoint(args, output_path, image_root)
+            append = False
+        index = ThreadIndex(args.index_path) if args.incremental else None
+        dedup = open_dedup_store(args)
+        profiler = CrawlProfiler() if args.profile or args.cprofile else None
+        if profiler is not None:
+            crawler.attach_profiler(profiler)
+            if args.cprofile:
+                profiler.start_cprofile()
+
+        counters = checkpoint.counters
+        for key in ("magnets", "images", "skipped_known"):
+            counters.setdefault(key, 0)
+
+        # magnets and index entries of threads not yet covered by a saved checkpoint
+        uncommitted: list[str] = []
+        unindexed: list[tuple[str, list[str]]] = []
+
+        def commit_outputs() -> None:
+            commit_magnets(dedup, uncommitted)
+            if index is not None:
+                for thread_path, magnets in unindexed:
+                    index.record(thread_path, magnets)
+            unindexed.clear()
+
+        with open_output_sink(output_path, args.format, append=append, profiler=profiler) as sink:
 
+            def sync_output() -> None:
+                # buffered records must be on disk before the checkpoint calls their threads done
+                sink.flush()
+                checkpoint.record_output(str(output_path))
+
+            checkpoint.before_save = sync_output
+            # a resume cuts the output back to the saved checkpoint, so the dedup
+            # store and the index may only learn what a saved checkpoint covers
+            checkpoint.after_save = commit_outputs
+
+            events = crawler.iter_forum(
+                args.forum_id,
+                checkpoint.next_page,
+                checkpoint.end_page,
+                events=None,
+                resume_threads=checkpoint.pending_threads(),
+                image_root=str(image_root) if image_root is not None else None,
+                # download_images already fetches each thread's images in parallel
+                image_workers=1,
+                page_delay=args.delay,
+                thread_filter=index.unknown if index is not None else None,
+            )
+            with closing(events):
+                for event in events:
+                    if event.kind == "page":
+                        if not event.forum_url:
+                            print(f"\n=== 继续处理第 {event.page} 页未完成的 {len(event.thread_paths)} 个帖子")
+                        else:
+                            print(f"\n=== 正在处理第 {event.page} 页: {event.forum_url}")
+                        counters["skipped_known"] += event.known
+                        checkpoint.mark_listed(event.page, event.thread_paths)
+                        checkpoint.save()
+                        if event.error is not None:
+                            print(f"无法获取第 {event.page} 页的帖子: {event.error}")
+                        elif event.exhausted:
+                            print("本页帖子均已爬取过，增量模式停止翻页。")
+                        elif not event.thread_paths and event.forum_url:
+                            print("未发现帖子链接，跳过。")
+
+                    elif event.kind == "thread":
+                        thread_url = f"{config.base_url.rstrip('/')}/{event.thread_path}"
+                        print(f"  -> 解析帖子: {thread_url}")
+                        if event.error is not None:
+                            print(f"     无法访问帖子: {event.error}")
+                            continue
+                        details = event.details
+                        counters["magnets"] += write_thread(
+                            sink, thread_url, details.magnets, dedup, uncommitted, title=details.title,
+                            image_count=len(details.image_urls), fetch_seconds=details.fetch_seconds, page=event.page,
+                        )
+                        unindexed.append((event.thread_path, details.magnets))
+                        checkpoint.mark_completed(event.page, event.thread_path)
+                        checkpoint.maybe_save()
+
+                    elif event.kind == "images":
+                        counters["images"] += event.saved
+                        print(f"     图片保存结果（{event.thread_path}）: {event.saved} 成功, {len(event.skipped)} 跳过")
+
+        checkpoint.before_save = None
+        checkpoint.record_output(str(output_path))
+        checkpoint.finish()
+        checkpoint.after_save = None
+    finally:
+        crawler.close()
+    if index is not None:
+        index.close()
+        print(f"\n增量模式: 跳过已爬取帖子 {counters['skipped_known']} 个")
+    duplicates = None
+    if dedup is not None:
+        dedup.close()
+        duplicates = dedup.duplicates
+    print_summary(
+        args, counters["magnets"], counters["images"], image_root, output_path, crawler.cache_stats(),
+        duplicates, crawler.image_store.stats() if crawler.image_store is not None else None,
+        crawler.rate_stats(), crawler.retry_stats(),
+    )
+    metrics_path = Path(args.metrics_output) if args.metrics_output else output_path.with_suffix(".metrics.json")
+    dump_metrics(crawler, metrics_path, counters)
+    if profiler is not None:
+        trace_path = Path(args.profile_output) if args.profile_output else output_path.with_suffix(".trace.json")
+        finish_profile(profiler, trace_path, args.cprofile)
+
+
+async def crawl_forum_async(args: argparse.Namespace) -> None:
+    """Same flow as crawl_forum, but every request is a coroutine on one event loop.
+
+    All forum pages are listed concurrently, their requests spaced ``--delay``
+    seconds apart; thread pages and image downloads are scheduled as soon as
+    their links are known.
+    """
+    config = build_config(args)
+    output_path = resolve_output_path(args.output, args.format)
+    image_root = resolve_image_root(args)
     total_magnets = 0
-    total_images = 0
+    image_tasks: list[asyncio.Task] = []
+    dedup = open_dedup_store(args)
+    uncommitted: list[str] = []
+
+    async with AsyncForumCrawler(
+        config,
+        max_connections=args.max_connections,
+        per_host_connections=args.per_host_connections,
+    ) as crawler:
 
-    with output_path.open("w", encoding="utf-8") as handle:
-        for page in range(args.start_page, args.end_page + 1):
+        async def list_page(page: int):
             forum_url = f"{config.base_url}/forum-{args.forum_id}-{page}.html"
-            print(f"\n=== 正在处理第 {page} 页: {forum_url}")
+            if args.delay:
+                await asyncio.sleep((page - args.start_page) * args.delay)
             try:
-                thread_paths = crawler.fetch_thread_paths_from_forum_url(forum_url)
-            except requests.RequestException as exc:
-                print(f"无法获取第 {page} 页的帖子: {exc}")
-                continue
+                return page, forum_url, await crawler.fetch_thread_paths_from_forum_url(forum_url), None
+            except Exception as exc:  # aiohttp.ClientError / asyncio.TimeoutError
+                return page, forum_url, [], exc
 
-            if not thread_paths:
-                print("未发现帖子链接，跳过。")
-                continue
+        listings = await asyncio.gather(
+            *(list_page(page) for page in range(args.start_page, args.end_page + 1))
+        )
 
-            for thread_path in thread_paths:
-                thread_url = f"{config.base_url.rstrip('/')}/{thread_path}"
-                print(f"  -> 解析帖子: {thread_url}")
-                try:
-                    magnets, image_urls, soup = crawler.fetch_thread_details(thread_path)
-                except requests.RequestException as exc:
-                    print(f"     无法访问帖子: {exc}")
+        with open_output_sink(output_path, args.format) as sink:
+            for page, forum_url, thread_paths, error in listings:
+                print(f"\n=== 正在处理第 {page} 页: {forum_url}")
+                if error is not None:
+                    print(f"无法获取第 {page} 页的帖子: {error}")
+                    continue
+                if not thread_paths:
+                    print("未发现帖子链接，跳过。")
                     continue
 
-                if magnets:
-                    for magnet in magnets:
-                        handle.write(magnet + "\n")
-                    total_magnets += len(magnets)
-                    print(f"     已写入 {len(magnets)} 条磁力链接")
-                else:
-                    print("     未发现磁力链接")
+                async for thread_path, details, error in crawler.fetch_many_thread_details(thread_paths):
+                    thread_url = f"{config.base_url}/{thread_path}"
+                    print(f"  -> 解析帖子: {thread_url}")
+                    if error is not None:
+                        print(f"     无法访问帖子: {error}")
+                        continue
+                    magnets, image_urls = details.magnets, details.image_urls
+                    total_magnets += write_thread(
+                        sink, thread_url, magnets, dedup, uncommitted, title=details.title,
+                        image_count=len(image_urls), fetch_seconds=details.fetch_seconds, page=page,
+                    )
 
-                if args.save_images and image_urls and image_root is not None:
-                    thread_name = sanitize_name(soup.title.text if soup.title else thread_path)
-                    destination = image_root / thread_name
-                    saved, skipped = crawler.download_images(image_urls, str(destination))
-                    total_images += saved
-                    print(f"     图片保存结果: {saved} 成功, {len(skipped)} 跳过")
+                    if image_root is not None and image_urls:
+                        thread_name = sanitize_name(details.title or thread_path)
+                        destination = image_root / thread_name
+                        image_tasks.append(
+                            asyncio.ensure_future(crawler.download_images(image_urls, str(destination)))
+                        )
+                sink.flush()
+                commit_magnets(dedup, uncommitted)
 
-            time.sleep(args.delay)
+        total_images = 0
+        for saved, skipped in await asyncio.gather(*image_tasks):
+            total_images += saved
+        rate_stats = crawler.rate_stats()
+
+    duplicates = None
+    if dedup is not None:
+        dedup.close()
+        duplicates = dedup.duplicates
+    print_summary(
+        args, total_magnets, total_images, image_root, output_path, duplicates=duplicates, rate_stats=rate_stats
+    )
+    metrics_path = Path(args.metrics_output) if args.metrics_output else output_path.with_suffix(".metrics.json")
+    dump_metrics(crawler, metrics_path, {"magnets": total_magnets, "images": total_images})
+
+
+def run_queue_task(
+    crawler: ForumCrawler, queue: WorkQueue, lease: Lease, image_root: Path | None, worker_id: str
+) -> dict:
+    """Execute one leased task and return its result record for the coordinator."""
+    payload = lease.payload
+    if lease.kind == "page":
+        thread_paths = crawler.fetch_thread_paths_from_forum_url(payload["forum_url"])
+        base_url = payload["base_url"]
+        queued = sum(
+            queue.put(
+                "thread",
+                {"page": payload["page"], "thread_path": path, "base_url": base_url},
+                key=f"thread:{base_url}:{path}",
+            )
+            for path in thread_paths
+        )
+        return {
+            "kind": "page",
+            "page": payload["page"],
+            "forum_url": payload["forum_url"],
+            "threads": len(thread_paths),
+            "queued": queued,
+            "worker": worker_id,
+        }
+
+    details = crawler.fetch_thread_details(f"{payload['base_url']}/{payload['thread_path']}")
+    saved = 0
+    if image_root is not None and details.image_urls:
+        destination = image_root / sanitize_name(details.title or payload["thread_path"])
+        saved, _ = crawler.download_images(details.image_urls, str(destination))
+    return {
+        "kind": "thread",
+        "page": payload["page"],
+        "thread_path": payload["thread_path"],
+        "url": details.url,
+        "title": details.title,
+        "magnets": list(details.magnets),
+        "image_count": len(details.image_urls),
+        "images_saved": saved,
+        "fetch_seconds": round(details.fetch_seconds, 3),
+        "worker": worker_id,
+    }
+
+
+def crawl_worker(args: argparse.Namespace) -> None:
+    """Lease page/thread tasks from the shared queue until the coordinator closes it."""
+    worker_id = args.worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    queue = open_work_queue(args.queue)
+    crawler = ForumCrawler(build_config(args))
+    image_root = resolve_image_root(args)
+    handled = 0
+    print(f"[{worker_id}] 已连接任务队列 {args.queue}")
+    try:
+        while True:
+            lease = queue.lease(worker_id, args.lease_timeout)
+            if lease is None:
+                if queue.is_closed():
+                    break
+                time.sleep(1.0)
+                continue
+            try:
+                record = run_queue_task(crawler, queue, lease, image_root, worker_id)
+            except Exception as exc:
+                # any failure (network, parse, disk) is this task's, not the worker's:
+                # hand it back so it is retried up to --max-attempts times
+                error = str(exc) if isinstance(exc, requests.RequestException) else f"{type(exc).__name__}: {exc}"
+                if not queue.fail(lease, error, args.max_attempts):
+                    queue.push_result({
+                        "kind": "error",
+                        "task": lease.kind,
+                        "target": lease.payload.get("thread_path") or lease.payload.get("forum_url"),
+                        "error": error,
+                        "worker": worker_id,
+                    })
+                continue
+            queue.push_result(record)
+            if not queue.ack(lease):
+                print(f"[{worker_id}] 任务 {lease.task_id} 租约已过期，结果可能重复（汇总时去重）")
+            handled += 1
+    finally:
+        crawler.close()
+        queue.close()
+    print(f"[{worker_id}] 队列已关闭，共完成 {handled} 个任务")
+    if args.metrics_output:
+        path = Path(args.metrics_output)
+        dump_metrics(crawler, path.with_name(f"{path.stem}_{sanitize_name(worker_id)}{path.suffix}"), {"tasks": handled})
 
-    print("\n===== 爬取完成 =====")
-    print(f"磁力链接总数: {total_magnets}")
-    if args.save_images:
-        print(f"成功保存图片: {total_images}")
-        print(f"图片根目录: {image_root}")
-    print(f"输出文件: {output_path}")
+
+def crawl_coordinator(args: argparse.Namespace) -> None:
+    """Queue the forum pages of args, then merge the results workers push back.
+
+    An unfinished queue (e.g. after a coordinator crash) is continued; a
+    queue whose previous sweep finished is cleared first. Magnets are
+    de-duplicated here, so results delivered twice after a lease timeout
+    are harmless.
+    """
+    queue = open_work_queue(args.queue)
+    if queue.is_closed():
+        queue.reset()
+    counts = queue.counts()
+    continuing = any(counts[state] for state in ("pending", "leased", "done", "failed"))
+    output_path = resolve_output_path(args.output, args.format)
+    append = continuing and output_path.exists()
+    if append and args.format == "parquet":
+        queue.close()
+        raise SystemExit(f"parquet 输出无法追加到 {output_path}，请指定新的 --output 或使用 text/jsonl 格式")
+    if continuing:
+        print(f"继续未完成的队列: 待处理 {counts['pending']}，处理中 {counts['leased']}，已完成 {counts['done']}")
+    queue.mark_closed(False)
+    base_url = args.base_url.rstrip("/")
+    seeded = sum(
+        queue.put(
+            "page",
+            {"page": page, "forum_url": f"{base_url}/forum-{args.forum_id}-{page}.html", "base_url": base_url},
+            key=f"page:{base_url}:{args.forum_id}:{page}",
+        )
+        for page in range(args.start_page, args.end_page + 1)
+    )
+    print(f"已向队列 {args.queue} 写入 {seeded} 个论坛页任务，等待 worker 处理...")
+
+    # spawned, not forked: the children must not inherit this process's queue connection
+    context = multiprocessing.get_context("spawn")
+    workers = [
+        context.Process(target=crawl_worker, args=(args,), name=f"crawl-worker-{index}")
+        for index in range(max(0, args.local_workers))
+    ]
+    for process in workers:
+        process.start()
+
+    dedup = open_dedup_store(args)
+    uncommitted: list[str] = []
+    totals = {"pages": 0, "threads": 0, "magnets": 0, "images": 0, "errors": 0}
+    last_report = 0.0
+    with open_output_sink(output_path, args.format, append=append) as sink:
+        while True:
+            records = queue.read_results(500)
+            for record in records:
+                if record["kind"] == "page":
+                    totals["pages"] += 1
+                    print(f"=== 第 {record['page']} 页: {record['threads']} 个帖子（{record['worker']}）")
+                elif record["kind"] == "thread":
+                    totals["threads"] += 1
+                    totals["images"] += record["images_saved"]
+                    totals["magnets"] += write_thread(
+                        sink, record["url"], record["magnets"], dedup, uncommitted, title=record["title"],
+                        image_count=record["image_count"], fetch_seconds=record["fetch_seconds"],
+                        page=record["page"],
+                    )
+                else:
+                    totals["errors"] += 1
+                    print(f"任务失败 {record['task']} {record['target']}: {record['error']}")
+            if records:
+                sink.flush()
+                commit_magnets(dedup, uncommitted)
+                queue.drop_results(len(records))
+                continue
+
+            counts = queue.counts()
+            if counts["pending"] == 0 and counts["leased"] == 0 and counts["results"] == 0:
+                break
+            if workers and not any(process.is_alive() for process in workers) and counts["leased"] == 0:
+                print("本机 worker 已全部退出，队列中仍有任务；可启动更多 worker 后重新运行 coordinator 继续。")
+                break
+            if time.monotonic() - last_report >= 10:
+                last_report = time.monotonic()
+                print(f"队列状态: 待处理 {counts['pending']}，处理中 {counts['leased']}，"
+                      f"已完成 {counts['done']}，失败 {counts['failed']}")
+            time.sleep(1.0)
+
+    remaining = queue.counts()
+    if remaining["pending"] == 0 and remaining["leased"] == 0:
+        queue.mark_closed()
+    for process in workers:
+        process.join()
+    queue.close()
+    duplicates = None
+    if dedup is not None:
+        dedup.close()
+        duplicates = dedup.duplicates
+    print(f"\n分布式汇总: 论坛页 {totals['pages']}，帖子 {totals['threads']}，失败任务 {totals['errors']}")
+    image_root = f"{args.figures_dir}（各 worker 本机）" if args.save_images else None
+    print_summary(args, totals["magnets"], totals["images"], image_root, output_path, duplicates=duplicates)
 
 
 def main() -> None:
-    args = build_parser().parse_args()
-    crawl_forum(args)
+    parser = build_parser()
+    args = parser.parse_args()
+    if args.resume:
+        checkpoint_path = latest_checkpoint("data") if args.resume == "latest" else args.resume
+        if checkpoint_path is None:
+            parser.error("data/ 下没有未完成的检查点")
+        checkpoint = CrawlCheckpoint.load(checkpoint_path)
+        # profiling is a property of this invocation, not of the resumed run
+        profiling = {key: getattr(args, key) for key in ("profile", "profile_output", "cprofile")}
+        vars(args).update(checkpoint.params["args"])
+        vars(args).update(profiling)
+        args.checkpoint = checkpoint.path
+        if args.format == "parquet":
+            parser.error("parquet 输出无法追加，不能从检查点恢复（断点续爬请使用 text 或 jsonl 格式）")
+        crawl_forum(args, checkpoint)
+        return
+    if (args.profile or args.cprofile) and (args.role != "standalone" or args.engine == "async"):
+        parser.error("--profile/--cprofile 目前只支持单机 thread 引擎")
+    if args.role != "standalone":
+        if args.queue.startswith("memory://"):
+            # coordinator and workers are separate processes: each would get its own empty queue
+            parser.error("memory:// 队列只能在单个进程内共享，coordinator/worker 请使用 SQLite 文件或 redis:// 队列")
+        if args.role == "coordinator":
+            crawl_coordinator(args)
+        else:
+            crawl_worker(args)
+        return
+    if args.engine == "async":
+        unsupported = [
+            option for option in THREAD_ENGINE_OPTIONS
+            if getattr(args, option[2:].replace("-", "_")) != parser.get_default(option[2:].replace("-", "_"))
+        ]
+        if unsupported:
+            parser.error(f"{'、'.join(unsupported)} 目前只支持 --engine thread")
+    if args.engine == "async":
+        asyncio.run(crawl_forum_async(args))
+    else:
+        crawl_forum(args)
 
 
 if __name__ == "__main__":
@@ -1,249 +1,457 @@
-from flask import Flask, render_template, request, send_file
-import requests
+from flask import Flask, Response, render_template, request, send_file, stream_with_context
 import os
 import datetime
-import threading
+import json
 import time
+import threading
+from urllib.parse import urlparse
 
-from crawler_core import CrawlerConfig, ForumCrawler, sanitize_name
+from checkpoint import CrawlCheckpoint, latest_checkpoint
+from crawl_profile import CrawlProfiler
+from crawler_core import CrawlerConfig, ForumCrawler
+from image_store import DEFAULT_BLOB_DIR
+from job_manager import DEFAULT_JOB_STATUS, JobManager
+from magnet_store import DEFAULT_MAGNET_INDEX_PATH, MagnetDedupStore
+from output_sink import JsonlSink, TextSink, thread_record
+from thread_index import DEFAULT_INDEX_PATH, ThreadIndex
 
 app = Flask(__name__)
 
-# 共享的爬虫实例
-crawler_config = CrawlerConfig()
+# 共享的爬虫实例：保存 Cookie 等设置，每个任务从它派生自己的爬虫，
+# 共用按主机的限速、熔断状态和图片仓库
+crawler_config = CrawlerConfig(parser_backend='lxml', image_store_dir=DEFAULT_BLOB_DIR)
 crawler = ForumCrawler(crawler_config)
-status_lock = threading.Lock()
-pause_event = threading.Event()
-pause_event.set()
-stop_event = threading.Event()
-crawl_thread_ref = None
 HISTORY_LIMIT = 10
-
-# 爬取状态
-crawl_status = {
-    'running': False,
-    'paused': False,
-    'progress': 0,
-    'total': 0,
-    'magnet_count': 0,
-    'image_count': 0,
-    'current_page': 0,
-    'message': '就绪',
-    'current_url': '',
-    'magnet_file': '',
-    'url_file': '',
-    'figures_dir': ''
-}
-
-# 最后生成的文件路径
-last_generated_file = ''
-last_generated_url_file = ''
-
-# 存储当前爬取的磁力链接和地址（用于实时显示）
-current_magnet_links = []
-current_crawl_urls = []
+# 进度流：无变化时多久重新检查一次全局状态（其他任务、统计），多久发一次心跳
+STREAM_TICK = 1.0
+# 两次推送的最小间隔，繁忙的任务把多次变化合并成一帧
+STREAM_MIN_INTERVAL = 0.25
+STREAM_KEEPALIVE = 15.0
+CACHE_DIR = 'data/http_cache'
+
+# 所有任务共享的工作线程预算（每个任务占用 帖子线程数 + 图片线程数）
+JOB_THREAD_BUDGET = int(os.environ.get('CRAWLER_THREAD_BUDGET', '16'))
+# 每个任务在内存中保留的最新磁力链接/地址条数，更早的只保存在输出文件中
+JOB_RESULT_BUFFER = int(os.environ.get('CRAWLER_RESULT_BUFFER', '10000'))
+jobs = JobManager(budget=JOB_THREAD_BUDGET, result_capacity=JOB_RESULT_BUFFER)
+# 分页接口单次最多返回的条数
+PAGE_LIMIT_MAX = 5000
+
+history_lock = threading.Lock()
+# 检查并提交恢复任务须为原子操作，避免连续两次请求把同一检查点排队两次
+resume_lock = threading.Lock()
 crawl_history = []
 
+# 磁力去重库和增量索引在所有任务间共享，避免并发任务各自加载、互不可见
+shared_stores_lock = threading.Lock()
+shared_stores = {}
 
-def update_status(**kwargs):
-    with status_lock:
-        crawl_status.update(kwargs)
 
+def shared_dedup_store():
+    with shared_stores_lock:
+        if 'dedup' not in shared_stores:
+            shared_stores['dedup'] = MagnetDedupStore(DEFAULT_MAGNET_INDEX_PATH)
+        return shared_stores['dedup']
 
-def snapshot_status():
-    with status_lock:
-        status = crawl_status.copy()
-    status['magnet_file_name'] = os.path.basename(status['magnet_file']) if status['magnet_file'] else ''
-    status['url_file_name'] = os.path.basename(status['url_file']) if status['url_file'] else ''
-    status['history'] = list(crawl_history)
-    return status
-
-
-def reset_runtime_state():
-    global current_magnet_links, current_crawl_urls, last_generated_file, last_generated_url_file
-    current_magnet_links = []
-    current_crawl_urls = []
-    last_generated_file = ''
-    last_generated_url_file = ''
-    update_status(
-        running=False,
-        paused=False,
-        progress=0,
-        total=0,
-        magnet_count=0,
-        image_count=0,
-        current_page=0,
-        message='就绪',
-        current_url='',
-        magnet_file='',
-        url_file='',
-        figures_dir=''
-    )
 
+def shared_thread_index():
+    with shared_stores_lock:
+        if 'index' not in shared_stores:
+            shared_stores['index'] = ThreadIndex(DEFAULT_INDEX_PATH)
+        return shared_stores['index']
 
-def record_history(entry):
-    crawl_history.insert(0, entry)
-    del crawl_history[HISTORY_LIMIT:]
 
-def parse_topzh_use_bs(url_address: str):
+def register_job_metrics():
     """
-    使用beautifulSoup提取网页中的有效链接
+    任务调度和重试统计在抓取 /metrics 时实时读取
     """
-    try:
-        return set(crawler.fetch_thread_paths_from_forum_url(url_address))
-    except requests.RequestException as e:
-        update_status(message=f'提取链接时出错: {str(e)}')
-        return set()
-
-def parse_content_use_bs(url: str, save_images=False, figures_dir=None):
+    metrics = crawler.metrics
+    metrics.describe('crawler_jobs', 'Dashboard crawl jobs by state')
+    metrics.describe('crawler_thread_budget', 'Worker threads shared by dashboard jobs')
+    metrics.describe('crawler_retry_events', 'Retry and circuit-breaker events since start')
+    for state in ('queued', 'running', 'finished', 'stopped', 'failed'):
+        metrics.add_gauge(
+            'crawler_jobs',
+            lambda state=state: sum(1 for job in jobs.jobs() if job.snapshot()['state'] == state),
+            state=state,
+        )
+    metrics.add_gauge('crawler_thread_budget', lambda: jobs.budget, usage='total')
+    metrics.add_gauge('crawler_thread_budget', jobs.budget_in_use, usage='in_use')
+    for event in ('retries', 'recovered', 'gave_up', 'circuit_opens', 'short_circuited'):
+        metrics.add_gauge('crawler_retry_events', lambda event=event: crawler.retry_stats()[event], event=event)
+
+
+register_job_metrics()
+
+
+def find_job(job_id=None):
     """
-    使用BeautifulSoup提取网页中的磁力链接和图片
+    按 job_id 查找任务；未指定时返回最近创建的任务
     """
-    try:
-        magnet_links, image_urls, soup = crawler.fetch_thread_details(url)
-    except requests.RequestException as e:
-        update_status(message=f'提取内容时出错: {str(e)}')
-        return [], 0, 0
-
-    images_saved = 0
-    skipped_images = 0
-    if save_images and figures_dir and image_urls:
-        dirname = sanitize_name(soup.title.text if soup.title else url)
-        save_dir = os.path.join(figures_dir, dirname)
-        saved, skipped = crawler.download_images(image_urls, save_dir)
-        images_saved += saved
-        if skipped:
-            skipped_images += len(skipped)
-            print(f'Skipped {len(skipped)} images while saving "{dirname}"')
-
-    return magnet_links, images_saved, skipped_images
-
-def crawl_thread(base_url, url_pattern, pages, save_images=False, forum_id='103'):
+    if job_id:
+        return jobs.get(job_id)
+    return jobs.latest()
+
+
+def snapshot_status(job=None):
+    if job is not None:
+        status = job.snapshot()
+        job_crawler = job.crawler or crawler
+    else:
+        status = dict(DEFAULT_JOB_STATUS, state='idle', job_id='', magnet_file_name='', url_file_name='', records_file_name='')
+        job_crawler = crawler
+    with history_lock:
+        status['history'] = list(crawl_history)
+    cache_stats = job_crawler.cache_stats()
+    status['cache_hits'] = cache_stats['hits']
+    status['cache_misses'] = cache_stats['misses']
+    status['cache_revalidated'] = cache_stats['revalidated']
+    rate_stats = job_crawler.rate_stats()
+    forum_host = urlparse(job_crawler.config.base_url).netloc
+    status['request_rate'] = rate_stats.get(forum_host, {}).get('rate', job_crawler.config.rate_limit)
+    status['throttled_count'] = sum(stats['throttled'] for stats in rate_stats.values())
+    retry_stats = job_crawler.retry_stats()
+    status['retry_count'] = retry_stats['retries']
+    status['gave_up_count'] = retry_stats['gave_up']
+    status['jobs'] = [summarize_job(other) for other in jobs.jobs()]
+    status['budget'] = jobs.budget
+    status['budget_in_use'] = jobs.budget_in_use()
+    return status
+
+
+def summarize_job(job):
     """
-    爬虫线程函数
+    任务列表中展示的精简状态
     """
-    global last_generated_file, last_generated_url_file, current_magnet_links, current_crawl_urls, crawl_thread_ref
+    status = job.snapshot()
+    return {key: status[key] for key in (
+        'job_id', 'forum_id', 'pages', 'state', 'running', 'paused', 'progress', 'total',
+        'magnet_count', 'image_count', 'message', 'created_at',
+    )}
+
 
-    update_status(
-        running=True,
+def record_history(entry):
+    with history_lock:
+        crawl_history.insert(0, entry)
+        del crawl_history[HISTORY_LIMIT:]
+
+def crawl_job(job, resume_from=None):
+    """
+    单个爬取任务：分页列表、帖子解析、图片下载各自运行在独立的工作线程中，
+    本线程只负责写入输出文件、更新任务状态和定期保存检查点。
+    传入 resume_from（CrawlCheckpoint）时沿用其输出文件并从中断处继续。
+    """
+    params = job.params
+    base_url = params['base_url']
+    url_pattern = params['url_pattern']
+    pages = params['pages']
+    save_images = params['save_images']
+    forum_id = params['forum_id']
+    concurrency = params['concurrency']
+    image_workers = params['image_workers']
+    incremental = params['incremental']
+    job_crawler = job.crawler
+    # 性能分析：记录各步骤耗时，任务结束后导出 Chrome trace 时间线
+    profiler = CrawlProfiler() if params.get('profile') else None
+    if profiler is not None:
+        job_crawler.attach_profiler(profiler)
+
+    checkpoint = resume_from
+    counters = dict(checkpoint.counters) if checkpoint is not None else {}
+    magnet_total = counters.get('magnets', 0)
+    image_total = counters.get('images', 0)
+    skipped_image_total = counters.get('images_skipped', 0)
+    pages_done = counters.get('pages_done', 0)
+    known_total = counters.get('known', 0)
+    duplicate_total = 0
+
+    job.update_status(
         paused=False,
-        progress=0,
+        progress=pages_done,
         total=pages,
-        magnet_count=0,
-        image_count=0,
+        magnet_count=magnet_total,
+        duplicate_count=0,
+        image_count=image_total,
         current_page=0,
-        message='开始爬取...',
+        message='从检查点恢复爬取...' if checkpoint is not None else '开始爬取...',
         current_url=''
     )
-    current_magnet_links = []
-    current_crawl_urls = []
-
-    figures_dir = None
-    if save_images:
-        now = datetime.datetime.now()
-        formatted_datetime = now.strftime("%Y_%m_%d_%H_%M_%S")
-        figures_dir = f"data/figures/forum_{forum_id}_{formatted_datetime}"
-        os.makedirs(figures_dir, exist_ok=True)
-        update_status(figures_dir=figures_dir)
-
-    os.makedirs('data', exist_ok=True)
-    timestamp = datetime.datetime.now().strftime("%Y_%m_%d_%H_%M_%S")
-    file_path = f"data/magnet_file_{timestamp}.txt"
-    url_file_path = f"data/url_file_{timestamp}.txt"
-    last_generated_file = file_path
-    last_generated_url_file = url_file_path
-    update_status(magnet_file=file_path, url_file=url_file_path)
-
-    magnet_total = 0
-    image_total = 0
-    skipped_image_total = 0
+
+    if checkpoint is not None:
+        timestamp = checkpoint.params['timestamp']
+        figures_dir = checkpoint.params['figures_dir']
+        file_path = checkpoint.params['magnet_file']
+        url_file_path = checkpoint.params['url_file']
+        records_path = checkpoint.params.get('records_file') or f"data/records_{timestamp}.jsonl"
+        checkpoint.repair_outputs()
+        for path, add in ((file_path, job.add_magnets), (url_file_path, job.add_urls)):
+            if os.path.exists(path):
+                with open(path, encoding='utf-8') as fh:
+                    add([line.rstrip('\n') for line in fh if line.strip()])
+        if figures_dir:
+            os.makedirs(figures_dir, exist_ok=True)
+            job.update_status(figures_dir=figures_dir)
+    else:
+        # 同一秒内可能启动多个任务，文件名里带上任务编号
+        timestamp = f"{datetime.datetime.now().strftime('%Y_%m_%d_%H_%M_%S')}_{job.job_id}"
+        figures_dir = None
+        if save_images:
+            figures_dir = f"data/figures/forum_{forum_id}_{timestamp}"
+            os.makedirs(figures_dir, exist_ok=True)
+            job.update_status(figures_dir=figures_dir)
+
+        os.makedirs('data', exist_ok=True)
+        file_path = f"data/magnet_file_{timestamp}.txt"
+        url_file_path = f"data/url_file_{timestamp}.txt"
+        records_path = f"data/records_{timestamp}.jsonl"
+        job.params['checkpoint'] = f"data/checkpoint_{timestamp}.json"
+        checkpoint = CrawlCheckpoint(
+            path=job.params['checkpoint'],
+            next_page=1,
+            end_page=pages,
+            params={
+                'run': {
+                    'base_url': base_url,
+                    'url_pattern': url_pattern,
+                    'pages': pages,
+                    'save_images': save_images,
+                    'forum_id': forum_id,
+                    'concurrency': concurrency,
+                    'image_workers': image_workers,
+                    'incremental': incremental,
+                    'profile': profiler is not None,
+                },
+                'timestamp': timestamp,
+                'figures_dir': figures_dir,
+                'magnet_file': file_path,
+                'url_file': url_file_path,
+                'records_file': records_path,
+            },
+        )
+        checkpoint.save()
+    job.update_status(magnet_file=file_path, url_file=url_file_path, records_file=records_path)
+
+    # 输出文件在整个任务期间保持打开，按批写入；恢复时追加
+    append = resume_from is not None
+    sinks = {
+        file_path: TextSink(file_path, append=append, profiler=profiler),
+        url_file_path: TextSink(url_file_path, field='thread_url', append=append, profiler=profiler),
+        records_path: JsonlSink(records_path, append=append, profiler=profiler),
+    }
+
+    index = shared_thread_index() if incremental else None
+    dedup = shared_dedup_store()
+    # 尚未被已保存检查点覆盖的帖子：恢复时输出会截回检查点位置，检查点保存后才写入去重库和增量索引
+    uncommitted_magnets = []
+    unindexed = []
+
+    def commit_outputs():
+        dedup.commit(uncommitted_magnets)
+        uncommitted_magnets.clear()
+        if index is not None:
+            for thread_path, magnets in unindexed:
+                index.record(thread_path, magnets)
+        unindexed.clear()
+
+    def save_checkpoint(force=False):
+        checkpoint.counters.update(
+            magnets=magnet_total,
+            images=image_total,
+            images_skipped=skipped_image_total,
+            pages_done=pages_done,
+            known=known_total,
+        )
+        if force:
+            checkpoint.save()
+        else:
+            checkpoint.maybe_save()
+
+    def sync_outputs():
+        # 缓冲的记录必须先落盘，检查点才能把对应帖子记为已完成
+        for path, sink in sinks.items():
+            sink.flush()
+            checkpoint.record_output(path)
+
+    checkpoint.before_save = sync_outputs
+    checkpoint.after_save = commit_outputs
+
+    events = job_crawler.iter_forum(
+        forum_id,
+        checkpoint.next_page,
+        pages,
+        events=None,
+        resume_threads=checkpoint.pending_threads(),
+        thread_workers=concurrency,
+        # download_images 已按 image_workers 并行下载单个帖子的图片
+        image_workers=1,
+        image_root=figures_dir,
+        should_stop=job.stop_event.is_set,
+        wait_if_paused=job.pause_event.wait,
+        thread_filter=index.unknown if index is not None else None,
+    )
 
     try:
-        for page in range(1, pages + 1):
-            if stop_event.is_set():
-                update_status(message='爬取已停止', current_url='')
+        for event in events:
+            job.pause_event.wait()
+            if job.stop_event.is_set():
                 break
 
-            pause_event.wait()
-            update_status(current_page=page, message=f'正在获取第 {page} 页的帖子链接...')
-            current_url = url_pattern.format(page)
-
-            urls = parse_topzh_use_bs(current_url)
-            if not urls:
-                update_status(message=f'第 {page} 页没有找到帖子链接', progress=page)
-                continue
-
-            update_status(message=f'正在从第 {page} 页帖子中提取磁力链接...')
-            for url in urls:
-                if stop_event.is_set():
-                    update_status(message='爬取已停止', current_url='')
-                    break
-                pause_event.wait()
-
-                full_url = f"{base_url.rstrip('/')}/{url.lstrip('/')}"
-                update_status(current_url=full_url)
-
-                with open(url_file_path, 'a', encoding='utf-8') as url_file:
-                    url_file.write(full_url + '\n')
-                current_crawl_urls.append(full_url)
-
-                magnets, saved_images, skipped_images = parse_content_use_bs(full_url, save_images, figures_dir)
-                if magnets:
-                    with open(file_path, 'a', encoding='utf-8') as fh:
-                        for magnet in magnets:
-                            fh.write(magnet + '\n')
-                    magnet_total += len(magnets)
-                    current_magnet_links.extend(magnets)
-                    update_status(magnet_count=magnet_total)
-                if saved_images or skipped_images:
-                    image_total += saved_images
-                    skipped_image_total += skipped_images
-                    status_msg = f'Images saved: {image_total}'
-                    if skipped_image_total:
-                        status_msg += f' (skipped {skipped_image_total})'
-                    update_status(image_count=image_total, message=status_msg)
-
-            update_status(progress=page)
-            time.sleep(1)
-
+            if event.kind == 'page':
+                known_total += event.known
+                checkpoint.mark_listed(event.page, event.thread_paths)
+                save_checkpoint(force=True)
+                if event.exhausted:
+                    job.update_status(message=f'第 {event.page} 页帖子均已爬取过，增量模式停止翻页')
+                elif event.error is not None:
+                    job.update_status(message=f'提取链接时出错: {str(event.error)}')
+                elif not event.thread_paths:
+                    job.update_status(message=f'第 {event.page} 页没有找到帖子链接')
+                else:
+                    job.update_status(current_page=event.page, message=f'正在从第 {event.page} 页帖子中提取磁力链接...')
+
+            elif event.kind == 'thread':
+                full_url = f"{base_url.rstrip('/')}/{event.thread_path.lstrip('/')}"
+                job.update_status(current_url=full_url)
+                job.add_urls([full_url])
+
+                if event.error is not None:
+                    sinks[url_file_path].write(thread_record(full_url, page=event.page))
+                    job.update_status(message=f'提取内容时出错: {str(event.error)}')
+                    continue
+
+                magnets = event.details.magnets
+                fresh = dedup.filter(magnets)
+                uncommitted_magnets.extend(fresh)
+                unindexed.append((event.thread_path, magnets))
+                duplicate_total += len(magnets) - len(fresh)
+                record = thread_record(
+                    full_url,
+                    title=event.details.title,
+                    magnets=fresh,
+                    image_count=len(event.details.image_urls),
+                    fetch_seconds=event.details.fetch_seconds,
+                    page=event.page,
+                )
+                for sink in sinks.values():
+                    sink.write(record)
+                if fresh:
+                    magnet_total += len(fresh)
+                    job.add_magnets(fresh)
+                job.update_status(magnet_count=magnet_total, duplicate_count=duplicate_total)
+                checkpoint.mark_completed(event.page, event.thread_path)
+                save_checkpoint()
+
+            elif event.kind == 'images':
+                image_total += event.saved
+                if event.skipped:
+                    skipped_image_total += len(event.skipped)
+                    print(f'Skipped {len(event.skipped)} images while saving "{event.thread_path}"')
+                status_msg = f'Images saved: {image_total}'
+                if skipped_image_total:
+                    status_msg += f' (skipped {skipped_image_total})'
+                job.update_status(image_count=image_total, message=status_msg)
+
+            elif event.kind == 'page_done':
+                pages_done += 1
+                job.update_status(progress=pages_done)
+
+        if job.stop_event.is_set():
+            job.update_status(message='爬取已停止，可通过“恢复上次爬取”继续', current_url='')
+            save_checkpoint(force=True)
         else:
             msg = f'爬取完成！共获取 {magnet_total} 个磁力链接'
             if image_total > 0:
                 msg += f'，{image_total} 张图片'
             if skipped_image_total:
                 msg += f'，跳过 {skipped_image_total} 张图片'
-            update_status(message=msg, current_url='', progress=pages)
+            if duplicate_total:
+                msg += f'，去重跳过 {duplicate_total} 个重复磁力链接'
+            if known_total:
+                msg += f'，增量跳过 {known_total} 个已爬取帖子'
+            job.update_status(state='finished', message=msg, current_url='', progress=pages)
+            save_checkpoint(force=True)
+            checkpoint.finish()
 
-        if not stop_event.is_set():
             record_history({
                 'timestamp': timestamp,
+                'job_id': job.job_id,
                 'forum_id': forum_id,
                 'pages': pages,
                 'magnets': magnet_total,
+                'duplicates': duplicate_total,
                 'images': image_total,
                 'images_skipped': skipped_image_total,
                 'magnet_file': file_path,
                 'url_file': url_file_path,
+                'records_file': records_path,
                 'figures_dir': figures_dir
             })
 
     except Exception as e:
-        update_status(message=f'爬取过程中出错: {str(e)}', current_url='')
+        job.update_status(state='failed', message=f'爬取过程中出错: {str(e)}', current_url='')
+        save_checkpoint(force=True)
     finally:
-        update_status(running=False, paused=False)
-        pause_event.set()
-        crawl_thread_ref = None
+        events.close()
+        checkpoint.before_save = None
+        checkpoint.after_save = None
+        for sink in sinks.values():
+            sink.close()
+        job_crawler.close()
+        if profiler is not None:
+            # 按结束时间命名，恢复的任务不会覆盖上次的时间线
+            profile_path = f"data/profile_{datetime.datetime.now().strftime('%Y_%m_%d_%H_%M_%S')}_{job.job_id}.trace.json"
+            profiler.export_chrome_trace(profile_path)
+            job.update_status(profile_file=profile_path)
+
+
+def submit_job(params, resume_from=None, cookie=None, use_cache=False):
+    """
+    从共享爬虫派生本任务的爬虫并交给任务调度器
+    """
+    if resume_from is not None:
+        # 记下检查点路径：任务还在排队时也能据此识别重复的恢复请求
+        params = dict(params, checkpoint=resume_from.path)
+    changes = {
+        'base_url': params['base_url'].rstrip('/'),
+        'concurrency': params['concurrency'],
+        'image_workers': params['image_workers'],
+        'cache_dir': CACHE_DIR if use_cache else None,
+    }
+    if cookie:
+        changes['cookie'] = cookie
+    job_crawler = crawler.clone(**changes)
+    if job_crawler.cache is not None:
+        job_crawler.cache.reset_stats()
+
+    def run(job):
+        job.crawler = job_crawler
+        crawl_job(job, resume_from=resume_from)
+
+    # 任务实际占用的线程：1 个列表页线程、concurrency 个帖子线程，保存图片时再加 image_workers 个下载线程
+    cost = 1 + params['concurrency'] + (params['image_workers'] if params['save_images'] else 0)
+    job = jobs.submit(params, run, cost=cost)
+    job.crawler = job_crawler
+    return job
+
+
+def job_response(job, action, ok, success_message, error_message):
+    if job is None:
+        return {'status': 'error', 'message': '任务不存在'}
+    if not ok:
+        return {'status': 'error', 'message': error_message, 'job_id': job.job_id}
+    return {'status': 'success', 'message': success_message, 'job_id': job.job_id, 'action': action}
+
 
 @app.route('/')
 def index():
     return render_template('index.html')
 
 @app.route('/start_crawl', methods=['POST'])
+@app.route('/jobs', methods=['POST'])
 def start_crawl():
-    global crawl_thread_ref
-    if crawl_status['running']:
-        return {'status': 'error', 'message': '爬虫正在运行中，请稍后再试'}
-    
+    """
+    创建新的爬取任务；已有任务在运行时新任务并行执行或排队等待并发额度
+    """
     # 获取表单数据
     forum_id = request.form.get('forum_id', '103')  # 默认板块ID
     try:
@@ -253,42 +461,158 @@ def start_crawl():
     pages = max(1, min(20, pages))
     custom_cookie = request.form.get('cookie', '')  # 获取用户输入的Cookie
     save_images = request.form.get('save_images', 'false').lower() == 'true'  # 获取是否保存图片的选项
-    
-    base_url = request.form.get('base_url', crawler.config.base_url)
-    update_kwargs = {'base_url': base_url}
-    if custom_cookie.strip():
-        update_kwargs['cookie'] = custom_cookie.strip()
-    crawler.update_config(**update_kwargs)
-    reset_runtime_state()
-    pause_event.set()
-    stop_event.clear()
-    
-    # 构建URL模式
-    url_pattern = f"{crawler.config.base_url}/forum-{forum_id}-{{}}.html"
-    
-    # 启动爬虫线程
-    crawl_thread_ref = threading.Thread(
-        target=crawl_thread,
-        args=(crawler.config.base_url, url_pattern, pages, save_images, forum_id),
-        daemon=True,
-    )
-    crawl_thread_ref.start()
-    
-    return {'status': 'success', 'message': '爬虫已启动'}
+    try:
+        concurrency = int(request.form.get('concurrency', '4'))
+    except ValueError:
+        concurrency = 4
+    concurrency = max(1, min(16, concurrency))
+    try:
+        image_workers = int(request.form.get('image_workers', '2'))
+    except ValueError:
+        image_workers = 2
+    image_workers = max(1, min(16, image_workers))
+
+    use_cache = request.form.get('use_cache', 'false').lower() == 'true'
+    incremental = request.form.get('incremental', 'false').lower() == 'true'
+    profile = request.form.get('profile', 'false').lower() == 'true'
+
+    base_url = (request.form.get('base_url') or crawler.config.base_url).rstrip('/')
+    params = {
+        'base_url': base_url,
+        # 构建URL模式
+        'url_pattern': f"{base_url}/forum-{forum_id}-{{}}.html",
+        'pages': pages,
+        'save_images': save_images,
+        'forum_id': forum_id,
+        'concurrency': concurrency,
+        'image_workers': image_workers,
+        'incremental': incremental,
+        'profile': profile,
+    }
+    job = submit_job(params, cookie=custom_cookie.strip() or None, use_cache=use_cache)
+
+    return {'status': 'success', 'message': f'爬取任务 {job.job_id} 已创建', 'job_id': job.job_id}
+
+@app.route('/resume_last_run', methods=['POST'])
+def resume_last_run():
+    """
+    从最近一次未完成的检查点恢复爬取
+    """
+    checkpoint_path = latest_checkpoint('data')
+    if checkpoint_path is None:
+        return {'status': 'error', 'message': '没有可恢复的爬取记录'}
+    checkpoint = CrawlCheckpoint.load(checkpoint_path)
+    with resume_lock:
+        # 排队中的任务 running 也为 True
+        active = {job.params.get('checkpoint') for job in jobs.jobs() if job.running}
+        if checkpoint.path in active:
+            return {'status': 'error', 'message': '该爬取任务正在运行或排队中'}
+        job = submit_job(checkpoint.params['run'], resume_from=checkpoint)
+    return {
+        'status': 'success',
+        'message': f'已从 {os.path.basename(checkpoint_path)} 恢复爬取',
+        'job_id': job.job_id,
+    }
+
+@app.route('/jobs')
+def list_jobs():
+    return {
+        'jobs': [summarize_job(job) for job in jobs.jobs()],
+        'budget': jobs.budget,
+        'budget_in_use': jobs.budget_in_use(),
+    }
 
 @app.route('/crawl_status')
-def get_crawl_status():
-    return snapshot_status()
+@app.route('/jobs/<job_id>')
+def get_crawl_status(job_id=None):
+    job_id = job_id or request.args.get('job_id')
+    job = find_job(job_id)
+    if job_id and job is None:
+        return {'status': 'error', 'message': '任务不存在'}, 404
+    return snapshot_status(job)
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def stream_job_events(job_id=None):
+    """
+    推送任务进度的增量：先发送一次完整状态（reset），之后只发送变化的状态字段
+    以及新增的磁力链接和爬取地址。未指定 job_id 时跟随最新创建的任务。
+    """
+    yield 'retry: 3000\n\n'
+    job = None
+    sent = None
+    cursors = {}
+    version = -1
+    last_write = time.monotonic()
+    while True:
+        latest = find_job(job_id)
+        if sent is None or latest is not job:
+            job = latest
+            sent = snapshot_status(job)
+            cursors = {'magnets': 0, 'urls': 0}
+            version = -1
+            yield sse_event('reset', sent)
+            last_write = time.monotonic()
+
+        events = []
+        if job is not None:
+            new_version = job.wait_for_change(version, timeout=STREAM_TICK)
+            for kind in ('magnets', 'urls'):
+                page = job.results_page(kind, cursors[kind])
+                if page['items']:
+                    cursors[kind] = page['cursor']
+                    events.append(sse_event(kind, {'items': page['items'], 'cursor': page['cursor']}))
+            version = new_version
+        else:
+            time.sleep(STREAM_TICK)
+
+        status = snapshot_status(job)
+        delta = {key: value for key, value in status.items() if sent.get(key) != value}
+        if delta:
+            sent = status
+            events.append(sse_event('status', delta))
+
+        if events:
+            yield ''.join(events)
+            last_write = time.monotonic()
+            time.sleep(STREAM_MIN_INTERVAL)
+        elif time.monotonic() - last_write >= STREAM_KEEPALIVE:
+            # 注释行保持连接，也让断开的客户端尽快被发现
+            yield ': keepalive\n\n'
+            last_write = time.monotonic()
+
+
+@app.route('/crawl_stream')
+def crawl_stream():
+    """
+    Server-Sent Events 进度流，替代每秒轮询 /crawl_status 和全量结果列表
+    """
+    response = Response(
+        stream_with_context(stream_job_events(request.args.get('job_id'))),
+        mimetype='text/event-stream',
+    )
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/metrics')
+def metrics():
+    """
+    Prometheus 文本格式的指标：请求耗时直方图、字节数、状态码、解析耗时、队列深度和任务状态
+    """
+    return Response(crawler.metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
 
 @app.route('/update_image_cookie', methods=['POST'])
 def update_image_cookie():
     custom_cookie = request.form.get('cookie', '')
-    
+
     if custom_cookie.strip():
         crawler.update_config(image_cookie=custom_cookie.strip())
         return {
             'status': 'success',
-            'message': '图片下载Cookie已更新',
+            'message': '图片下载Cookie已更新（对之后创建的任务生效）',
             'current_cookie': crawler.config.image_cookie or ''
         }
     else:
@@ -299,58 +623,75 @@ def get_image_cookie():
     return {'current_cookie': crawler.config.image_cookie or ''}
 
 @app.route('/pause_crawl')
-def pause_crawl():
-    if crawl_status['running'] and not crawl_status['paused']:
-        pause_event.clear()
-        update_status(paused=True, message='爬取已暂停')
-        return {'status': 'success', 'message': '爬虫已暂停'}
-    return {'status': 'error', 'message': '爬虫未在运行或已暂停'}
+@app.route('/jobs/<job_id>/pause', methods=['POST'])
+def pause_crawl(job_id=None):
+    job = find_job(job_id or request.args.get('job_id'))
+    return job_response(job, 'pause', job is not None and job.pause(), '爬虫已暂停', '爬虫未在运行或已暂停')
 
 @app.route('/resume_crawl')
-def resume_crawl():
-    if crawl_status['running'] and crawl_status['paused']:
-        pause_event.set()
-        update_status(paused=False, message='爬取已恢复')
-        return {'status': 'success', 'message': '爬虫已恢复'}
-    return {'status': 'error', 'message': '爬虫未在运行或未暂停'}
+@app.route('/jobs/<job_id>/resume', methods=['POST'])
+def resume_crawl(job_id=None):
+    job = find_job(job_id or request.args.get('job_id'))
+    return job_response(job, 'resume', job is not None and job.resume(), '爬虫已恢复', '爬虫未在运行或未暂停')
 
 @app.route('/stop_crawl')
-def stop_crawl():
-    if crawl_status['running']:
-        stop_event.set()
-        pause_event.set()
-        update_status(paused=False, message='正在停止爬虫...')
-        return {'status': 'success', 'message': '停止命令已发送'}
-    return {'status': 'error', 'message': '爬虫未在运行'}
+@app.route('/jobs/<job_id>/stop', methods=['POST'])
+def stop_crawl(job_id=None):
+    job = find_job(job_id or request.args.get('job_id'))
+    return job_response(job, 'stop', job is not None and job.stop(), '停止命令已发送', '爬虫未在运行')
 
 @app.route('/download')
-def download_file():
-    global last_generated_file
-    if not last_generated_file or not os.path.exists(last_generated_file):
+@app.route('/jobs/<job_id>/download')
+def download_file(job_id=None):
+    job = find_job(job_id or request.args.get('job_id'))
+    path = job.snapshot()['magnet_file'] if job is not None else ''
+    if not path or not os.path.exists(path):
         return {'status': 'error', 'message': '没有可下载的磁力链接文件'}
-    
-    return send_file(last_generated_file, as_attachment=True)
+
+    return send_file(os.path.abspath(path), as_attachment=True)
 
 @app.route('/download_urls')
-def download_url_file():
-    global last_generated_url_file
-    if not last_generated_url_file or not os.path.exists(last_generated_url_file):
+@app.route('/jobs/<job_id>/download_urls')
+def download_url_file(job_id=None):
+    job = find_job(job_id or request.args.get('job_id'))
+    path = job.snapshot()['url_file'] if job is not None else ''
+    if not path or not os.path.exists(path):
         return {'status': 'error', 'message': '没有可下载的爬取地址文件'}
-    
-    return send_file(last_generated_url_file, as_attachment=True)
+
+    return send_file(os.path.abspath(path), as_attachment=True)
+
+@app.route('/download_records')
+@app.route('/jobs/<job_id>/download_records')
+def download_records_file(job_id=None):
+    job = find_job(job_id or request.args.get('job_id'))
+    path = job.snapshot()['records_file'] if job is not None else ''
+    if not path or not os.path.exists(path):
+        return {'status': 'error', 'message': '没有可下载的结构化记录文件'}
+
+    return send_file(os.path.abspath(path), as_attachment=True)
+
+@app.route('/download_profile')
+@app.route('/jobs/<job_id>/download_profile')
+def download_profile_file(job_id=None):
+    job = find_job(job_id or request.args.get('job_id'))
+    path = job.snapshot()['profile_file'] if job is not None else ''
+    if not path or not os.path.exists(path):
+        return {'status': 'error', 'message': '没有可下载的性能时间线（启动任务时勾选“性能分析”）'}
+
+    return send_file(os.path.abspath(path), as_attachment=True)
 
 @app.route('/update_cookie', methods=['POST'])
 def update_cookie():
     """
-    更新当前使用的Cookie
+    更新当前使用的Cookie（对之后创建的任务生效）
     """
     custom_cookie = request.form.get('cookie', '')
-    
+
     if not custom_cookie.strip():
         return {'status': 'error', 'message': 'Cookie值不能为空'}
-    
+
     crawler.update_config(cookie=custom_cookie.strip())
-    
+
     return {'status': 'success', 'message': 'Cookie更新成功'}
 
 @app.route('/get_current_cookie')
@@ -360,23 +701,51 @@ def get_current_cookie():
     """
     return {'status': 'success', 'cookie': crawler.config.cookie or ''}
 
+def results_response(kind, job_id=None, paged=False):
+    """
+    按游标分页返回任务结果：?since=<游标>&limit=<条数>，响应中的 cursor 即下次请求的 since。
+    服务端只保留每个任务最新的 JOB_RESULT_BUFFER 条，游标早于保留范围时 truncated 为 true。
+    旧接口不带 since/limit 时仍返回纯列表（内存中保留的全部条目）。
+    """
+    job = find_job(job_id or request.args.get('job_id'))
+    since = request.args.get('since', type=int)
+    limit = request.args.get('limit', type=int)
+    paged = paged or since is not None or limit is not None
+    if not paged:
+        return job.results_page(kind)['items'] if job is not None else []
+    if job is None:
+        return {'status': 'error', 'message': '任务不存在'}, 404
+    limit = max(1, min(PAGE_LIMIT_MAX, limit or PAGE_LIMIT_MAX))
+    page = job.results_page(kind, since or 0, limit)
+    page['job_id'] = job.job_id
+    return page
+
 @app.route('/get_magnet_links')
 def get_magnet_links():
     """
-    获取当前爬取的所有磁力链接
+    获取任务爬取到的磁力链接（默认最近的任务）
     """
-    return current_magnet_links
+    return results_response('magnets')
 
 @app.route('/get_crawl_urls')
 def get_crawl_urls():
     """
-    获取当前爬取的所有地址
+    获取任务爬取过的地址（默认最近的任务）
     """
-    return current_crawl_urls
+    return results_response('urls')
+
+@app.route('/jobs/<job_id>/magnets')
+def get_job_magnets(job_id):
+    return results_response('magnets', job_id, paged=True)
+
+@app.route('/jobs/<job_id>/urls')
+def get_job_urls(job_id):
+    return results_response('urls', job_id, paged=True)
 
 @app.route('/crawl_history')
 def get_crawl_history():
-    return {'history': list(crawl_history)}
+    with history_lock:
+        return {'history': list(crawl_history)}
 
 if __name__ == '__main__':
     app.run(debug=True)
@@ -0,0 +1,379 @@
+# -*- coding: utf-8 -*-
+"""End-to-end crawl benchmark against a local mock Discuz forum (no external network).
+
+Starts an HTTP server that generates ``forum-<id>-<page>.html`` listings,
+``thread-<tid>-1-1.html`` pages, and image payloads with configurable
+latency and error rate, runs ``CrawlSHT.crawl_forum`` and a bare
+``ForumCrawler.iter_forum`` loop against it, and writes pages/s, threads/s, MB/s,
+parse time, and peak memory as JSON so versions can be compared.
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import platform
+import random
+import re
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import CrawlSHT
+from crawler_core import CrawlerConfig, ForumCrawler
+
+FORUM_RE = re.compile(r"^/forum-(\d+)-(\d+)\.html$")
+THREAD_RE = re.compile(r"^/thread-(\d+)-1-1\.html$")
+IMAGE_RE = re.compile(r"^/data/attachment/(\d+)_(\d+)\.jpg$")
+
+# metrics compared by --compare; True where a larger value is better
+COMPARED_METRICS = {
+    "pages_per_sec": True,
+    "threads_per_sec": True,
+    "mb_per_sec": True,
+    "parse_ms_per_page": False,
+    "peak_memory_mb": False,
+    "seconds": False,
+}
+
+
+class MockForum:
+    """Deterministic synthetic forum content plus request/byte counters."""
+
+    def __init__(
+        self,
+        pages: int = 5,
+        threads_per_page: int = 30,
+        magnets: int = 3,
+        images: int = 4,
+        image_bytes: int = 20_000,
+        filler_posts: int = 40,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        seed: int = 1,
+    ):
+        self.pages = pages
+        self.threads_per_page = threads_per_page
+        self.magnets = magnets
+        self.images = images
+        self.image_bytes = image_bytes
+        self.filler_posts = filler_posts
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.reset_counters()
+
+    def reset_counters(self) -> None:
+        with self._lock:
+            self.counters = {"forum": 0, "thread": 0, "image": 0, "errors": 0, "bytes": 0}
+
+    def _count(self, kind: str, size: int) -> None:
+        with self._lock:
+            self.counters[kind] += 1
+            self.counters["bytes"] += size
+
+    def _delay_and_fail(self) -> bool:
+        """Sleep the configured latency; return True when this request should fail."""
+        with self._lock:
+            delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+            fail = self._random.random() < self.error_rate
+        if delay:
+            time.sleep(delay)
+        return fail
+
+    def forum_page(self, forum_id: int, page: int) -> bytes:
+        count = self.threads_per_page if 1 <= page <= self.pages else 0
+        rows = "".join(
+            f'<tr><th><a href="thread-{page * 10000 + i}-1-1.html" class="s xst">帖子标题 {page}-{i}</a>'
+            f'<a href="home.php?mod=space&uid={i}">user{i}</a></th><td>{i}</td></tr>'
+            for i in range(count)
+        )
+        nav = "".join(f'<li><a href="forum-{forum_id}-{p}.html">{p}</a></li>' for p in range(1, self.pages + 1))
+        return (
+            '<html><head><meta charset="utf-8"><title>论坛列表</title></head><body>'
+            f"<ul>{nav}</ul><table>{rows}</table></body></html>"
+        ).encode("utf-8")
+
+    def thread_page(self, tid: int) -> bytes:
+        posts = "".join(
+            f'<div class="pl"><table><tr><td class="t_f">回复内容 {i} ' + "文字" * 80 + "</td></tr></table>"
+            f'<ul><li><a href="home.php?uid={i}">user{i}</a></li><li>积分 {i}</li></ul></div>'
+            for i in range(self.filler_posts)
+        )
+        magnet_items = "".join(f"<li>magnet:?xt=urn:btih:{tid:020d}{i:020d}</li>" for i in range(self.magnets))
+        image_tags = "".join(f'<img file="data/attachment/{tid}_{i}.jpg">' for i in range(self.images))
+        return (
+            f'<html><head><meta charset="utf-8"><title>磁力合集 {tid}</title></head><body>'
+            f"{posts}<ul>{magnet_items}</ul>{image_tags}</body></html>"
+        ).encode("utf-8")
+
+    def image(self, tid: int, index: int) -> bytes:
+        header = b"\xff\xd8\xff\xe0" + f"{tid}-{index}".encode()
+        return header + b"\0" * max(0, self.image_bytes - len(header))
+
+    def handler(self):
+        forum = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                # headers and body go out as two writes; without this Nagle adds ~40 ms per response
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+            def do_GET(self):
+                path = self.path.split("?", 1)[0]
+                if forum._delay_and_fail():
+                    forum._count("errors", 0)
+                    self._send(500, b"mock error", "text/plain")
+                    return
+                if match := FORUM_RE.match(path):
+                    body = forum.forum_page(int(match[1]), int(match[2]))
+                    forum._count("forum", len(body))
+                    self._send(200, body, "text/html; charset=utf-8")
+                elif match := THREAD_RE.match(path):
+                    body = forum.thread_page(int(match[1]))
+                    forum._count("thread", len(body))
+                    self._send(200, body, "text/html; charset=utf-8")
+                elif match := IMAGE_RE.match(path):
+                    body = forum.image(int(match[1]), int(match[2]))
+                    forum._count("image", len(body))
+                    self._send(200, body, "image/jpeg")
+                else:
+                    self._send(404, b"not found", "text/plain")
+
+            def _send(self, status: int, body: bytes, content_type: str) -> None:
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+@contextlib.contextmanager
+def serve(forum: MockForum):
+    """Run the mock forum on an ephemeral localhost port and yield its base URL."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), forum.handler())
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@contextlib.contextmanager
+def parse_timer():
+    """Sum the thread-page parse time of every ForumCrawler while the block runs."""
+    totals = {"seconds": 0.0, "count": 0}
+    lock = threading.Lock()
+    original = ForumCrawler._parse_thread
+
+    def timed(self, html, thread_url):
+        parsed, seconds = original(self, html, thread_url)
+        with lock:
+            totals["seconds"] += seconds
+            totals["count"] += 1
+        return parsed, seconds
+
+    ForumCrawler._parse_thread = timed
+    try:
+        yield totals
+    finally:
+        ForumCrawler._parse_thread = original
+
+
+def measure(forum: MockForum, run, trace_memory: bool) -> dict:
+    """Run ``run()`` once and turn the server counters into throughput metrics."""
+    forum.reset_counters()
+    if trace_memory:
+        tracemalloc.start()
+    with parse_timer() as parse, contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        run()
+        seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] if trace_memory else 0
+    if trace_memory:
+        tracemalloc.stop()
+    counters = dict(forum.counters)
+    return {
+        "seconds": round(seconds, 3),
+        "forum_pages": counters["forum"],
+        "threads": counters["thread"],
+        "images": counters["image"],
+        "errors": counters["errors"],
+        "megabytes": round(counters["bytes"] / 1e6, 3),
+        "pages_per_sec": round(counters["forum"] / seconds, 2),
+        "threads_per_sec": round(counters["thread"] / seconds, 2),
+        "mb_per_sec": round(counters["bytes"] / 1e6 / seconds, 3),
+        "parse_ms_per_page": round(parse["seconds"] / parse["count"] * 1000, 3) if parse["count"] else None,
+        "peak_memory_mb": round(peak / 1e6, 2) if trace_memory else None,
+    }
+
+
+def crawl_forum_target(args: argparse.Namespace, base_url: str, workdir: Path):
+    argv = [
+        "--base-url", base_url,
+        "--forum-id", str(args.forum_id),
+        "--start-page", "1",
+        "--end-page", str(args.pages),
+        "--output", str(workdir / "magnets.txt"),
+        "--checkpoint", str(workdir / "checkpoint.json"),
+        "--no-dedup",
+        "--rate-limit", str(args.rate_limit),
+        "--concurrency", str(args.concurrency),
+        "--image-workers", str(args.image_workers),
+        "--parse-workers", str(args.parse_workers),
+        "--max-retries", str(args.max_retries),
+        "--parser", args.parser,
+    ]
+    if args.images:
+        argv += ["--save-images", "--figures-dir", str(workdir / "figures_cli")]
+    cli_args = CrawlSHT.build_parser().parse_args(argv)
+    return lambda: CrawlSHT.crawl_forum(cli_args)
+
+
+def forum_crawler_target(args: argparse.Namespace, base_url: str, workdir: Path):
+    def run() -> None:
+        crawler = ForumCrawler(CrawlerConfig(
+            base_url=base_url,
+            concurrency=args.concurrency,
+            image_workers=args.image_workers,
+            parser_backend=args.parser,
+            rate_limit=args.rate_limit,
+            max_retries=args.max_retries,
+            parse_workers=args.parse_workers,
+        ))
+        image_root = str(workdir / "figures_lib") if args.images else None
+        try:
+            for _ in crawler.iter_forum(str(args.forum_id), 1, args.pages, image_root=image_root, image_workers=1):
+                pass
+        finally:
+            crawler.close()
+
+    return run
+
+
+TARGETS = {"crawl_forum": crawl_forum_target, "forum_crawler": forum_crawler_target}
+
+
+def git_revision() -> str | None:
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5,
+            cwd=Path(__file__).resolve().parent,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return result.stdout.strip() or None
+
+
+def compare(previous: dict, current: dict) -> None:
+    print(f"\n对比 {previous.get('revision') or '?'} -> {current.get('revision') or '?'}")
+    for target, metrics in current["results"].items():
+        old = previous.get("results", {}).get(target)
+        if not old:
+            continue
+        print(f"[{target}]")
+        for name, higher_is_better in COMPARED_METRICS.items():
+            before, after = old.get(name), metrics.get(name)
+            if not before or after is None:
+                continue
+            change = (after - before) / before * 100
+            worse = change < 0 if higher_is_better else change > 0
+            flag = "  <- 变差" if worse and abs(change) >= 10 else ""
+            print(f"  {name:<18}{before:>10}{after:>10}{change:>+9.1f}%{flag}")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="本地模拟论坛上的端到端爬取基准")
+    parser.add_argument("--pages", type=int, default=5, help="论坛页数")
+    parser.add_argument("--threads-per-page", type=int, default=30, help="每页帖子数")
+    parser.add_argument("--magnets", type=int, default=3, help="每个帖子的磁力链接数")
+    parser.add_argument("--images", type=int, default=0, help="每个帖子的图片数（大于 0 时同时测图片下载）")
+    parser.add_argument("--image-bytes", type=int, default=20_000, help="每张图片的字节数")
+    parser.add_argument("--filler-posts", type=int, default=40, help="每个帖子页的回复数（控制页面大小）")
+    parser.add_argument("--latency", type=float, default=0.0, help="每个请求的平均延迟（秒）")
+    parser.add_argument("--jitter", type=float, default=0.0, help="延迟的随机浮动范围（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="返回 500 的请求比例")
+    parser.add_argument("--seed", type=int, default=1, help="延迟与错误的随机种子")
+    parser.add_argument("--forum-id", type=int, default=2, help="论坛板块ID")
+    parser.add_argument("--concurrency", type=int, default=4, help="帖子抓取线程数")
+    parser.add_argument("--image-workers", type=int, default=4, help="图片下载线程数")
+    parser.add_argument("--parse-workers", type=int, default=0, help="解析进程数")
+    parser.add_argument("--parser", default="lxml", help="HTML 解析后端")
+    parser.add_argument(
+        "--rate-limit", type=float, default=0, help="每主机请求速率（默认 0 不限速，测的是爬虫本身）"
+    )
+    parser.add_argument("--max-retries", type=int, default=3, help="失败请求的最大重试次数")
+    parser.add_argument("--target", choices=sorted(TARGETS), action="append", help="只运行指定目标（可重复）")
+    parser.add_argument("--no-tracemalloc", action="store_true", help="不统计峰值内存（tracemalloc 会拖慢运行）")
+    parser.add_argument("--output", help="结果 JSON 路径（默认 data/bench/bench_<时间>.json）")
+    parser.add_argument("--compare", help="与之前保存的结果 JSON 对比")
+    return parser
+
+
+def main() -> None:
+    args = build_parser().parse_args()
+    forum = MockForum(
+        pages=args.pages,
+        threads_per_page=args.threads_per_page,
+        magnets=args.magnets,
+        images=args.images,
+        image_bytes=args.image_bytes,
+        filler_posts=args.filler_posts,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        seed=args.seed,
+    )
+    report = {
+        "created_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        "results": {},
+    }
+
+    with serve(forum) as base_url, tempfile.TemporaryDirectory() as tmp:
+        for name in args.target or sorted(TARGETS):
+            run = TARGETS[name](args, base_url, Path(tmp) / name)
+            metrics = measure(forum, run, trace_memory=not args.no_tracemalloc)
+            report["results"][name] = metrics
+            print(
+                f"{name:<14}{metrics['seconds']:>8.2f}s  {metrics['pages_per_sec']:>7.2f} 页/s  "
+                f"{metrics['threads_per_sec']:>8.2f} 帖/s  {metrics['mb_per_sec']:>7.2f} MB/s  "
+                f"解析 {metrics['parse_ms_per_page']} ms/页  峰值内存 {metrics['peak_memory_mb']} MB"
+            )
+
+    timestamp = datetime.datetime.now().strftime("%Y_%m_%d_%H_%M_%S")
+    output = Path(args.output) if args.output else Path("data") / "bench" / f"bench_{timestamp}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, ensure_ascii=False, indent=1), encoding="utf-8")
+    print(f"结果已保存: {output}")
+
+    if args.compare:
+        compare(json.loads(Path(args.compare).read_text(encoding="utf-8")), report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""Compare the HTML parser backends on synthetic Discuz-style pages (no network)."""
+
+from __future__ import annotations
+
+import argparse
+import time
+
+from crawler_core import PARSER_BACKENDS, extract_thread_paths, parse_thread_html
+
+
+def build_forum_page(threads: int = 50) -> bytes:
+    rows = "".join(
+        f'<tr><th><a href="thread-{3180000 + i}-1-1.html" class="s xst">帖子标题 {i}</a>'
+        f'<a href="home.php?mod=space&uid={i}">user{i}</a></th><td>{i}</td></tr>'
+        for i in range(threads)
+    )
+    nav = "".join(f'<li><a href="forum-103-{p}.html">{p}</a></li>' for p in range(1, 30))
+    return (
+        '<html><head><meta charset="utf-8"><title>论坛列表</title></head><body>'
+        f"<ul>{nav}</ul><table>{rows}</table></body></html>"
+    ).encode("utf-8")
+
+
+def build_thread_page(magnets: int = 3, images: int = 30, filler_posts: int = 40) -> bytes:
+    posts = "".join(
+        f'<div class="pl"><table><tr><td class="t_f">回复内容 {i} ' + "文字" * 80 + "</td></tr></table>"
+        f'<ul><li><a href="home.php?uid={i}">user{i}</a></li><li>积分 {i}</li></ul></div>'
+        for i in range(filler_posts)
+    )
+    magnet_items = "".join(
+        f"<li>magnet:?xt=urn:btih:{i:040d}</li>" for i in range(magnets)
+    )
+    image_tags = "".join(
+        f'<img src="static/image/smiley/{i}.gif"><img file="https://img.example.com/{i}.jpg">'
+        for i in range(images)
+    )
+    return (
+        '<html><head><meta charset="utf-8"><title>磁力合集 精选</title></head><body>'
+        f"{posts}<ul>{magnet_items}</ul>{image_tags}</body></html>"
+    ).encode("utf-8")
+
+
+def time_backend(func, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    return (time.perf_counter() - start) / rounds * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="解析后端性能对比")
+    parser.add_argument("--rounds", type=int, default=50, help="每个后端的重复次数")
+    args = parser.parse_args()
+
+    forum_html = build_forum_page()
+    thread_html = build_thread_page()
+    thread_url = "https://example.com/thread-1-1-1.html"
+
+    baseline = parse_thread_html(thread_html, thread_url, "soup")[:2]
+    results = {}
+    for backend in PARSER_BACKENDS:
+        assert parse_thread_html(thread_html, thread_url, backend)[:2] == baseline, backend
+        assert extract_thread_paths(forum_html, backend) == extract_thread_paths(forum_html)
+        forum_ms = time_backend(lambda: extract_thread_paths(forum_html, backend), args.rounds)
+        thread_ms = time_backend(lambda: parse_thread_html(thread_html, thread_url, backend), args.rounds)
+        results[backend] = (forum_ms, thread_ms)
+
+    base_forum, base_thread = results["soup"]
+    print(f"{'backend':<10}{'forum ms':>10}{'thread ms':>11}{'speedup':>9}")
+    for backend, (forum_ms, thread_ms) in results.items():
+        speedup = (base_forum + base_thread) / (forum_ms + thread_ms)
+        print(f"{backend:<10}{forum_ms:>10.2f}{thread_ms:>11.2f}{speedup:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""Resumable crawl checkpoints: page cursor, pending threads, and output offsets."""
+
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+CHECKPOINT_GLOB = "checkpoint_*.json"
+
+
+@dataclass
+class CrawlCheckpoint:
+    """Progress of one crawl run, periodically written to ``path`` as JSON.
+
+    ``next_page`` is the first forum page not yet listed and ``pending`` maps
+    listed pages to the threads that still have to be crawled. ``outputs``
+    records how many bytes of each output file were known to be complete at
+    the last save, so ``repair_outputs`` can cut off whatever came after it.
+    ``params`` and ``counters`` are opaque to this module: the entry points
+    store their run arguments and running totals there.
+    """
+
+    path: str
+    next_page: int
+    end_page: int
+    pending: Dict[str, List[str]] = field(default_factory=dict)
+    completed: List[str] = field(default_factory=list)
+    outputs: Dict[str, int] = field(default_factory=dict)
+    params: dict = field(default_factory=dict)
+    counters: Dict[str, int] = field(default_factory=dict)
+    finished: bool = False
+    updated_at: float = 0.0
+    save_every: int = field(default=10, repr=False)
+    save_interval: float = field(default=5.0, repr=False)
+
+    def __post_init__(self) -> None:
+        self._lock = threading.Lock()
+        self._completed_set = set(self.completed)
+        self._dirty = 0
+        self._last_save = time.monotonic()
+        # called before every save, e.g. to flush buffered outputs and record their sizes
+        self.before_save = None
+        # called once a save is on disk, e.g. to commit what the saved outputs hold
+        self.after_save = None
+
+    @classmethod
+    def load(cls, path: str) -> "CrawlCheckpoint":
+        data = json.loads(Path(path).read_text(encoding="utf-8"))
+        data["path"] = path
+        return cls(**data)
+
+    def pending_threads(self) -> list[tuple[int, list[str]]]:
+        """Threads listed before the interruption but not completed, by page."""
+        return [(int(page), list(paths)) for page, paths in sorted(self.pending.items(), key=lambda item: int(item[0]))]
+
+    def is_completed(self, thread_path: str) -> bool:
+        return thread_path in self._completed_set
+
+    def mark_listed(self, page: int, thread_paths: Sequence[str]) -> None:
+        with self._lock:
+            remaining = [path for path in thread_paths if path not in self._completed_set]
+            if remaining:
+                self.pending[str(page)] = remaining
+            self.next_page = max(self.next_page, page + 1)
+            self._dirty += 1
+
+    def mark_completed(self, page: int, thread_path: str) -> None:
+        with self._lock:
+            if thread_path not in self._completed_set:
+                self._completed_set.add(thread_path)
+                self.completed.append(thread_path)
+            remaining = self.pending.get(str(page))
+            if remaining is not None:
+                if thread_path in remaining:
+                    remaining.remove(thread_path)
+                if not remaining:
+                    del self.pending[str(page)]
+            self._dirty += 1
+
+    def record_output(self, path: str, offset: int | None = None) -> None:
+        """Remember the committed size of an output file (defaults to its current size)."""
+        if offset is None:
+            offset = os.path.getsize(path) if os.path.exists(path) else 0
+        with self._lock:
+            self.outputs[path] = offset
+
+    def maybe_save(self) -> bool:
+        """Save when enough updates or time have accumulated since the last save."""
+        with self._lock:
+            due = self._dirty >= self.save_every or (
+                self._dirty and time.monotonic() - self._last_save >= self.save_interval
+            )
+        if due:
+            self.save()
+        return due
+
+    def save(self) -> None:
+        if self.before_save is not None:
+            self.before_save()
+        with self._lock:
+            self.updated_at = time.time()
+            data = {
+                key: value
+                for key, value in asdict(self).items()
+                if key not in ("path", "save_every", "save_interval")
+            }
+            payload = json.dumps(data, ensure_ascii=False, indent=1)
+            self._dirty = 0
+            self._last_save = time.monotonic()
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_name = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as handle:
+            handle.write(payload)
+        os.replace(temp_name, self.path)
+        if self.after_save is not None:
+            self.after_save()
+
+    def finish(self) -> None:
+        self.finished = True
+        self.save()
+
+    def repair_outputs(self) -> None:
+        """Cut every output back to its size at the last checkpoint.
+
+        Whatever was written after it belongs to threads the checkpoint
+        still lists as pending. Those threads are crawled again on resume,
+        and their magnets were never committed to the de-duplication store,
+        so keeping the lines would write them twice.
+        """
+        for path, offset in self.outputs.items():
+            if os.path.exists(path) and os.path.getsize(path) > offset:
+                os.truncate(path, offset)
+
+
+def latest_checkpoint(directory: str = "data") -> str | None:
+    """Return the most recently updated unfinished checkpoint in directory."""
+    candidates = []
+    for path in Path(directory).glob(CHECKPOINT_GLOB):
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            continue
+        if not data.get("finished"):
+            candidates.append((data.get("updated_at", 0.0), str(path)))
+    return max(candidates)[1] if candidates else None
+
+
+__all__ = ["CHECKPOINT_GLOB", "CrawlCheckpoint", "latest_checkpoint"]
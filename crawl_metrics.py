@@ -0,0 +1,212 @@
+"""In-process crawl metrics: latency histograms, counters, and queue-depth gauges.
+
+A ``CrawlMetrics`` registry is owned by a ForumCrawler (and shared by its
+clones). It renders the Prometheus text exposition format for the Flask
+``/metrics`` endpoint and a JSON-friendly summary for the CLI.
+"""
+
+from __future__ import annotations
+
+import bisect
+import itertools
+import threading
+from typing import Callable, Dict, Tuple
+
+# upper bounds in seconds, tuned for request latencies from ~5 ms to a slow 30 s image
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict[str, object]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(labels: Labels, extra: Tuple[str, str] | None = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (
+        (key, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for key, value in pairs
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+class _Histogram:
+    __slots__ = ("counts", "count", "sum", "max")
+
+    def __init__(self, size: int):
+        self.counts = [0] * size
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def quantile(self, buckets: Tuple[float, ...], q: float) -> float | None:
+        """Estimate a quantile by linear interpolation inside the bucket that holds it."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        lower = 0.0
+        for upper, count in zip(buckets, self.counts):
+            if count and seen + count >= rank:
+                upper = min(upper, self.max)
+                return lower + max(0.0, upper - lower) * (rank - seen) / count
+            seen += count
+            lower = upper
+        return self.max
+
+
+class CrawlMetrics:
+    """Thread-safe registry of histograms, counters, and gauge callbacks."""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._help: Dict[str, str] = {}
+        self._histograms: Dict[str, Dict[Labels, _Histogram]] = {}
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._gauges: Dict[str, Dict[int, Tuple[Labels, Callable[[], float]]]] = {}
+        self._gauge_ids = itertools.count(1)
+
+    def describe(self, name: str, text: str) -> None:
+        self._help[name] = text
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        key = _labels(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = _Histogram(len(self.buckets) + 1)
+            histogram.counts[bisect.bisect_left(self.buckets, value)] += 1
+            histogram.count += 1
+            histogram.sum += value
+            histogram.max = max(histogram.max, value)
+
+    def inc(self, name: str, amount: float = 1, **labels) -> None:
+        key = _labels(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    def add_gauge(self, name: str, read: Callable[[], float], **labels) -> int:
+        """Register a callback read at scrape time; same-labelled gauges are summed. Returns a handle."""
+        handle = next(self._gauge_ids)
+        with self._lock:
+            self._gauges.setdefault(name, {})[handle] = (_labels(labels), read)
+        return handle
+
+    def remove_gauge(self, name: str, handle: int) -> None:
+        with self._lock:
+            self._gauges.get(name, {}).pop(handle, None)
+
+    # -- crawler hooks -------------------------------------------------
+
+    def observe_request(self, kind: str, status: int | None, seconds: float) -> None:
+        """One HTTP attempt of ``kind`` (forum/thread/image); status None means no response."""
+        self.observe("crawler_request_seconds", seconds, kind=kind)
+        self.inc("crawler_responses_total", kind=kind, status=status if status is not None else "error")
+
+    def observe_bytes(self, kind: str, size: int) -> None:
+        self.inc("crawler_response_bytes_total", size, kind=kind)
+
+    def observe_parse(self, kind: str, seconds: float) -> None:
+        self.observe("crawler_parse_seconds", seconds, kind=kind)
+
+    # -- export --------------------------------------------------------
+
+    def _read_gauges(self) -> Dict[str, Dict[Labels, float]]:
+        with self._lock:
+            gauges = {name: list(series.values()) for name, series in self._gauges.items()}
+        values: Dict[str, Dict[Labels, float]] = {}
+        for name, series in gauges.items():
+            for labels, read in series:
+                try:
+                    value = float(read())
+                except Exception:  # a gauge whose owner is shutting down
+                    continue
+                values.setdefault(name, {})
+                values[name][labels] = values[name].get(labels, 0.0) + value
+        return values
+
+    def render_prometheus(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        gauges = self._read_gauges()
+        lines: list[str] = []
+        with self._lock:
+            for name, series in sorted(self._histograms.items()):
+                lines += self._header(name, "histogram")
+                for labels, histogram in sorted(series.items()):
+                    cumulative = 0
+                    for upper, count in zip(self.buckets, histogram.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_format_labels(labels, ('le', repr(upper)))} {cumulative}")
+                    lines.append(f"{name}_bucket{_format_labels(labels, ('le', '+Inf'))} {histogram.count}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {histogram.sum:.6f}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+            for name, series in sorted(self._counters.items()):
+                lines += self._header(name, "counter")
+                lines += [f"{name}{_format_labels(labels)} {value:g}" for labels, value in sorted(series.items())]
+        for name, series in sorted(gauges.items()):
+            lines += self._header(name, "gauge")
+            lines += [f"{name}{_format_labels(labels)} {value:g}" for labels, value in sorted(series.items())]
+        return "\n".join(lines) + "\n"
+
+    def _header(self, name: str, kind: str) -> list[str]:
+        text = self._help.get(name)
+        return ([f"# HELP {name} {text}"] if text else []) + [f"# TYPE {name} {kind}"]
+
+    def summary(self) -> dict:
+        """Histograms as count/mean/p50/p95/max, counters and gauges as plain numbers, keyed by label values."""
+
+        def key(labels: Labels) -> str:
+            return ",".join(f"{name}={value}" for name, value in labels) or "all"
+
+        gauges = self._read_gauges()
+        with self._lock:
+            result: dict = {}
+            for name, series in self._histograms.items():
+                result[name] = {
+                    key(labels): {
+                        "count": histogram.count,
+                        "sum": round(histogram.sum, 4),
+                        "mean": round(histogram.sum / histogram.count, 4) if histogram.count else None,
+                        "p50": _round(histogram.quantile(self.buckets, 0.5)),
+                        "p95": _round(histogram.quantile(self.buckets, 0.95)),
+                        "max": round(histogram.max, 4),
+                    }
+                    for labels, histogram in series.items()
+                }
+            for name, series in self._counters.items():
+                result[name] = {key(labels): value for labels, value in series.items()}
+        for name, series in gauges.items():
+            result[name] = {key(labels): value for labels, value in series.items()}
+        return result
+
+
+def _round(value: float | None) -> float | None:
+    return round(value, 4) if value is not None else None
+
+
+# help text for the series the crawler itself emits
+CRAWLER_METRIC_HELP = {
+    "crawler_request_seconds": "HTTP request latency per attempt, by request kind",
+    "crawler_responses_total": "HTTP responses per request kind and status code (error = no response)",
+    "crawler_response_bytes_total": "Response body bytes read, by request kind",
+    "crawler_parse_seconds": "HTML parse time, by page kind",
+    "crawler_queue_depth": "Items waiting in the crawl pipeline queues",
+    "crawler_connections_opened_total": "New HTTP connections opened (DNS + TCP + TLS), by host; low next to requests means keep-alive works",
+    "crawler_images_filtered_total": "Images skipped by the image filter before download, by rule (url/size/dimensions)",
+}
+
+
+def new_crawler_metrics() -> CrawlMetrics:
+    metrics = CrawlMetrics()
+    for name, text in CRAWLER_METRIC_HELP.items():
+        metrics.describe(name, text)
+    return metrics
+
+
+__all__ = ["DEFAULT_BUCKETS", "CRAWLER_METRIC_HELP", "CrawlMetrics", "new_crawler_metrics"]
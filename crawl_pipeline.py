@@ -0,0 +1,351 @@
+"""Staged crawl pipeline: list forum pages -> fetch threads -> download images -> write outputs."""
+
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List, Sequence
+
+import requests
+
+from crawler_core import ForumCrawler, ThreadDetails, sanitize_name
+
+_DONE = object()
+
+
+@dataclass
+class PipelineEvent:
+    """Item delivered to the output stage.
+
+    ``kind`` is one of ``"page"`` (a forum page was listed), ``"thread"``
+    (a thread was fetched and parsed), ``"images"`` (a thread's images were
+    saved) or ``"page_done"`` (every thread of a page has been parsed).
+    """
+
+    kind: str
+    page: int
+    forum_url: str = ""
+    thread_path: str = ""
+    thread_paths: List[str] = field(default_factory=list)
+    details: ThreadDetails | None = None
+    error: Exception | None = None
+    saved: int = 0
+    skipped: List[str] = field(default_factory=list)
+    # incremental crawls: threads dropped by thread_filter, and whether the
+    # page held only known threads (which ends paging)
+    known: int = 0
+    exhausted: bool = False
+
+
+@dataclass
+class _PageState:
+    remaining: int
+    listed: bool = False
+
+
+class CrawlPipeline:
+    """Run the crawl stages concurrently, connected by bounded queues.
+
+    Every stage has its own worker pool. A full queue blocks the upstream
+    stage, so the listing stage only runs ``queue_size`` threads ahead of the
+    parsers, while the deeper image queue keeps slow downloads from holding
+    up magnet extraction. The output stage runs in the caller's thread:
+    ``run`` yields ``PipelineEvent`` objects so files and status can be
+    written without extra locking. Forum pages are fed in as the listing
+    stage takes them and a page's bookkeeping is dropped once it is done,
+    so memory does not grow with the number of pages.
+    """
+
+    def __init__(
+        self,
+        crawler: ForumCrawler,
+        *,
+        page_workers: int = 1,
+        thread_workers: int = 4,
+        image_workers: int = 2,
+        queue_size: int = 64,
+        image_queue_size: int = 1024,
+        page_delay: float = 0.0,
+        image_root: str | None = None,
+        should_stop: Callable[[], bool] | None = None,
+        wait_if_paused: Callable[[], object] | None = None,
+        thread_filter: Callable[[List[str]], List[str]] | None = None,
+    ):
+        self.crawler = crawler
+        self.page_workers = max(1, page_workers)
+        self.thread_workers = max(1, thread_workers)
+        self.image_workers = max(1, image_workers)
+        self.queue_size = max(1, queue_size)
+        # image tasks are only URL lists; a deeper queue keeps slow downloads
+        # from pushing back on the thread parsers
+        self.image_queue_size = max(self.queue_size, image_queue_size)
+        self.page_delay = page_delay
+        self.image_root = image_root
+        self._should_stop = should_stop or (lambda: False)
+        self._wait_if_paused = wait_if_paused or (lambda: None)
+        self._thread_filter = thread_filter
+        # first page whose threads were all filtered out; later pages are skipped
+        self._exhausted_page: int | None = None
+        self._cancelled = threading.Event()
+        self._pages: dict[int, _PageState] = {}
+        self._pages_lock = threading.Lock()
+
+    def _stopping(self) -> bool:
+        return self._cancelled.is_set() or self._should_stop()
+
+    def _put(self, target: queue.Queue, item) -> bool:
+        """Blocking put that gives up once the pipeline is cancelled."""
+        while not self._cancelled.is_set():
+            try:
+                target.put(item, timeout=0.2)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _start_stage(
+        self,
+        name: str,
+        workers: int,
+        source: queue.Queue,
+        sink: queue.Queue,
+        sink_workers: int,
+        handle: Callable[[object], None],
+        fail: Callable[[object, Exception], None],
+    ) -> List[threading.Thread]:
+        """Start workers that feed items from source to handle; forward _DONE when all exit.
+
+        An item whose handler raises is passed to fail, which reports it as
+        an error event, so one bad page cannot stop the stage.
+        """
+        alive = [workers]
+        lock = threading.Lock()
+
+        def worker() -> None:
+            try:
+                while True:
+                    try:
+                        item = source.get(timeout=0.2)
+                    except queue.Empty:
+                        if self._cancelled.is_set():
+                            return
+                        continue
+                    if item is _DONE:
+                        break
+                    if self._stopping():
+                        continue
+                    self._wait_if_paused()
+                    try:
+                        handle(item)
+                    except Exception as exc:
+                        fail(item, exc)
+            finally:
+                with lock:
+                    alive[0] -= 1
+                    last = alive[0] == 0
+                if last:
+                    for _ in range(sink_workers):
+                        self._put(sink, _DONE)
+
+        threads = [
+            threading.Thread(target=worker, name=f"{name}-{index}", daemon=True)
+            for index in range(workers)
+        ]
+        for thread in threads:
+            thread.start()
+        return threads
+
+    def _list_page(self, task: tuple[int, str, List[str] | None]) -> None:
+        page, forum_url, resumed_paths = task
+        if resumed_paths is not None:
+            # threads carried over from a checkpoint: no listing, no filtering
+            self._enqueue_page(page, forum_url, resumed_paths)
+            return
+        if self._exhausted_page is not None and page > self._exhausted_page:
+            return
+        try:
+            thread_paths = self.crawler.fetch_thread_paths_from_forum_url(forum_url)
+        except requests.RequestException as exc:
+            thread_paths, error = [], exc
+        else:
+            error = None
+        known = 0
+        exhausted = False
+        if thread_paths and self._thread_filter is not None:
+            fresh = self._thread_filter(thread_paths)
+            known = len(thread_paths) - len(fresh)
+            exhausted = not fresh
+            thread_paths = fresh
+            if exhausted:
+                self._exhausted_page = page
+        self._enqueue_page(page, forum_url, thread_paths, error=error, known=known, exhausted=exhausted)
+        if self.page_delay:
+            time.sleep(self.page_delay)
+
+    def _enqueue_page(
+        self,
+        page: int,
+        forum_url: str,
+        thread_paths: List[str],
+        *,
+        error: Exception | None = None,
+        known: int = 0,
+        exhausted: bool = False,
+    ) -> None:
+        with self._pages_lock:
+            state = self._pages.setdefault(page, _PageState(remaining=0))
+            state.remaining += len(thread_paths)
+            state.listed = True
+        self._put(
+            self._output_queue,
+            PipelineEvent(
+                "page", page, forum_url=forum_url, thread_paths=thread_paths,
+                error=error, known=known, exhausted=exhausted,
+            ),
+        )
+        if not thread_paths:
+            with self._pages_lock:
+                del self._pages[page]
+            self._put(self._output_queue, PipelineEvent("page_done", page, forum_url=forum_url))
+        for thread_path in thread_paths:
+            if not self._put(self._thread_queue, (page, thread_path)):
+                return
+
+    def _fetch_thread(self, task: tuple[int, str]) -> None:
+        page, thread_path = task
+        try:
+            try:
+                details = self.crawler.fetch_thread_details(thread_path)
+            except Exception as exc:  # request failures, and parser errors on malformed pages
+                details, error = None, exc
+            else:
+                error = None
+            self._put(
+                self._output_queue,
+                PipelineEvent("thread", page, thread_path=thread_path, details=details, error=error),
+            )
+            if details is not None and self.image_root:
+                if details.image_urls:
+                    destination = str(Path(self.image_root) / sanitize_name(details.title or thread_path))
+                    self._put(self._image_queue, (page, thread_path, details.image_urls, destination))
+        finally:
+            with self._pages_lock:
+                state = self._pages[page]
+                state.remaining -= 1
+                finished = state.listed and state.remaining == 0
+                if finished:
+                    del self._pages[page]
+            if finished:
+                self._put(self._output_queue, PipelineEvent("page_done", page))
+
+    def _fail_page(self, task: tuple[int, str, List[str] | None], error: Exception) -> None:
+        page, forum_url, _ = task
+        self._enqueue_page(page, forum_url, [], error=error)
+
+    def _fail_thread(self, task: tuple[int, str], error: Exception) -> None:
+        page, thread_path = task
+        self._put(self._output_queue, PipelineEvent("thread", page, thread_path=thread_path, error=error))
+
+    def _fail_images(self, task: tuple[int, str, Sequence[str], str], error: Exception) -> None:
+        page, thread_path, image_urls, _ = task
+        skipped = [f"{url} ({error})" for url in image_urls]
+        self._put(self._output_queue, PipelineEvent("images", page, thread_path=thread_path, skipped=skipped))
+
+    def _download_images(self, task: tuple[int, str, Sequence[str], str]) -> None:
+        page, thread_path, image_urls, destination = task
+        saved, skipped = self.crawler.download_images(image_urls, destination)
+        self._put(
+            self._output_queue,
+            PipelineEvent("images", page, thread_path=thread_path, saved=saved, skipped=skipped),
+        )
+
+    def _feed_pages(
+        self,
+        page_queue: queue.Queue,
+        forum_urls: Iterable[tuple[int, str]],
+        resume_threads: Sequence[tuple[int, List[str]]],
+    ) -> None:
+        for page, thread_paths in resume_threads:
+            if not self._put(page_queue, (page, "", list(thread_paths))):
+                return
+        for page, forum_url in forum_urls:
+            if self._stopping() or (self._exhausted_page is not None and page > self._exhausted_page):
+                break
+            if not self._put(page_queue, (page, forum_url, None)):
+                return
+        for _ in range(self.page_workers):
+            self._put(page_queue, _DONE)
+
+    def run(
+        self,
+        forum_urls: Iterable[tuple[int, str]],
+        resume_threads: Sequence[tuple[int, List[str]]] = (),
+    ) -> Iterator[PipelineEvent]:
+        """Crawl ``(page, forum_url)`` pairs, yielding events as the stages produce them.
+
+        ``forum_urls`` may be a lazy iterable; it is consumed only as fast
+        as the listing stage keeps up. ``resume_threads`` holds
+        ``(page, thread_paths)`` left over from an interrupted run; they are
+        crawled first, without listing their page. Closing the generator
+        early cancels the remaining work.
+        """
+        page_queue: queue.Queue = queue.Queue(maxsize=self.page_workers * 2)
+        self._thread_queue = queue.Queue(maxsize=self.queue_size)
+        self._image_queue = queue.Queue(maxsize=self.image_queue_size)
+        self._output_queue = queue.Queue(maxsize=self.queue_size)
+        self._cancelled.clear()
+        self._pages.clear()
+        self._exhausted_page = None
+
+        # queue depths are read by the metrics endpoint while the pipeline runs
+        metrics = self.crawler.metrics
+        gauges = [
+            metrics.add_gauge("crawler_queue_depth", source.qsize, queue=name)
+            for name, source in (
+                ("pages", page_queue),
+                ("threads", self._thread_queue),
+                ("images", self._image_queue),
+                ("output", self._output_queue),
+            )
+        ]
+
+        threading.Thread(
+            target=self._feed_pages, args=(page_queue, forum_urls, resume_threads),
+            name="pipeline-feed", daemon=True,
+        ).start()
+        self._start_stage(
+            "pipeline-pages", self.page_workers,
+            page_queue, self._thread_queue, self.thread_workers, self._list_page, self._fail_page,
+        )
+        self._start_stage(
+            "pipeline-threads", self.thread_workers,
+            self._thread_queue, self._image_queue, self.image_workers, self._fetch_thread, self._fail_thread,
+        )
+        self._start_stage(
+            "pipeline-images", self.image_workers,
+            self._image_queue, self._output_queue, 1, self._download_images, self._fail_images,
+        )
+
+        try:
+            while True:
+                event = self._output_queue.get()
+                if event is _DONE:
+                    break
+                yield event
+        finally:
+            self._cancelled.set()
+            for handle in gauges:
+                metrics.remove_gauge("crawler_queue_depth", handle)
+            # unblock producers waiting on full queues so the workers can exit
+            for pending in (page_queue, self._thread_queue, self._image_queue, self._output_queue):
+                try:
+                    while True:
+                        pending.get_nowait()
+                except queue.Empty:
+                    pass
+
+
+__all__ = ["CrawlPipeline", "PipelineEvent"]
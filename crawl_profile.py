@@ -0,0 +1,180 @@
+"""Timing spans for profiling a crawl, exported as a Chrome trace timeline.
+
+A ``CrawlProfiler`` attached with ``ForumCrawler.attach_profiler`` records
+where every thread page's time goes: connection setup, waiting for the
+first byte, reading the body, parsing and extraction, image downloads,
+and output writes. ``export_chrome_trace`` writes the Trace Event Format
+read by chrome://tracing and https://ui.perfetto.dev; ``summary`` totals
+the spans per step and per category (network, parse, disk, pacing).
+"""
+
+from __future__ import annotations
+
+import cProfile
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List
+
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+# category of every leaf span; "thread", "forum_page" and "image" wrap other
+# spans and are left out of the category totals
+SPAN_CATEGORIES = {
+    "connect": "network",
+    "ttfb": "network",
+    "download": "network",
+    "image_download": "network",
+    "parse": "parse",
+    "extract_magnet_links": "parse",
+    "extract_image_urls": "parse",
+    "extract_thread_paths": "parse",
+    "write": "disk",
+    "image_write": "disk",
+    "rate_limit_wait": "pacing",
+    "retry_backoff": "pacing",
+}
+CONTAINER_SPANS = ("thread", "forum_page", "image")
+
+
+class CrawlProfiler:
+    """Thread-safe collector of timed spans, plus an optional cProfile of one thread.
+
+    Span start times are ``time.perf_counter`` values; every thread shows
+    up as its own track in the trace, so nested spans read as a waterfall
+    per crawled thread page.
+    """
+
+    def __init__(self):
+        self._origin = time.perf_counter()
+        self._pid = os.getpid()
+        self._events: List[dict] = []
+        self._thread_names: Dict[int, str] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._cprofile: cProfile.Profile | None = None
+
+    def add(self, name: str, start: float, seconds: float, **args) -> None:
+        """Record a finished span that began at perf_counter value ``start``."""
+        thread = threading.current_thread()
+        event = {
+            "name": name,
+            "cat": SPAN_CATEGORIES.get(name, "crawl"),
+            "ph": "X",
+            "ts": round((start - self._origin) * 1e6, 1),
+            "dur": round(max(0.0, seconds) * 1e6, 1),
+            "pid": self._pid,
+            "tid": thread.ident,
+        }
+        if args:
+            event["args"] = args
+        with self._lock:
+            self._events.append(event)
+            self._thread_names.setdefault(thread.ident, thread.name)
+
+    @contextmanager
+    def span(self, name: str, **args) -> Iterator[dict]:
+        """Time the block as one span; the yielded dict becomes the span's args."""
+        start = time.perf_counter()
+        try:
+            yield args
+        finally:
+            self.add(name, start, time.perf_counter() - start, **args)
+
+    def add_connect(self, start: float, host: str) -> None:
+        end = time.perf_counter()
+        self._local.connect_end = end
+        self.add("connect", start, end - start, host=host)
+
+    def last_connect_end(self) -> float:
+        """When the calling thread last finished opening a connection (0 if never)."""
+        return getattr(self._local, "connect_end", 0.0)
+
+    # -- cProfile ------------------------------------------------------
+
+    def start_cprofile(self) -> None:
+        """Run cProfile on the calling thread until ``dump_cprofile``."""
+        self._cprofile = cProfile.Profile()
+        self._cprofile.enable()
+
+    def dump_cprofile(self, path) -> None:
+        """Stop cProfile and write its stats for ``python -m pstats`` or snakeviz."""
+        if self._cprofile is None:
+            return
+        self._cprofile.disable()
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._cprofile.dump_stats(str(path))
+        self._cprofile = None
+
+    # -- export --------------------------------------------------------
+
+    def export_chrome_trace(self, path) -> None:
+        with self._lock:
+            events = list(self._events)
+            names = dict(self._thread_names)
+        metadata = [
+            {"name": "thread_name", "ph": "M", "pid": self._pid, "tid": tid, "args": {"name": name}}
+            for tid, name in names.items()
+        ]
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("w", encoding="utf-8") as handle:
+            json.dump({"traceEvents": metadata + events, "displayTimeUnit": "ms"}, handle, ensure_ascii=False)
+
+    def summary(self) -> dict:
+        """``{"steps": {name: {count, seconds, mean, max}}, "categories": {category: seconds}}``.
+
+        Seconds are summed over all worker threads, so with concurrency
+        they exceed the wall-clock time; compare the categories' shares.
+        """
+        with self._lock:
+            events = list(self._events)
+        steps: Dict[str, dict] = {}
+        for event in events:
+            seconds = event["dur"] / 1e6
+            stats = steps.setdefault(event["name"], {"count": 0, "seconds": 0.0, "max": 0.0})
+            stats["count"] += 1
+            stats["seconds"] += seconds
+            stats["max"] = max(stats["max"], seconds)
+        categories: Dict[str, float] = {}
+        for name, stats in steps.items():
+            stats["mean"] = round(stats["seconds"] / stats["count"], 6)
+            stats["seconds"] = round(stats["seconds"], 6)
+            stats["max"] = round(stats["max"], 6)
+            if name not in CONTAINER_SPANS:
+                category = SPAN_CATEGORIES.get(name, "other")
+                categories[category] = round(categories.get(category, 0.0) + stats["seconds"], 6)
+        return {"steps": steps, "categories": categories}
+
+
+def timed_pool_classes(profiler: CrawlProfiler) -> dict:
+    """urllib3 pool classes whose connections report DNS + TCP (+ TLS) setup as ``connect`` spans.
+
+    Install as ``PoolManager.pool_classes_by_scheme``.
+    """
+
+    def timed(base):
+        class TimedConnection(base):
+            def connect(self):
+                start = time.perf_counter()
+                try:
+                    super().connect()
+                finally:
+                    profiler.add_connect(start, self.host)
+
+        return TimedConnection
+
+    class TimedHTTPConnectionPool(HTTPConnectionPool):
+        ConnectionCls = timed(HTTPConnection)
+
+    class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+        ConnectionCls = timed(HTTPSConnection)
+
+    return {"http": TimedHTTPConnectionPool, "https": TimedHTTPSConnectionPool}
+
+
+__all__ = ["CONTAINER_SPANS", "SPAN_CATEGORIES", "CrawlProfiler", "timed_pool_classes"]
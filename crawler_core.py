@@ -2,15 +2,39 @@
 
 from __future__ import annotations
 
+import asyncio
+import itertools
 import os
 import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
 from dataclasses import dataclass, replace
 from pathlib import Path
-from typing import Iterable, List, Sequence, Tuple
+from typing import TYPE_CHECKING, AsyncIterator, Iterable, Iterator, List, Sequence, Tuple
 from urllib.parse import urljoin, urlparse
 
+import lxml.html
+from lxml.etree import ParserError
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
+
+from crawl_metrics import CrawlMetrics, new_crawler_metrics
+from crawl_profile import CrawlProfiler, timed_pool_classes
+from http_transport import DNSCache, accept_encoding, build_adapter
+from image_filter import DEFAULT_IMAGE_DENY_PATTERNS, DEFAULT_SNIFF_BYTES, ImageFilter, content_range_total
+from image_store import ImageBlobStore
+from rate_limit import AdaptiveRateLimiter, parse_retry_after
+from retry_policy import RETRY_STATUSES, TRANSIENT_ERRORS, CircuitBreaker, HostCircuitOpen, RetryPolicy
+from response_cache import ResponseCache
+
+if TYPE_CHECKING:  # crawl_pipeline imports this module
+    from crawl_pipeline import PipelineEvent
+
+try:  # optional dependency, only needed by AsyncForumCrawler
+    import aiohttp
+except ImportError:  # pragma: no cover - depends on the environment
+    aiohttp = None
 
 DEFAULT_USER_AGENT = (
     "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
@@ -34,6 +58,51 @@ class CrawlerConfig:
     )
     timeout: int = 10
     image_timeout: int = 10
+    # number of thread pages fetched in parallel by fetch_many_thread_details
+    concurrency: int = 1
+    # parallel image downloads per download_images call, and per image host overall
+    image_workers: int = 4
+    image_per_host: int = 4
+    # HTML parser backend, one of PARSER_BACKENDS
+    parser_backend: str = "soup"
+    # on-disk thread-page cache; entries younger than cache_ttl seconds skip
+    # the network, older ones are revalidated with a conditional GET
+    cache_dir: str | None = None
+    cache_ttl: float | None = None
+    # content-addressed image store; per-thread folders then hold hard links
+    image_store_dir: str | None = None
+    # adaptive per-host pacing: starting requests/second and the ceiling it may
+    # grow to while the host stays healthy; rate_limit 0 disables pacing
+    rate_limit: float = 4.0
+    max_rate: float = 32.0
+    # transient failures (connection resets, timeouts, 429/5xx) are retried
+    # with jittered exponential backoff; after breaker_threshold consecutive
+    # failures a host is skipped for breaker_cooldown seconds
+    max_retries: int = 3
+    retry_backoff: float = 0.5
+    breaker_threshold: int = 5
+    breaker_cooldown: float = 30.0
+    # processes that parse thread pages off the GIL; 0 parses in the fetching thread
+    parse_workers: int = 0
+    # images skipped before their body is downloaded (image_filter.py): URL
+    # deny-list regexes, Content-Length bounds, and a minimum pixel size read
+    # from the first image_sniff_bytes through a Range request
+    image_deny_patterns: Tuple[str, ...] = DEFAULT_IMAGE_DENY_PATTERNS
+    image_min_bytes: int = 0
+    image_max_bytes: int | None = None
+    image_min_width: int = 0
+    image_min_height: int = 0
+    image_sniff_bytes: int = DEFAULT_SNIFF_BYTES
+    # HTTP transport (http_transport.py): idle connections kept per host (0
+    # sizes the pools from concurrency/image_workers), hosts with a pool,
+    # TCP keep-alive probes, DNS answers cached for dns_cache_ttl seconds
+    # (0 disables), compressed page responses, and HTTP/2 through httpx
+    pool_maxsize: int = 0
+    pool_hosts: int = 16
+    tcp_keepalive: bool = True
+    dns_cache_ttl: float = 300.0
+    compress: bool = True
+    http2: bool = False
 
     def build_headers(self) -> dict[str, str]:
         headers = {"User-Agent": DEFAULT_USER_AGENT}
@@ -85,13 +154,65 @@ def normalize_thread_path(href: str) -> str | None:
     return href
 
 
-def extract_thread_paths(html: bytes | str) -> List[str]:
+# "soup" builds the full BeautifulSoup tree, "strainer" limits it to the tags
+# we read, and "lxml" walks a raw lxml.html document with XPath. All three
+# produce the same links, magnets, and image URLs.
+PARSER_BACKENDS = ("soup", "strainer", "lxml")
+_THREAD_TAGS = SoupStrainer(["a", "li", "img", "title"])
+_MAGNET_MARKER = "magnet:?xt"
+# text nodes that BeautifulSoup.get_text() reports; script/style bodies are skipped
+_LI_TEXT_XPATH = ".//text()[not(parent::script) and not(parent::style)]"
+
+
+def _check_backend(backend: str) -> None:
+    if backend not in PARSER_BACKENDS:
+        raise ValueError(f"unknown parser backend {backend!r}, expected one of {PARSER_BACKENDS}")
+
+
+_META_CHARSET = re.compile(rb"<meta[^>]+charset=[\"']?([\w-]+)", re.IGNORECASE)
+
+
+def _lxml_document(html: bytes | str):
+    """Parse html with lxml, honouring <meta charset> and defaulting bytes to UTF-8.
+
+    Empty, whitespace-only, and comment-only pages give an empty ``<html>``
+    element, matching the empty results of the soup backends.
+    """
+    try:
+        if isinstance(html, str):
+            return lxml.html.fromstring(html)
+        match = _META_CHARSET.search(html[:4096])
+        encoding = match.group(1).decode("ascii") if match else "utf-8"
+        try:
+            parser = lxml.html.HTMLParser(encoding=encoding)
+        except LookupError:
+            parser = lxml.html.HTMLParser(encoding="utf-8")
+        return lxml.html.fromstring(html, parser=parser)
+    except ParserError:
+        return lxml.html.Element("html")
+
+
+def _contains_magnet(html: bytes | str) -> bool:
+    """Cheap pre-scan so pages without magnets skip the <li> walk entirely."""
+    if isinstance(html, bytes):
+        return _MAGNET_MARKER.encode() in html
+    return _MAGNET_MARKER in html
+
+
+def extract_thread_paths(html: bytes | str, backend: str = "soup") -> List[str]:
     """Extract unique thread paths from forum HTML."""
-    soup = BeautifulSoup(html, "lxml")
+    _check_backend(backend)
+    if backend == "lxml":
+        hrefs = _lxml_document(html).xpath("//a/@href")
+    else:
+        parse_only = SoupStrainer("a") if backend == "strainer" else None
+        soup = BeautifulSoup(html, "lxml", parse_only=parse_only)
+        hrefs = [link["href"] for link in soup.find_all("a", href=True)]
+
     results: list[str] = []
     seen: set[str] = set()
-    for link in soup.find_all("a", href=True):
-        normalized = normalize_thread_path(link["href"])
+    for href in hrefs:
+        normalized = normalize_thread_path(href)
         if normalized and normalized not in seen:
             seen.add(normalized)
             results.append(normalized)
@@ -110,14 +231,18 @@ def extract_magnet_links(soup: BeautifulSoup) -> List[str]:
 
 def extract_image_urls(soup: BeautifulSoup, base_url: str) -> List[str]:
     """Extract absolute image URLs from the provided soup."""
+    return _absolute_image_urls(
+        (img.get("file") or img.get("src") for img in soup.find_all("img")), base_url
+    )
+
+
+def _absolute_image_urls(candidates: Iterable[str | None], base_url: str) -> List[str]:
     urls: list[str] = []
     seen: set[str] = set()
-    for img in soup.find_all("img"):
-        candidate = img.get("file") or img.get("src")
+    for candidate in candidates:
         if not candidate:
             continue
         candidate = candidate.strip()
-        # print(candidate)
         if not candidate:
             continue
         if not candidate.startswith(("http://", "https://")):
@@ -125,10 +250,199 @@ def extract_image_urls(soup: BeautifulSoup, base_url: str) -> List[str]:
         if candidate not in seen:
             seen.add(candidate)
             urls.append(candidate)
-            # print(candidate)
     return urls
 
 
+def _title_soup(title: str | None) -> BeautifulSoup:
+    """Build a minimal soup that only carries the page title."""
+    soup = BeautifulSoup("", "lxml")
+    if title is not None:
+        tag = soup.new_tag("title")
+        tag.string = title
+        soup.append(tag)
+    return soup
+
+
+@dataclass(frozen=True)
+class ThreadDetails:
+    """What a crawl keeps from one thread page; the parse tree is dropped after extraction.
+
+    ``fetch_seconds`` covers the network request (0 for fresh cache hits)
+    and ``parse_seconds`` the HTML extraction, including the hand-off to a
+    parse worker when ``parse_workers`` is set.
+    """
+
+    __slots__ = ("url", "title", "magnets", "image_urls", "fetch_seconds", "parse_seconds")
+
+    url: str
+    title: str | None
+    magnets: Tuple[str, ...]
+    image_urls: Tuple[str, ...]
+    fetch_seconds: float
+    parse_seconds: float
+
+    @classmethod
+    def from_parsed(
+        cls, url: str, parsed: dict, fetch_seconds: float = 0.0, parse_seconds: float = 0.0
+    ) -> "ThreadDetails":
+        """Build from a ``summarize_thread_html`` dict (as stored by the response cache)."""
+        return cls(
+            url,
+            parsed.get("title"),
+            tuple(parsed["magnets"]),
+            tuple(parsed["images"]),
+            fetch_seconds,
+            parse_seconds,
+        )
+
+
+class _Laps:
+    """Consecutive timing laps: each call records the time since the previous one.
+
+    Laps are ``(step, offset, seconds)`` with offsets relative to the first
+    mark, so they stay meaningful when taken in a parse worker process.
+    """
+
+    __slots__ = ("laps", "origin", "mark")
+
+    def __init__(self, laps: list | None):
+        self.laps = laps
+        self.origin = self.mark = time.perf_counter() if laps is not None else 0.0
+
+    def __call__(self, step: str) -> None:
+        if self.laps is not None:
+            now = time.perf_counter()
+            self.laps.append((step, self.mark - self.origin, now - self.mark))
+            self.mark = now
+
+
+def _extract_thread(html: bytes | str, thread_url: str, backend: str, laps: list | None = None):
+    """Return ``(magnets, image_urls, title, soup)``; soup is None for the lxml backend.
+
+    With a ``laps`` list, the parse and both extraction steps are timed into it.
+    """
+    _check_backend(backend)
+    lap = _Laps(laps)
+    if backend == "lxml":
+        document = _lxml_document(html)
+        lap("parse")
+        magnets: list[str] = []
+        if _contains_magnet(html):
+            for li in document.xpath("//li"):
+                text = "".join(part.strip() for part in li.xpath(_LI_TEXT_XPATH))
+                if text.startswith(_MAGNET_MARKER):
+                    magnets.append(text)
+        lap("extract_magnet_links")
+        images = _absolute_image_urls(
+            (img.get("file") or img.get("src") for img in document.xpath("//img")), thread_url
+        )
+        lap("extract_image_urls")
+        titles = document.xpath("//title")
+        return magnets, images, titles[0].text_content() if titles else None, None
+
+    if backend == "strainer":
+        soup = BeautifulSoup(html, "lxml", parse_only=_THREAD_TAGS)
+        lap("parse")
+        magnets = extract_magnet_links(soup) if _contains_magnet(html) else []
+    else:
+        soup = BeautifulSoup(html, "lxml")
+        lap("parse")
+        magnets = extract_magnet_links(soup)
+    lap("extract_magnet_links")
+    images = extract_image_urls(soup, thread_url)
+    lap("extract_image_urls")
+    title = soup.title.text if soup.title else None
+    return magnets, images, title, soup
+
+
+def parse_thread_html(
+    html: bytes | str, thread_url: str, backend: str = "soup"
+) -> tuple[list[str], list[str], BeautifulSoup]:
+    """Return ``(magnets, image_urls, soup)`` for a thread page using the given backend.
+
+    With the ``lxml`` backend the returned soup only holds the page ``<title>``.
+    Crawls use ``summarize_thread_html`` instead, which does not keep the tree.
+    """
+    magnets, images, title, soup = _extract_thread(html, thread_url, backend)
+    return magnets, images, soup if soup is not None else _title_soup(title)
+
+
+def summarize_thread_html(html: bytes, thread_url: str, backend: str = "lxml", profile: bool = False) -> dict:
+    """Parse a thread page and keep only ``{"magnets", "images", "title"}``.
+
+    Also runs in parse worker processes: the raw page bytes go in and only
+    the small, picklable result comes back, never the parse tree. With
+    ``profile`` the result also carries ``"laps"``: ``(step, offset, seconds)``
+    timings of the parse and extraction steps.
+    """
+    laps: list | None = [] if profile else None
+    magnets, images, title, _ = _extract_thread(html, thread_url, backend, laps)
+    parsed = {"magnets": magnets, "images": images, "title": title}
+    if laps is not None:
+        parsed["laps"] = laps
+    return parsed
+
+
+def _ensure_absolute_url(base_url: str, thread_path_or_url: str) -> str:
+    if thread_path_or_url.startswith(("http://", "https://")):
+        return thread_path_or_url
+    return f"{base_url.rstrip('/')}/{thread_path_or_url.lstrip('/')}"
+
+
+def _adaptive_chunk_size(content_length: str | None) -> int:
+    """Pick a streaming chunk size from the advertised body size (64 KiB - 1 MiB)."""
+    try:
+        length = int(content_length) if content_length else 0
+    except ValueError:
+        length = 0
+    if length <= 0:
+        return 256 * 1024
+    return max(64 * 1024, min(1024 * 1024, length // 8))
+
+
+def _peek_chunks(chunks: Iterator[bytes], size: int) -> tuple[bytes, Iterator[bytes]]:
+    """Read at least size bytes from chunks (fewer if it ends); return them and an iterator replaying everything."""
+    taken: list[bytes] = []
+    read = 0
+    for chunk in chunks:
+        taken.append(chunk)
+        read += len(chunk)
+        if read >= size:
+            break
+    return b"".join(taken), itertools.chain(taken, chunks)
+
+
+def _pick_image_filename(
+    image_url: str, content_type: str, index: int, seen_names: set[str]
+) -> str:
+    """Choose a unique filename for an image, recording it in seen_names."""
+    parsed_path = Path(urlparse(image_url).path)
+    filename = sanitize_name(parsed_path.stem or f"image_{index}")
+    extension = parsed_path.suffix
+    if not extension and content_type.startswith("image/"):
+        extension = f".{content_type.split(';')[0].split('/')[-1]}"
+    if not extension:
+        extension = ".jpg"
+
+    candidate = f"{filename}{extension}"
+    counter = 1
+    while candidate in seen_names:
+        candidate = f"{filename}_{counter}{extension}"
+        counter += 1
+    seen_names.add(candidate)
+    return candidate
+
+
+def _build_rate_limiter(config: CrawlerConfig) -> AdaptiveRateLimiter | None:
+    if config.rate_limit <= 0:
+        return None
+    return AdaptiveRateLimiter(
+        config.rate_limit,
+        max_rate=max(config.rate_limit, config.max_rate),
+        burst=max(4, config.concurrency),
+    )
+
+
 class ForumCrawler:
     """Lightweight crawler that encapsulates HTTP sessions and parsing helpers."""
 
@@ -136,14 +450,89 @@ class ForumCrawler:
         self.config = config or CrawlerConfig()
         self.session = requests.Session()
         self.image_session = requests.Session()
+        self._host_slots: dict[str, threading.BoundedSemaphore] = {}
+        self._host_slots_lock = threading.Lock()
+        self.cache: ResponseCache | None = None
+        self._open_cache()
+        self.image_store: ImageBlobStore | None = None
+        if self.config.image_store_dir:
+            self.image_store = ImageBlobStore(self.config.image_store_dir)
+        self.image_filter = ImageFilter.from_config(self.config)
+        self.rate_limiter = _build_rate_limiter(self.config)
+        self.retry_policy = RetryPolicy(self.config.max_retries, self.config.retry_backoff)
+        self.circuit_breaker = CircuitBreaker(self.config.breaker_threshold, self.config.breaker_cooldown)
+        self._retry_stats = {"retries": 0, "recovered": 0, "gave_up": 0, "circuit_opens": 0, "short_circuited": 0}
+        self._retry_stats_lock = threading.Lock()
+        # request latency/bytes/status and parse-time instrumentation, see crawl_metrics.py
+        self.metrics: CrawlMetrics = new_crawler_metrics()
+        # per-step timing spans, only while a profiler is attached (see attach_profiler)
+        self.profiler: CrawlProfiler | None = None
+        self._parse_pool: ProcessPoolExecutor | None = None
+        self._parse_pool_lock = threading.Lock()
+        self.dns_cache = DNSCache(self.config.dns_cache_ttl) if self.config.dns_cache_ttl > 0 else None
+        self._transport: tuple = ()
+        # adapters built by this crawler; ones shared by clone() belong to the original
+        self._owned_adapters: list = []
+        self._mount_adapters()
         self._refresh_sessions()
 
+    def clone(self, **changes) -> "ForumCrawler":
+        """Return a crawler with some config fields replaced that shares this one's host state.
+
+        The clone has its own sessions but uses the same rate limiter,
+        circuit breaker, retry counters, metrics, and per-host image slots, so several jobs
+        crawling one site together stay within the site's limits. The
+        response cache and image store are shared when their directories
+        are unchanged, and the connection pools (with their warm
+        connections) when the transport settings are.
+        """
+        config = replace(self.config, **changes)
+        twin = ForumCrawler(replace(config, cache_dir=None, image_store_dir=None))
+        twin.config = config
+        if (config.rate_limit, config.max_rate) == (self.config.rate_limit, self.config.max_rate):
+            twin.rate_limiter = self.rate_limiter
+        twin.circuit_breaker = self.circuit_breaker
+        twin.metrics = self.metrics
+        twin._retry_stats = self._retry_stats
+        twin._retry_stats_lock = self._retry_stats_lock
+        twin._host_slots = self._host_slots
+        twin._host_slots_lock = self._host_slots_lock
+        if twin._transport == self._transport and self.profiler is None:
+            for adapter in twin._owned_adapters:
+                adapter.close()
+            twin._owned_adapters = []
+            twin.dns_cache = self.dns_cache
+            for mine, theirs in ((twin.session, self.session), (twin.image_session, self.image_session)):
+                for prefix in ("http://", "https://"):
+                    mine.mount(prefix, theirs.get_adapter(prefix))
+        if config.cache_dir == self.config.cache_dir:
+            twin.cache = self.cache
+        else:
+            twin._open_cache()
+        if config.image_store_dir == self.config.image_store_dir:
+            twin.image_store = self.image_store
+        elif config.image_store_dir:
+            twin.image_store = ImageBlobStore(config.image_store_dir)
+        return twin
+
+    def close(self) -> None:
+        """Shut down the parse worker processes, if any were started."""
+        with self._parse_pool_lock:
+            pool, self._parse_pool = self._parse_pool, None
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
     def update_config(
         self,
         *,
         cookie: str | None = None,
         image_cookie: str | None = None,
         base_url: str | None = None,
+        concurrency: int | None = None,
+        image_workers: int | None = None,
+        cache_dir: str | None = None,
+        rate_limit: float | None = None,
+        parse_workers: int | None = None,
     ) -> None:
         """Update runtime config and refresh HTTP headers."""
         new_config = replace(self.config)
@@ -153,16 +542,123 @@ class ForumCrawler:
             new_config.image_cookie = image_cookie
         if base_url:
             new_config.base_url = base_url.rstrip("/")
+        if concurrency is not None:
+            new_config.concurrency = max(1, concurrency)
+        if image_workers is not None:
+            new_config.image_workers = max(1, image_workers)
+        if cache_dir is not None:
+            # an empty string disables the cache
+            new_config.cache_dir = cache_dir or None
+        if rate_limit is not None:
+            new_config.rate_limit = max(0.0, rate_limit)
+        if parse_workers is not None:
+            new_config.parse_workers = max(0, parse_workers)
+        reopen_cache = new_config.cache_dir != self.config.cache_dir
+        # keep the learned per-host rates unless the pacing settings changed
+        rebuild_limiter = (
+            new_config.rate_limit != self.config.rate_limit
+            or new_config.max_rate != self.config.max_rate
+        )
+        resize_parse_pool = new_config.parse_workers != self.config.parse_workers
         self.config = new_config
+        self.image_filter = ImageFilter.from_config(self.config)
+        if resize_parse_pool:
+            self.close()
+        if rebuild_limiter:
+            self.rate_limiter = _build_rate_limiter(self.config)
+        if reopen_cache:
+            self._open_cache()
+        if self._transport_settings() != self._transport:
+            self._mount_adapters()
         self._refresh_sessions()
 
+    def _open_cache(self) -> None:
+        if self.config.cache_dir:
+            self.cache = ResponseCache(self.config.cache_dir, ttl=self.config.cache_ttl)
+        else:
+            self.cache = None
+
+    def cache_stats(self) -> dict[str, int]:
+        """Hit/miss counters of the response cache (all zero when caching is off)."""
+        if self.cache is None:
+            return {"hits": 0, "misses": 0, "revalidated": 0}
+        return self.cache.stats()
+
+    def rate_stats(self) -> dict[str, dict[str, float]]:
+        """Per-host pacing state of the rate limiter (empty when pacing is off)."""
+        if self.rate_limiter is None:
+            return {}
+        return self.rate_limiter.stats()
+
+    def retry_stats(self) -> dict[str, int]:
+        """Retry and circuit-breaker counters since the crawler was created."""
+        with self._retry_stats_lock:
+            return dict(self._retry_stats)
+
+    def attach_profiler(self, profiler: CrawlProfiler | None) -> None:
+        """Record timing spans into profiler from now on; None stops profiling.
+
+        Fresh connection pools are mounted so that every new connection
+        reports its DNS/connect/TLS setup time (not with ``http2``).
+        """
+        self.profiler = profiler
+        self._mount_adapters()
+
+    def _count_retry(self, key: str) -> None:
+        with self._retry_stats_lock:
+            self._retry_stats[key] += 1
+
+    def _pool_sizes(self) -> tuple[int, int]:
+        return (
+            max(10, self.config.concurrency),
+            max(10, self.config.image_workers, self.config.image_per_host),
+        )
+
+    def _transport_settings(self) -> tuple:
+        config = self.config
+        return (*self._pool_sizes(), config.pool_maxsize, config.pool_hosts, config.tcp_keepalive, config.http2)
+
+    def _mount_adapters(self) -> None:
+        """Mount new transport adapters, sized so concurrent workers do not discard connections.
+
+        The old adapters' pooled connections are closed, so this only runs
+        when the transport settings change or a profiler is attached.
+        """
+        pool_classes = timed_pool_classes(self.profiler) if self.profiler is not None else None
+        replaced, self._owned_adapters = self._owned_adapters, []
+        for session, pool_size in zip((self.session, self.image_session), self._pool_sizes()):
+            adapter = build_adapter(
+                self.config,
+                pool_size,
+                dns_cache=self.dns_cache,
+                on_connect=self._count_connection,
+                pool_classes=pool_classes,
+            )
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            self._owned_adapters.append(adapter)
+        self._transport = self._transport_settings()
+        for adapter in replaced:
+            adapter.close()
+
+    def _count_connection(self, host: str) -> None:
+        self.metrics.inc("crawler_connections_opened_total", host=host)
+
     def _refresh_sessions(self) -> None:
+        """Apply the configured headers and cookies; the mounted adapters keep their warm connections."""
+        # clear() also drops requests' default headers (http.client then asks
+        # for identity), so restore keep-alive and compression; image bodies
+        # are compressed already and Range probes must address stored bytes
         self.session.headers.clear()
+        self.session.headers.update(
+            {"Accept": "*/*", "Accept-Encoding": accept_encoding(self.config.compress), "Connection": "keep-alive"}
+        )
         self.session.headers.update(self.config.build_headers())
         self.session.cookies.clear()
         if self.config.cookie:
             self._apply_cookie_string(self.session, self.config.cookie)
         self.image_session.headers.clear()
+        self.image_session.headers.update({"Accept": "*/*", "Accept-Encoding": "identity", "Connection": "keep-alive"})
         self.image_session.headers.update(self.config.build_image_headers())
         self.image_session.cookies.clear()
         if self.config.image_cookie:
@@ -178,100 +674,813 @@ class ForumCrawler:
             if name:
                 session.cookies.set(name, value)
 
+    def _get(self, session: requests.Session, url: str, kind: str, **kwargs) -> requests.Response:
+        """GET url with retries for transient failures, guarded by the host's circuit breaker.
+
+        Only GETs go through here, so every request is safe to repeat. The
+        last response (possibly a 429/5xx) is returned for the caller to
+        ``raise_for_status``; the last transient exception is re-raised.
+        ``kind`` (forum/thread/image) labels the request in ``metrics``.
+        """
+        breaker = self.circuit_breaker
+        policy = self.retry_policy
+        for attempt in range(policy.max_retries + 1):
+            if attempt:
+                self._count_retry("retries")
+                self._sleep("retry_backoff", policy.delay(attempt))
+            try:
+                breaker.allow(url)
+            except HostCircuitOpen:
+                self._count_retry("short_circuited")
+                if attempt:
+                    self._count_retry("gave_up")
+                raise
+            last_attempt = attempt == policy.max_retries
+            try:
+                response = self._paced_get(session, url, kind, **kwargs)
+            except TRANSIENT_ERRORS:
+                self._record_failure(url, gave_up=last_attempt)
+                if last_attempt:
+                    raise
+                continue
+            except BaseException:
+                # final errors (InvalidURL, TooManyRedirects, ...) and interrupts
+                # are not the host's fault: not retried, not counted, but a
+                # half-open probe must still end
+                breaker.release(url)
+                raise
+            if response.status_code not in RETRY_STATUSES:
+                breaker.record_success(url)
+                if attempt:
+                    self._count_retry("recovered")
+                return response
+            self._record_failure(url, gave_up=last_attempt)
+            if last_attempt:
+                return response
+            response.close()
+
+    def _record_failure(self, url: str, gave_up: bool = False) -> None:
+        if gave_up:
+            self._count_retry("gave_up")
+        if self.circuit_breaker.record_failure(url):
+            self._count_retry("circuit_opens")
+
+    def _sleep(self, step: str, seconds: float) -> None:
+        if self.profiler is None:
+            time.sleep(seconds)
+        else:
+            with self.profiler.span(step):
+                time.sleep(seconds)
+
+    def _paced_get(self, session: requests.Session, url: str, kind: str, **kwargs) -> requests.Response:
+        """session.get paced by the per-host rate limiter, which also learns from the response."""
+        limiter = self.rate_limiter
+        profiler = self.profiler
+        if limiter is not None:
+            if profiler is None:
+                limiter.acquire(url)
+            else:
+                with profiler.span("rate_limit_wait"):
+                    limiter.acquire(url)
+        started = time.monotonic()
+        try:
+            if profiler is None:
+                response = session.get(url, **kwargs)
+            else:
+                response = self._profiled_get(profiler, session, url, kind, **kwargs)
+        except requests.RequestException:
+            latency = time.monotonic() - started
+            self.metrics.observe_request(kind, None, latency)
+            if limiter is not None:
+                limiter.observe(url, None, latency)
+            raise
+        latency = time.monotonic() - started
+        self.metrics.observe_request(kind, response.status_code, latency)
+        if limiter is not None:
+            limiter.observe(
+                url,
+                response.status_code,
+                latency,
+                parse_retry_after(response.headers.get("Retry-After")),
+            )
+        return response
+
+    def _profiled_get(
+        self, profiler: CrawlProfiler, session: requests.Session, url: str, kind: str, **kwargs
+    ) -> requests.Response:
+        """session.get split into connect, time-to-first-byte, and body download spans.
+
+        The body is read here unless the caller asked to stream it, so the
+        response behaves exactly like an unprofiled one.
+        """
+        stream = kwargs.pop("stream", False)
+        started = time.perf_counter()
+        try:
+            response = session.get(url, stream=True, **kwargs)
+        except requests.RequestException as exc:
+            profiler.add("ttfb", started, time.perf_counter() - started, kind=kind, error=type(exc).__name__)
+            raise
+        # a streamed get returns once the headers arrived; a fresh connection's setup is its own span
+        waiting_from = max(started, profiler.last_connect_end())
+        profiler.add(
+            "ttfb", waiting_from, time.perf_counter() - waiting_from, kind=kind, status=response.status_code
+        )
+        if not stream:
+            with profiler.span("download", kind=kind) as args:
+                args["bytes"] = len(response.content)
+        return response
+
     def fetch_thread_paths_from_forum_url(self, forum_url: str) -> List[str]:
-        response = self.session.get(forum_url, timeout=self.config.timeout)
+        if self.profiler is not None:
+            with self.profiler.span("forum_page", url=forum_url):
+                return self._fetch_thread_paths(forum_url)
+        return self._fetch_thread_paths(forum_url)
+
+    def _fetch_thread_paths(self, forum_url: str) -> List[str]:
+        response = self._get(self.session, forum_url, "forum", timeout=self.config.timeout)
         response.raise_for_status()
-        return extract_thread_paths(response.content)
+        self.metrics.observe_bytes("forum", len(response.content))
+        started = time.perf_counter()
+        paths = extract_thread_paths(response.content, self.config.parser_backend)
+        seconds = time.perf_counter() - started
+        self.metrics.observe_parse("forum", seconds)
+        if self.profiler is not None:
+            self.profiler.add("extract_thread_paths", started, seconds, threads=len(paths))
+        return paths
+
+    def forum_page_url(self, forum_id: str, page: int) -> str:
+        return f"{self.config.base_url}/forum-{forum_id}-{page}.html"
 
     def fetch_thread_paths(self, forum_id: str, page: int) -> List[str]:
-        forum_url = f"{self.config.base_url}/forum-{forum_id}-{page}.html"
-        return self.fetch_thread_paths_from_forum_url(forum_url)
+        return self.fetch_thread_paths_from_forum_url(self.forum_page_url(forum_id, page))
+
+    def iter_forum(
+        self,
+        forum_id: str,
+        start_page: int,
+        end_page: int,
+        *,
+        events: Sequence[str] | None = ("thread",),
+        resume_threads: Sequence[tuple[int, List[str]]] = (),
+        **pipeline_options,
+    ) -> Iterator[PipelineEvent]:
+        """Lazily crawl forum pages start_page..end_page, yielding results as they arrive.
+
+        Runs a ``CrawlPipeline`` on this crawler with ``config.concurrency``
+        thread fetchers. By default only ``"thread"`` events are yielded:
+        their ``details`` hold the compact ``ThreadDetails`` (the parse tree
+        is already dropped) or their ``error`` the request failure. Pass
+        ``events=None`` to also get ``"page"``, ``"page_done"``, and
+        ``"images"`` events. Pages are listed only as the stages drain, so
+        memory stays flat however long the range is; closing the generator
+        early cancels the remaining work. ``resume_threads`` and the other
+        keyword arguments (``image_root``, ``thread_filter``, ``page_delay``,
+        ``should_stop``, ...) are passed to the pipeline.
+        """
+        from crawl_pipeline import CrawlPipeline  # crawl_pipeline imports this module
 
-    def fetch_thread_details(
-        self, thread_path_or_url: str
-    ) -> tuple[list[str], list[str], BeautifulSoup]:
+        pipeline_options.setdefault("thread_workers", self.config.concurrency)
+        pipeline = CrawlPipeline(self, **pipeline_options)
+        forum_urls = (
+            (page, self.forum_page_url(forum_id, page)) for page in range(start_page, end_page + 1)
+        )
+        stream = pipeline.run(forum_urls, resume_threads)
+        try:
+            for event in stream:
+                if events is None or event.kind in events:
+                    yield event
+        finally:
+            stream.close()
+
+    def _parse_pool_executor(self) -> ProcessPoolExecutor | None:
+        if self.config.parse_workers <= 0:
+            return None
+        with self._parse_pool_lock:
+            if self._parse_pool is None:
+                self._parse_pool = ProcessPoolExecutor(max_workers=self.config.parse_workers)
+            return self._parse_pool
+
+    def _parse_thread(self, html: bytes, thread_url: str) -> tuple[dict, float]:
+        """Summarize html in a parse worker (or inline without a pool); returns (parsed, seconds)."""
+        profiler = self.profiler
+        started = time.perf_counter()
+        pool = self._parse_pool_executor()
+        args = (html, thread_url, self.config.parser_backend, profiler is not None)
+        if pool is None:
+            parsed = summarize_thread_html(*args)
+        else:
+            parsed = pool.submit(summarize_thread_html, *args).result()
+        seconds = time.perf_counter() - started
+        self.metrics.observe_parse("thread", seconds)
+        if profiler is not None:
+            # laps from a parse worker are placed relative to the hand-off
+            for step, offset, lap_seconds in parsed.pop("laps", ()):
+                profiler.add(step, started + offset, lap_seconds, worker=pool is not None)
+        return parsed, seconds
+
+    def fetch_thread_details(self, thread_path_or_url: str) -> ThreadDetails:
         thread_url = self._ensure_absolute(thread_path_or_url)
-        response = self.session.get(thread_url, timeout=self.config.timeout)
+        if self.profiler is not None:
+            with self.profiler.span("thread", url=thread_url):
+                return self._fetch_thread_details(thread_url)
+        return self._fetch_thread_details(thread_url)
+
+    def _fetch_thread_details(self, thread_url: str) -> ThreadDetails:
+        if self.cache is not None:
+            return self._fetch_thread_details_cached(thread_url)
+        started = time.perf_counter()
+        response = self._get(self.session, thread_url, "thread", timeout=self.config.timeout)
         response.raise_for_status()
-        response.encoding = "utf-8"
-        soup = BeautifulSoup(response.content, "lxml")
-        magnets = extract_magnet_links(soup)
-        images = extract_image_urls(soup, thread_url)
-        return magnets, images, soup
+        fetch_seconds = time.perf_counter() - started
+        self.metrics.observe_bytes("thread", len(response.content))
+        parsed, parse_seconds = self._parse_thread(response.content, thread_url)
+        return ThreadDetails.from_parsed(thread_url, parsed, fetch_seconds, parse_seconds)
+
+    def _fetch_thread_details_cached(self, thread_url: str) -> ThreadDetails:
+        cache = self.cache
+        cached = cache.load(thread_url)
+        if cached is not None and cached.parsed and cached.is_fresh(cache.ttl):
+            cache.record("hits")
+            return ThreadDetails.from_parsed(thread_url, cached.parsed)
+
+        headers = cached.conditional_headers() if cached is not None else {}
+        started = time.perf_counter()
+        response = self._get(self.session, thread_url, "thread", timeout=self.config.timeout, headers=headers)
+        fetch_seconds = time.perf_counter() - started
+        self.metrics.observe_bytes("thread", len(response.content))
+        if cached is not None and response.status_code == 304:
+            cache.record("hits")
+            cache.record("revalidated")
+            cache.touch(cached)
+            if cached.parsed:
+                return ThreadDetails.from_parsed(thread_url, cached.parsed, fetch_seconds)
+            parsed, parse_seconds = self._parse_thread(cached.body, thread_url)
+            return ThreadDetails.from_parsed(thread_url, parsed, fetch_seconds, parse_seconds)
+
+        response.raise_for_status()
+        parsed, parse_seconds = self._parse_thread(response.content, thread_url)
+        cache.record("misses")
+        cache.store(
+            thread_url,
+            response.content,
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get("Last-Modified"),
+            parsed=parsed,
+        )
+        return ThreadDetails.from_parsed(thread_url, parsed, fetch_seconds, parse_seconds)
+
+    def fetch_many_thread_details(
+        self, thread_paths: Iterable[str], max_workers: int | None = None
+    ) -> Iterator[tuple[str, ThreadDetails | None, Exception | None]]:
+        """Fetch several threads concurrently, yielding results as they complete.
+
+        Each item is ``(thread_path, details, error)`` where ``details`` is the
+        ``ThreadDetails`` from ``fetch_thread_details``, or ``None`` when ``error``
+        holds the ``requests.RequestException`` raised for that thread. Closing the
+        generator early cancels the fetches that have not started yet.
+        """
+        workers = max_workers if max_workers is not None else self.config.concurrency
+        paths = list(thread_paths)
+        if workers <= 1 or len(paths) <= 1:
+            for path in paths:
+                try:
+                    yield path, self.fetch_thread_details(path), None
+                except requests.RequestException as exc:
+                    yield path, None, exc
+            return
+
+        executor = ThreadPoolExecutor(max_workers=min(workers, len(paths)))
+        pending = {executor.submit(self.fetch_thread_details, path): path for path in paths}
+        try:
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    path = pending.pop(future)
+                    try:
+                        yield path, future.result(), None
+                    except requests.RequestException as exc:
+                        yield path, None, exc
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
 
     def download_images(
         self, image_urls: Sequence[str], destination_dir: str
     ) -> Tuple[int, List[str]]:
-        """Download unique images to destination_dir using configured headers/cookies."""
+        """Download unique images to destination_dir using configured headers/cookies.
+
+        Images are fetched by up to ``config.image_workers`` threads, with at
+        most ``config.image_per_host`` concurrent requests to any one host
+        (shared across calls). Each file is streamed to a ``.part`` file and
+        renamed into place once complete, so partial downloads never show up
+        under their final name. Images rejected by ``image_filter`` (URL
+        deny-list, byte size, pixel size) are skipped with a ``filtered ...``
+        reason, before their body is downloaded whenever the server reports
+        the size or honours a Range request.
+        """
         if not image_urls:
             return 0, []
 
         Path(destination_dir).mkdir(parents=True, exist_ok=True)
-        saved = 0
         skipped: list[str] = []
-        seen_urls: set[str] = set()
         seen_names: set[str] = set()
+        names_lock = threading.Lock()
+        unique_urls = list(dict.fromkeys(image_urls))
 
-        for index, image_url in enumerate(image_urls, 1):
-            if image_url in seen_urls:
-                continue
-            seen_urls.add(image_url)
+        def download(index: int, image_url: str) -> bool:
+            error = self._download_image(image_url, index, destination_dir, seen_names, names_lock)
+            if error:
+                skipped.append(f"{image_url} ({error})")
+                return False
+            return True
+
+        workers = min(self.config.image_workers, len(unique_urls))
+        jobs = list(enumerate(unique_urls, 1))
+        if workers <= 1:
+            results = [download(index, url) for index, url in jobs]
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(lambda job: download(*job), jobs))
+        return sum(results), skipped
 
+    def _host_slot(self, url: str) -> threading.BoundedSemaphore:
+        host = urlparse(url).netloc
+        with self._host_slots_lock:
+            slot = self._host_slots.get(host)
+            if slot is None:
+                slot = threading.BoundedSemaphore(max(1, self.config.image_per_host))
+                self._host_slots[host] = slot
+            return slot
+
+    def _download_image(
+        self,
+        image_url: str,
+        index: int,
+        destination_dir: str,
+        seen_names: set[str],
+        names_lock: threading.Lock,
+    ) -> str | None:
+        """Fetch one image into destination_dir; return a skip reason or None on success."""
+        if self.profiler is not None:
+            with self.profiler.span("image", url=image_url) as args:
+                error = self._fetch_image(image_url, index, destination_dir, seen_names, names_lock)
+                if error:
+                    args["skipped"] = error
+                return error
+        return self._fetch_image(image_url, index, destination_dir, seen_names, names_lock)
+
+    def _fetch_image(
+        self,
+        image_url: str,
+        index: int,
+        destination_dir: str,
+        seen_names: set[str],
+        names_lock: threading.Lock,
+    ) -> str | None:
+        image_filter = self.image_filter
+        reason = image_filter.check_url(image_url)
+        if reason:
+            self.metrics.inc("crawler_images_filtered_total", reason="url")
+            return reason
+
+        store = self.image_store
+        if store is not None:
+            stored = store.lookup(image_url)
+            if stored is not None:
+                blob_path, content_type = stored
+                # the store is shared with runs that used other filters, so a
+                # stored blob still has to pass this run's size and dimension limits
+                head = None
+                try:
+                    size = blob_path.stat().st_size
+                    if image_filter.checks_dimensions:
+                        with open(blob_path, "rb") as handle:
+                            head = handle.read(image_filter.sniff_bytes)
+                except OSError as exc:
+                    return str(exc)
+                reason = self._filter_image(content_type, size, head)
+                if reason:
+                    return reason
+                with names_lock:
+                    candidate = _pick_image_filename(image_url, content_type, index, seen_names)
+                store.link(blob_path, Path(destination_dir) / candidate)
+                return None
+
+        with self._host_slot(image_url):
+            headers = {}
+            if image_filter.checks_dimensions:
+                # only the header bytes are needed to read the pixel size; servers
+                # without Range support answer 200 and the size is sniffed from the stream
+                headers["Range"] = f"bytes=0-{image_filter.sniff_bytes - 1}"
             try:
-                response = self.image_session.get(
+                response = self._get(
+                    self.image_session,
                     image_url,
+                    "image",
                     timeout=self.config.image_timeout,
                     allow_redirects=True,
                     stream=True,
+                    headers=headers,
                 )
                 response.raise_for_status()
             except requests.RequestException as exc:  # pragma: no cover - network failures vary
-                skipped.append(f"{image_url} ({exc})")
-                continue
+                return str(exc)
 
-            content_type = response.headers.get("Content-Type", "")
-            if content_type and not content_type.startswith("image/"):
-                response.close()
-                skipped.append(f"{image_url} (content-type {content_type})")
-                continue
+            sniffed = False
+            # bytes already read by the Range probe, when the rest continues from them
+            probed: bytes | None = None
+            if response.status_code == 206:
+                with response:
+                    try:
+                        head = response.content
+                    except requests.RequestException as exc:  # pragma: no cover - network failures vary
+                        return str(exc)
+                    content_type = response.headers.get("Content-Type", "")
+                    total = content_range_total(response.headers.get("Content-Range"))
+                    validator = response.headers.get("ETag") or response.headers.get("Last-Modified")
+                self.metrics.observe_bytes("image", len(head))
+                reason = self._filter_image(content_type, total, head)
+                if reason:
+                    return reason
+                if total is not None and len(head) >= total:
+                    # the probe already carried the whole (small) image
+                    return self._save_image(image_url, content_type, [head], index, destination_dir, seen_names, names_lock)
+                # fetch only the rest; with If-Range a server whose copy changed
+                # since the probe answers 200 with the whole new image instead
+                headers = {"Range": f"bytes={len(head)}-"}
+                if validator:
+                    headers["If-Range"] = validator
+                try:
+                    response = self._get(
+                        self.image_session,
+                        image_url,
+                        "image",
+                        timeout=self.config.image_timeout,
+                        allow_redirects=True,
+                        stream=True,
+                        headers=headers,
+                    )
+                    response.raise_for_status()
+                except requests.RequestException as exc:  # pragma: no cover - network failures vary
+                    return str(exc)
+                sniffed = True
+                if response.status_code == 206:
+                    if not response.headers.get("Content-Range", "").startswith(f"bytes {len(head)}-"):
+                        response.close()
+                        return f"unexpected Content-Range: {response.headers.get('Content-Range')}"
+                    probed = head
 
-            parsed_path = Path(urlparse(image_url).path)
-            filename = sanitize_name(parsed_path.stem or f"image_{index}")
-            extension = parsed_path.suffix
-            if not extension and content_type.startswith("image/"):
-                extension = f".{content_type.split(';')[0].split('/')[-1]}"
-            if not extension:
-                extension = ".jpg"
-
-            candidate = f"{filename}{extension}"
-            counter = 1
-            while candidate in seen_names:
-                candidate = f"{filename}_{counter}{extension}"
-                counter += 1
-            seen_names.add(candidate)
-
-            target_path = Path(destination_dir) / candidate
+            with response:
+                content_length = response.headers.get("Content-Length")
+                chunks = self._counted_chunks(response.iter_content(chunk_size=_adaptive_chunk_size(content_length)))
+                if probed is not None:
+                    # type and size were checked on the probe
+                    chunks = itertools.chain((probed,), chunks)
+                    return self._save_image(image_url, content_type, chunks, index, destination_dir, seen_names, names_lock)
+                content_type = response.headers.get("Content-Type", "")
+                size = int(content_length) if content_length and content_length.isdigit() else None
+                # rejected here, the body is never read: closing the response drops it
+                reason = self._filter_image(content_type, size)
+                if reason:
+                    return reason
+                if image_filter.checks_dimensions and not sniffed:
+                    try:
+                        head, chunks = _peek_chunks(chunks, image_filter.sniff_bytes)
+                    except requests.RequestException as exc:  # pragma: no cover - network failures vary
+                        return str(exc)
+                    reason = self._filter_image(content_type, None, head)
+                    if reason:
+                        return reason
+                return self._save_image(image_url, content_type, chunks, index, destination_dir, seen_names, names_lock)
+
+    def _filter_image(self, content_type: str, size: int | None, head: bytes | None = None) -> str | None:
+        """Skip reason for a non-image response or one the image filter rejects; None to keep it."""
+        if content_type and not content_type.startswith("image/"):
+            return f"content-type {content_type}"
+        reason = self.image_filter.check_size(size)
+        kind = "size"
+        if reason is None and head is not None:
+            reason = self.image_filter.check_dimensions(head)
+            kind = "dimensions"
+        if reason:
+            self.metrics.inc("crawler_images_filtered_total", reason=kind)
+        return reason
+
+    def _counted_chunks(self, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        for chunk in chunks:
+            if chunk:
+                self.metrics.observe_bytes("image", len(chunk))
+                yield chunk
+
+    def _save_image(
+        self,
+        image_url: str,
+        content_type: str,
+        chunks: Iterable[bytes],
+        index: int,
+        destination_dir: str,
+        seen_names: set[str],
+        names_lock: threading.Lock,
+    ) -> str | None:
+        """Write the image body into destination_dir (through the blob store when configured)."""
+        store = self.image_store
+        with names_lock:
+            candidate = _pick_image_filename(image_url, content_type, index, seen_names)
+        target_path = Path(destination_dir) / candidate
+        if store is not None:
+            writer = store.writer()
             try:
-                with response:
-                    with target_path.open("wb") as handle:
-                        for chunk in response.iter_content(chunk_size=8192):
-                            if chunk:
+                self._copy_image_body(chunks, writer.write)
+                blob_path = writer.commit(image_url, content_type, target_path.suffix)
+            except (OSError, requests.RequestException) as exc:  # pragma: no cover - I/O errors vary
+                writer.abort()
+                return str(exc)
+            store.link(blob_path, target_path)
+            return None
+
+        partial_path = target_path.with_name(target_path.name + ".part")
+        try:
+            with partial_path.open("wb") as handle:
+                self._copy_image_body(chunks, handle.write)
+            os.replace(partial_path, target_path)
+        except (OSError, requests.RequestException) as exc:  # pragma: no cover - I/O errors vary
+            partial_path.unlink(missing_ok=True)
+            return str(exc)
+        return None
+
+    def _copy_image_body(self, chunks: Iterable[bytes], write) -> None:
+        """Copy the image body into write; when profiling, split read and write time.
+
+        Chunk reads and writes interleave, so the profile gets their summed
+        durations as an ``image_download`` span followed by ``image_write``.
+        """
+        profiler = self.profiler
+        if profiler is None:
+            for chunk in chunks:
+                write(chunk)
+            return
+        started = time.perf_counter()
+        writing = 0.0
+        size = 0
+        for chunk in chunks:
+            mark = time.perf_counter()
+            write(chunk)
+            writing += time.perf_counter() - mark
+            size += len(chunk)
+        reading = time.perf_counter() - started - writing
+        profiler.add("image_download", started, reading, bytes=size)
+        profiler.add("image_write", started + reading, writing)
+
+    def _ensure_absolute(self, thread_path_or_url: str) -> str:
+        return _ensure_absolute_url(self.config.base_url, thread_path_or_url)
+
+
+class AsyncForumCrawler:
+    """asyncio counterpart of ForumCrawler that multiplexes requests on one event loop.
+
+    HTML is parsed in worker threads (or the ``parse_workers`` processes)
+    so the loop keeps serving requests. ``max_connections`` caps the total number of in-flight requests and
+    ``per_host_connections`` caps them per host. Use as an async context
+    manager so the underlying ``aiohttp`` sessions are closed::
+
+        async with AsyncForumCrawler(config) as crawler:
+            paths = await crawler.fetch_thread_paths("103", 1)
+    """
+
+    def __init__(
+        self,
+        config: CrawlerConfig | None = None,
+        *,
+        max_connections: int = 100,
+        per_host_connections: int = 10,
+    ):
+        if aiohttp is None:
+            raise RuntimeError("AsyncForumCrawler requires aiohttp: pip install aiohttp")
+        self.config = config or CrawlerConfig()
+        self.max_connections = max_connections
+        self.per_host_connections = per_host_connections
+        self.session: aiohttp.ClientSession | None = None
+        self.image_session: aiohttp.ClientSession | None = None
+        self.rate_limiter = _build_rate_limiter(self.config)
+        self.image_filter = ImageFilter.from_config(self.config)
+        # same series as ForumCrawler.metrics, so one summary format covers both engines
+        self.metrics: CrawlMetrics = new_crawler_metrics()
+        self._parse_pool: ProcessPoolExecutor | None = None
+
+    async def __aenter__(self) -> "AsyncForumCrawler":
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def open(self) -> None:
+        # a single connector keeps the total/per-host limits global across both sessions
+        connector = aiohttp.TCPConnector(
+            limit=self.max_connections,
+            limit_per_host=self.per_host_connections,
+            use_dns_cache=self.config.dns_cache_ttl > 0,
+            ttl_dns_cache=self.config.dns_cache_ttl or None,
+        )
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            headers=self.config.build_headers(),
+            timeout=aiohttp.ClientTimeout(total=self.config.timeout),
+        )
+        self.image_session = aiohttp.ClientSession(
+            connector=connector,
+            connector_owner=False,
+            headers=self.config.build_image_headers(),
+            timeout=aiohttp.ClientTimeout(total=self.config.image_timeout),
+        )
+        if self.config.parse_workers > 0:
+            self._parse_pool = ProcessPoolExecutor(max_workers=self.config.parse_workers)
+
+    async def close(self) -> None:
+        if self.image_session is not None:
+            await self.image_session.close()
+        if self.session is not None:
+            await self.session.close()
+        self.session = self.image_session = None
+        if self._parse_pool is not None:
+            self._parse_pool.shutdown(cancel_futures=True)
+            self._parse_pool = None
+
+    async def _pace(self, url: str) -> float:
+        """Wait for url's host token bucket; returns the monotonic send time."""
+        if self.rate_limiter is not None:
+            wait = self.rate_limiter.reserve(url)
+            if wait > 0:
+                await asyncio.sleep(wait)
+        return time.monotonic()
+
+    def cache_stats(self) -> dict[str, int]:
+        """Always zero: the async engine has no response cache."""
+        return {"hits": 0, "misses": 0, "revalidated": 0}
+
+    def rate_stats(self) -> dict[str, dict[str, float]]:
+        """Per-host pacing state of the rate limiter (empty when pacing is off)."""
+        if self.rate_limiter is None:
+            return {}
+        return self.rate_limiter.stats()
+
+    def retry_stats(self) -> dict[str, int]:
+        """Always empty: the async engine neither retries nor trips circuit breakers."""
+        return {}
+
+    def _observe(self, url: str, kind: str, started: float, response=None) -> None:
+        latency = time.monotonic() - started
+        if response is None:
+            self.metrics.observe_request(kind, None, latency)
+            if self.rate_limiter is not None:
+                self.rate_limiter.observe(url, None, latency)
+            return
+        self.metrics.observe_request(kind, response.status, latency)
+        if self.rate_limiter is not None:
+            self.rate_limiter.observe(
+                url, response.status, latency, parse_retry_after(response.headers.get("Retry-After"))
+            )
+
+    async def _get_bytes(self, url: str, kind: str) -> bytes:
+        started = await self._pace(url)
+        try:
+            async with self.session.get(url) as response:
+                self._observe(url, kind, started, response)
+                response.raise_for_status()
+                body = await response.read()
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+            self._observe(url, kind, started)
+            raise
+        self.metrics.observe_bytes(kind, len(body))
+        return body
+
+    async def fetch_thread_paths_from_forum_url(self, forum_url: str) -> List[str]:
+        html = await self._get_bytes(forum_url, "forum")
+        started = time.perf_counter()
+        # parsing would stall every other request on the loop; run it in a thread
+        paths = await asyncio.to_thread(extract_thread_paths, html, self.config.parser_backend)
+        self.metrics.observe_parse("forum", time.perf_counter() - started)
+        return paths
+
+    async def fetch_thread_paths(self, forum_id: str, page: int) -> List[str]:
+        forum_url = f"{self.config.base_url}/forum-{forum_id}-{page}.html"
+        return await self.fetch_thread_paths_from_forum_url(forum_url)
+
+    async def fetch_thread_details(self, thread_path_or_url: str) -> ThreadDetails:
+        thread_url = _ensure_absolute_url(self.config.base_url, thread_path_or_url)
+        started = time.perf_counter()
+        html = await self._get_bytes(thread_url, "thread")
+        fetch_seconds = time.perf_counter() - started
+        started = time.perf_counter()
+        if self._parse_pool is not None:
+            parsed = await asyncio.get_running_loop().run_in_executor(
+                self._parse_pool, summarize_thread_html, html, thread_url, self.config.parser_backend
+            )
+        else:
+            parsed = await asyncio.to_thread(summarize_thread_html, html, thread_url, self.config.parser_backend)
+        parse_seconds = time.perf_counter() - started
+        self.metrics.observe_parse("thread", parse_seconds)
+        return ThreadDetails.from_parsed(thread_url, parsed, fetch_seconds, parse_seconds)
+
+    async def fetch_many_thread_details(
+        self, thread_paths: Iterable[str]
+    ) -> AsyncIterator[tuple[str, ThreadDetails | None, Exception | None]]:
+        """Async equivalent of ForumCrawler.fetch_many_thread_details."""
+
+        async def run(path: str):
+            try:
+                return path, await self.fetch_thread_details(path), None
+            except (aiohttp.ClientError, asyncio.TimeoutError) as exc:
+                return path, None, exc
+
+        tasks = [asyncio.ensure_future(run(path)) for path in thread_paths]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def download_images(
+        self, image_urls: Sequence[str], destination_dir: str
+    ) -> Tuple[int, List[str]]:
+        """Download images concurrently; same (saved, skipped) contract as ForumCrawler."""
+        if not image_urls:
+            return 0, []
+
+        Path(destination_dir).mkdir(parents=True, exist_ok=True)
+        skipped: list[str] = []
+        seen_names: set[str] = set()
+        unique_urls = list(dict.fromkeys(image_urls))
+
+        image_filter = self.image_filter
+
+        async def fetch_one(index: int, image_url: str) -> bool:
+            reason = image_filter.check_url(image_url)
+            if reason:
+                self.metrics.inc("crawler_images_filtered_total", reason="url")
+                skipped.append(f"{image_url} ({reason})")
+                return False
+            started = await self._pace(image_url)
+            try:
+                async with self.image_session.get(image_url, allow_redirects=True) as response:
+                    self._observe(image_url, "image", started, response)
+                    response.raise_for_status()
+                    content_type = response.headers.get("Content-Type", "")
+                    if content_type and not content_type.startswith("image/"):
+                        skipped.append(f"{image_url} (content-type {content_type})")
+                        return False
+                    reason = image_filter.check_size(response.content_length)
+                    kind = "size"
+                    head = b""
+                    if reason is None and image_filter.checks_dimensions:
+                        while len(head) < image_filter.sniff_bytes:
+                            chunk = await response.content.read(image_filter.sniff_bytes - len(head))
+                            if not chunk:
+                                break
+                            head += chunk
+                        self.metrics.observe_bytes("image", len(head))
+                        reason = image_filter.check_dimensions(head)
+                        kind = "dimensions"
+                    if reason:
+                        self.metrics.inc("crawler_images_filtered_total", reason=kind)
+                        skipped.append(f"{image_url} ({reason})")
+                        return False
+                    candidate = _pick_image_filename(image_url, content_type, index, seen_names)
+                    target_path = Path(destination_dir) / candidate
+                    partial_path = target_path.with_name(target_path.name + ".part")
+                    chunk_size = _adaptive_chunk_size(response.headers.get("Content-Length"))
+                    try:
+                        with partial_path.open("wb") as handle:
+                            handle.write(head)
+                            async for chunk in response.content.iter_chunked(chunk_size):
+                                self.metrics.observe_bytes("image", len(chunk))
                                 handle.write(chunk)
-                saved += 1
-            except OSError as exc:  # pragma: no cover - filesystem errors vary
+                    except BaseException:
+                        partial_path.unlink(missing_ok=True)
+                        raise
+                    os.replace(partial_path, target_path)
+                return True
+            except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as exc:  # pragma: no cover
                 skipped.append(f"{image_url} ({exc})")
-        return saved, skipped
+                return False
 
-    def _ensure_absolute(self, thread_path_or_url: str) -> str:
-        if thread_path_or_url.startswith(("http://", "https://")):
-            return thread_path_or_url
-        return f"{self.config.base_url.rstrip('/')}/{thread_path_or_url.lstrip('/')}"
+        results = await asyncio.gather(
+            *(fetch_one(index, url) for index, url in enumerate(unique_urls, 1))
+        )
+        return sum(results), skipped
 
 
 __all__ = [
+    "PARSER_BACKENDS",
+    "AsyncForumCrawler",
     "CrawlerConfig",
     "ForumCrawler",
+    "ThreadDetails",
     "extract_magnet_links",
     "extract_thread_paths",
+    "parse_thread_html",
+    "summarize_thread_html",
     "sanitize_name",
 ]
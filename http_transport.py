@@ -0,0 +1,322 @@
+"""HTTP transport for ForumCrawler sessions: sized keep-alive pools, cached DNS, optional HTTP/2.
+
+``build_adapter`` returns the ``requests`` adapter mounted on a crawler
+session. The default is a urllib3 ``HTTPAdapter`` whose pools keep
+``pool_maxsize`` idle connections per host (so concurrent workers reuse
+connections, and their TLS sessions, instead of opening new ones), whose
+sockets send TCP keep-alive probes, and whose connections look up host
+names through a shared ``DNSCache``. With ``http2`` it returns an
+``HTTPXAdapter`` that multiplexes requests over HTTP/2 connections with
+``httpx`` (``pip install "httpx[http2]"``).
+"""
+
+from __future__ import annotations
+
+import ipaddress
+import os
+import socket
+import ssl
+import threading
+import time
+from typing import Callable, Dict, List, Tuple
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import DEFAULT_CA_BUNDLE_PATH, get_encoding_from_headers, select_proxy
+from urllib3.connection import HTTPConnection
+from urllib3.poolmanager import pool_classes_by_scheme
+from urllib3.util.request import ACCEPT_ENCODING
+
+try:  # optional dependency, only needed for http2
+    import httpx
+except ImportError:  # pragma: no cover - depends on the environment
+    httpx = None
+
+# headers tied to one HTTP/1.1 connection; HTTP/2 forbids them
+HOP_BY_HOP_HEADERS = frozenset(
+    ["connection", "keep-alive", "proxy-connection", "transfer-encoding", "upgrade", "te"]
+)
+
+
+def accept_encoding(compress: bool) -> str:
+    """``Accept-Encoding`` for the session: every coding urllib3 can decode here, or identity."""
+    return ACCEPT_ENCODING if compress else "identity"
+
+
+def keepalive_socket_options(idle: int = 60, interval: int = 15, count: int = 4) -> List[Tuple[int, int, int]]:
+    """urllib3's default options (TCP_NODELAY) plus TCP keep-alive probes where the OS supports them."""
+    options = list(HTTPConnection.default_socket_options)
+    options.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1))
+    for name, value in (("TCP_KEEPIDLE", idle), ("TCP_KEEPINTVL", interval), ("TCP_KEEPCNT", count)):
+        if hasattr(socket, name):
+            options.append((socket.IPPROTO_TCP, getattr(socket, name), value))
+    return options
+
+
+class DNSCache:
+    """Thread-safe ``getaddrinfo`` cache keyed by host and port.
+
+    Answers are kept for ``ttl`` seconds. An address that fails to connect
+    is dropped with ``forget`` and the connection falls back to a full
+    lookup.
+    """
+
+    def __init__(self, ttl: float = 300.0):
+        self.ttl = ttl
+        self._entries: Dict[Tuple[str, int], Tuple[float, str]] = {}
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0}
+
+    def resolve(self, host: str, port: int) -> str:
+        """First address for host, from the cache when fresh; raises ``OSError`` like getaddrinfo."""
+        try:
+            ipaddress.ip_address(host)
+        except ValueError:
+            pass
+        else:
+            return host
+        key = (host, port)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._stats["hits"] += 1
+                return entry[1]
+            self._stats["misses"] += 1
+        address = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)[0][4][0]
+        with self._lock:
+            self._entries[key] = (now + self.ttl, address)
+        return address
+
+    def forget(self, host: str, port: int) -> None:
+        with self._lock:
+            self._entries.pop((host, port), None)
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return dict(self._stats)
+
+
+def transport_pool_classes(
+    dns_cache: DNSCache | None = None,
+    on_connect: Callable[[str], None] | None = None,
+    base: dict | None = None,
+) -> dict:
+    """urllib3 pool classes whose connections resolve through dns_cache and report to on_connect.
+
+    ``base`` maps scheme to the pool classes to extend (urllib3's by
+    default). Install as ``PoolManager.pool_classes_by_scheme``.
+    """
+    base = base or pool_classes_by_scheme
+
+    def tuned(connection_cls):
+        class TunedConnection(connection_cls):
+            def _new_conn(self):
+                host = self._dns_host
+                address = host
+                if dns_cache is not None:
+                    try:
+                        address = dns_cache.resolve(host, self.port)
+                    except OSError:
+                        pass  # let urllib3 resolve it and raise its own error
+                # the TLS handshake reads self.host after this returns, so the
+                # resolved address only replaces the name for the TCP connect
+                self._dns_host = address
+                try:
+                    sock = super()._new_conn()
+                except Exception:
+                    if address == host:
+                        raise
+                    # stale or unreachable address: resolve afresh and let
+                    # urllib3 try every address the name has
+                    dns_cache.forget(host, self.port)
+                    self._dns_host = host
+                    sock = super()._new_conn()
+                finally:
+                    self._dns_host = host
+                if on_connect is not None:
+                    on_connect(host)
+                return sock
+
+        return TunedConnection
+
+    classes = {}
+    for scheme, pool_cls in base.items():
+        classes[scheme] = type(f"Tuned{pool_cls.__name__}", (pool_cls,), {"ConnectionCls": tuned(pool_cls.ConnectionCls)})
+    return classes
+
+
+class TunedHTTPAdapter(HTTPAdapter):
+    """``HTTPAdapter`` with socket options and custom pool classes on its pool manager."""
+
+    def __init__(self, *, pool_classes: dict | None = None, socket_options=None, **kwargs):
+        self.pool_classes = pool_classes
+        self.socket_options = socket_options
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        if self.socket_options is not None:
+            pool_kwargs.setdefault("socket_options", self.socket_options)
+        super().init_poolmanager(connections, maxsize, block=block, **pool_kwargs)
+        if self.pool_classes is not None:
+            self.poolmanager.pool_classes_by_scheme = self.pool_classes
+
+
+def _ssl_context(verify, cert) -> ssl.SSLContext | bool:
+    """httpx ``verify`` for requests' ``verify`` (bool or CA bundle path) and ``cert`` (path or pair)."""
+    if verify is True and not cert:
+        return True
+    if verify is False:
+        context = ssl.create_default_context()
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+    elif isinstance(verify, str):
+        if os.path.isdir(verify):
+            context = ssl.create_default_context(capath=verify)
+        else:
+            context = ssl.create_default_context(cafile=verify)
+    else:
+        # the bundle requests' own adapter verifies against
+        context = ssl.create_default_context(cafile=DEFAULT_CA_BUNDLE_PATH)
+    if cert:
+        if isinstance(cert, str):
+            context.load_cert_chain(cert)
+        else:
+            context.load_cert_chain(*cert)
+    return context
+
+
+class _HTTPXBody:
+    """The ``response.raw`` interface ``requests`` reads bodies through, backed by an httpx stream."""
+
+    def __init__(self, response: "httpx.Response"):
+        self._response = response
+        self._chunks = None
+
+    def stream(self, chunk_size: int = 65536, decode_content: bool = True):
+        try:
+            yield from self._response.iter_bytes(chunk_size)
+        except httpx.TimeoutException as exc:
+            raise requests.ConnectionError(exc) from exc
+        except httpx.HTTPError as exc:
+            raise requests.exceptions.ChunkedEncodingError(exc) from exc
+
+    def read(self, amt: int | None = None, decode_content: bool = True) -> bytes:
+        if self._chunks is None:
+            self._chunks = self.stream(amt or 65536)
+        if amt is None:
+            return b"".join(self._chunks)
+        return next(self._chunks, b"")
+
+    def close(self) -> None:
+        self._response.close()
+
+
+class HTTPXAdapter(BaseAdapter):
+    """Send ``requests`` through an ``httpx.Client`` speaking HTTP/2 where the server offers it.
+
+    Requests to one host share a single multiplexed connection, so
+    concurrent workers do not each need their own TLS connection.
+    Redirects and cookies stay with the ``requests.Session``; cookies set
+    by responses are not copied into the session jar. The session's
+    ``proxies``, ``verify``, and ``cert`` (already merged with the
+    environment when ``trust_env`` is on) pick the client: one per
+    combination in use, since httpx fixes them when a client is created.
+    """
+
+    def __init__(self, *, max_connections: int = 10, max_keepalive: int = 10):
+        if httpx is None:
+            raise RuntimeError('HTTP/2 transport requires httpx: pip install "httpx[http2]"')
+        super().__init__()
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive)
+        self._clients: Dict[tuple, "httpx.Client"] = {}
+        self._lock = threading.Lock()
+
+    def _client(self, proxy: str | None, verify, cert) -> "httpx.Client":
+        key = (proxy, verify, cert)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = self._clients[key] = httpx.Client(
+                    http2=True,
+                    follow_redirects=False,
+                    # requests already resolved proxies and CA bundles from the environment
+                    trust_env=False,
+                    proxy=proxy,
+                    verify=_ssl_context(verify, cert),
+                    limits=self.limits,
+                )
+            return client
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        if isinstance(timeout, tuple):
+            connect, read = timeout
+            timeout = httpx.Timeout(read, connect=connect)
+        if isinstance(cert, list):
+            cert = tuple(cert)
+        client = self._client(select_proxy(request.url, proxies or {}), verify, cert)
+        headers = [(name, value) for name, value in request.headers.items() if name.lower() not in HOP_BY_HOP_HEADERS]
+        outgoing = client.build_request(
+            request.method, request.url, headers=headers, content=request.body, timeout=timeout
+        )
+        try:
+            incoming = client.send(outgoing, stream=True)
+        except httpx.TimeoutException as exc:
+            raise requests.Timeout(exc, request=request) from exc
+        except httpx.HTTPError as exc:
+            raise requests.ConnectionError(exc, request=request) from exc
+
+        response = requests.Response()
+        response.status_code = incoming.status_code
+        response.reason = incoming.reason_phrase
+        response.headers = CaseInsensitiveDict(incoming.headers.multi_items())
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.raw = _HTTPXBody(incoming)
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        return response
+
+    def close(self) -> None:
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+        for client in clients:
+            client.close()
+
+
+def build_adapter(
+    config,
+    pool_size: int,
+    *,
+    dns_cache: DNSCache | None = None,
+    on_connect: Callable[[str], None] | None = None,
+    pool_classes: dict | None = None,
+) -> BaseAdapter:
+    """Adapter for one crawler session from the transport fields of a ``CrawlerConfig``.
+
+    ``pool_size`` is the number of connections kept per host unless
+    ``config.pool_maxsize`` overrides it. ``pool_classes`` (for example
+    the profiler's timed pools) are extended with the DNS cache.
+    """
+    pool_size = config.pool_maxsize or pool_size
+    if config.http2:
+        return HTTPXAdapter(max_connections=pool_size * config.pool_hosts, max_keepalive=pool_size)
+    return TunedHTTPAdapter(
+        pool_connections=config.pool_hosts,
+        pool_maxsize=pool_size,
+        pool_classes=transport_pool_classes(dns_cache, on_connect, base=pool_classes),
+        socket_options=keepalive_socket_options() if config.tcp_keepalive else None,
+    )
+
+
+__all__ = [
+    "DNSCache",
+    "HTTPXAdapter",
+    "TunedHTTPAdapter",
+    "accept_encoding",
+    "build_adapter",
+    "keepalive_socket_options",
+    "transport_pool_classes",
+]
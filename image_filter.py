@@ -0,0 +1,159 @@
+"""Decide which thread images are worth downloading before their bodies are transferred.
+
+Forum threads embed smileys, avatars, rank stars, and layout icons next to
+the pictures that matter. ``ImageFilter`` rejects them by URL pattern, by
+``Content-Length``, or by pixel size read from the first bytes of the
+image (PNG, GIF, JPEG, WebP, BMP headers), so the crawler can drop them
+after a header sniff instead of a full download.
+"""
+
+from __future__ import annotations
+
+import re
+import struct
+from typing import Sequence, Tuple
+
+# Discuz static assets that are never post content
+DEFAULT_IMAGE_DENY_PATTERNS = (
+    r"/static/image/",  # theme icons, smileys, rank stars, buttons
+    r"/uc_server/(?:data/)?avatar",  # user avatars
+    r"/smil(?:ey|ies)/",
+    r"/(?:none|spacer|blank)\.gif$",
+)
+# enough for PNG/GIF/WebP/BMP headers and for JPEG frame headers behind typical EXIF blocks
+DEFAULT_SNIFF_BYTES = 16384
+
+_JPEG_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+def _jpeg_dimensions(head: bytes) -> Tuple[int, int] | None:
+    offset = 2
+    while offset + 4 <= len(head):
+        if head[offset] != 0xFF:
+            return None
+        marker = head[offset + 1]
+        if marker == 0xFF:  # fill byte
+            offset += 1
+            continue
+        if marker in (0x01, *range(0xD0, 0xD8)):  # standalone markers carry no length
+            offset += 2
+            continue
+        (length,) = struct.unpack(">H", head[offset + 2:offset + 4])
+        if marker in _JPEG_SOF_MARKERS:
+            if offset + 9 > len(head):
+                return None
+            height, width = struct.unpack(">HH", head[offset + 5:offset + 9])
+            return width, height
+        offset += 2 + length
+    return None
+
+
+def image_dimensions(head: bytes) -> Tuple[int, int] | None:
+    """``(width, height)`` from the leading bytes of an image, or None if unknown or cut short."""
+    if head.startswith(b"\x89PNG\r\n\x1a\n") and len(head) >= 24:
+        return struct.unpack(">II", head[16:24])
+    if head[:6] in (b"GIF87a", b"GIF89a") and len(head) >= 10:
+        return struct.unpack("<HH", head[6:10])
+    if head.startswith(b"\xff\xd8"):
+        return _jpeg_dimensions(head)
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP" and len(head) >= 30:
+        chunk = head[12:16]
+        if chunk == b"VP8 ":
+            width, height = struct.unpack("<HH", head[26:30])
+            return width & 0x3FFF, height & 0x3FFF
+        if chunk == b"VP8L":
+            bits = int.from_bytes(head[21:25], "little")
+            return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+        if chunk == b"VP8X":
+            return int.from_bytes(head[24:27], "little") + 1, int.from_bytes(head[27:30], "little") + 1
+        return None
+    if head.startswith(b"BM") and len(head) >= 26:
+        width, height = struct.unpack("<ii", head[18:26])
+        return abs(width), abs(height)
+    return None
+
+
+def content_range_total(value: str | None) -> int | None:
+    """Full size from a ``Content-Range: bytes 0-16383/52311`` header (None when absent or ``*``)."""
+    if not value or "/" not in value:
+        return None
+    total = value.rsplit("/", 1)[1].strip()
+    return int(total) if total.isdigit() else None
+
+
+class ImageFilter:
+    """URL deny-list, byte-size bounds, and minimum pixel size for image downloads.
+
+    Every check returns None to keep the image or a short reason to skip
+    it. Images whose size or dimensions cannot be determined are kept.
+    """
+
+    def __init__(
+        self,
+        *,
+        deny_patterns: Sequence[str] = (),
+        min_bytes: int = 0,
+        max_bytes: int | None = None,
+        min_width: int = 0,
+        min_height: int = 0,
+        sniff_bytes: int = DEFAULT_SNIFF_BYTES,
+    ):
+        self.deny_patterns = tuple(deny_patterns)
+        self._deny = (
+            re.compile("|".join(f"(?:{pattern})" for pattern in self.deny_patterns), re.IGNORECASE)
+            if self.deny_patterns
+            else None
+        )
+        self.min_bytes = max(0, min_bytes)
+        self.max_bytes = max_bytes
+        self.min_width = max(0, min_width)
+        self.min_height = max(0, min_height)
+        self.sniff_bytes = max(32, sniff_bytes)
+
+    @classmethod
+    def from_config(cls, config) -> "ImageFilter":
+        return cls(
+            deny_patterns=config.image_deny_patterns,
+            min_bytes=config.image_min_bytes,
+            max_bytes=config.image_max_bytes,
+            min_width=config.image_min_width,
+            min_height=config.image_min_height,
+            sniff_bytes=config.image_sniff_bytes,
+        )
+
+    @property
+    def checks_dimensions(self) -> bool:
+        return bool(self.min_width or self.min_height)
+
+    def check_url(self, url: str) -> str | None:
+        match = self._deny.search(url) if self._deny is not None else None
+        return f"filtered url ({match.group(0)})" if match else None
+
+    def check_size(self, size: int | None) -> str | None:
+        if size is None:
+            return None
+        if size < self.min_bytes:
+            return f"filtered size {size} < {self.min_bytes} bytes"
+        if self.max_bytes is not None and size > self.max_bytes:
+            return f"filtered size {size} > {self.max_bytes} bytes"
+        return None
+
+    def check_dimensions(self, head: bytes) -> str | None:
+        if not self.checks_dimensions:
+            return None
+        dimensions = image_dimensions(head)
+        if dimensions is None:
+            return None
+        width, height = dimensions
+        if width < self.min_width or height < self.min_height:
+            return f"filtered dimensions {width}x{height} < {self.min_width}x{self.min_height}"
+        return None
+
+
+__all__ = [
+    "DEFAULT_IMAGE_DENY_PATTERNS",
+    "DEFAULT_SNIFF_BYTES",
+    "ImageFilter",
+    "content_range_total",
+    "image_dimensions",
+]
@@ -0,0 +1,133 @@
+"""Content-addressed image store: each distinct image is written to disk once."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+from pathlib import Path
+
+DEFAULT_BLOB_DIR = "data/figures/_blobs"
+MANIFEST_NAME = "manifest.json"
+
+
+class BlobWriter:
+    """Temp file that hashes what is written to it; ``commit`` moves it into the store."""
+
+    def __init__(self, store: "ImageBlobStore"):
+        self._store = store
+        self._digest = hashlib.sha256()
+        fd, self._temp_name = tempfile.mkstemp(dir=store.root, suffix=".part")
+        self._handle = os.fdopen(fd, "wb")
+
+    def write(self, chunk: bytes) -> None:
+        self._digest.update(chunk)
+        self._handle.write(chunk)
+
+    def commit(self, url: str, content_type: str, extension: str) -> Path:
+        self._handle.close()
+        digest = self._digest.hexdigest()
+        blob_path = self._store.blob_path(digest, extension)
+        blob_path.parent.mkdir(parents=True, exist_ok=True)
+        # concurrent writers of the same content must not both count as new
+        with self._store._lock:
+            duplicate = blob_path.exists()
+            if duplicate:
+                os.unlink(self._temp_name)
+            else:
+                os.replace(self._temp_name, blob_path)
+        self._store._count("duplicate_blobs" if duplicate else "new_blobs")
+        self._store.remember(url, digest, extension, content_type)
+        return blob_path
+
+    def abort(self) -> None:
+        self._handle.close()
+        Path(self._temp_name).unlink(missing_ok=True)
+
+
+class ImageBlobStore:
+    """Store images under ``root/<aa>/<sha256><ext>`` with a URL -> hash index.
+
+    Per-thread folders get hard links to the blobs; where hard links are not
+    possible the file is recorded in the folder's ``manifest.json`` instead.
+    URLs already in the index are served from disk without a request.
+    """
+
+    def __init__(self, root: str = DEFAULT_BLOB_DIR):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.root / "index.sqlite3"), check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS images ("
+            " url TEXT PRIMARY KEY,"
+            " digest TEXT NOT NULL,"
+            " extension TEXT NOT NULL,"
+            " content_type TEXT NOT NULL)"
+        )
+        self._conn.commit()
+        self._stats = {"url_hits": 0, "new_blobs": 0, "duplicate_blobs": 0}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self._stats[key] += 1
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return dict(self._stats)
+
+    def blob_path(self, digest: str, extension: str) -> Path:
+        return self.root / digest[:2] / f"{digest}{extension}"
+
+    def lookup(self, url: str) -> tuple[Path, str] | None:
+        """Return ``(blob_path, content_type)`` for a URL stored earlier, if the blob still exists."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT digest, extension, content_type FROM images WHERE url = ?", (url,)
+            ).fetchone()
+        if row is None:
+            return None
+        blob_path = self.blob_path(row[0], row[1])
+        if not blob_path.exists():
+            return None
+        self._count("url_hits")
+        return blob_path, row[2]
+
+    def remember(self, url: str, digest: str, extension: str, content_type: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO images (url, digest, extension, content_type) VALUES (?, ?, ?, ?)",
+                (url, digest, extension, content_type),
+            )
+            self._conn.commit()
+
+    def writer(self) -> BlobWriter:
+        return BlobWriter(self)
+
+    def link(self, blob_path: Path, target_path: Path) -> None:
+        """Expose a blob as target_path via hard link, or a manifest entry as fallback."""
+        try:
+            os.link(blob_path, target_path)
+            return
+        except FileExistsError:
+            return
+        except OSError:
+            pass
+        manifest_path = target_path.parent / MANIFEST_NAME
+        with self._lock:
+            try:
+                manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                manifest = {}
+            manifest[target_path.name] = os.path.relpath(blob_path, target_path.parent)
+            manifest_path.write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+__all__ = ["DEFAULT_BLOB_DIR", "BlobWriter", "ImageBlobStore"]
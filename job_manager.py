@@ -0,0 +1,251 @@
+"""Run several dashboard crawl jobs side by side under one global worker budget."""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from itertools import islice
+from typing import Callable, Dict, List
+
+# newest magnets/URLs each job keeps in memory; older ones live only in the output files
+DEFAULT_RESULT_CAPACITY = 10000
+
+# per-job status fields shown by the dashboard
+DEFAULT_JOB_STATUS = {
+    "state": "queued",
+    "running": False,
+    "paused": False,
+    "progress": 0,
+    "total": 0,
+    "magnet_count": 0,
+    "duplicate_count": 0,
+    "image_count": 0,
+    "current_page": 0,
+    "message": "就绪",
+    "current_url": "",
+    "magnet_file": "",
+    "url_file": "",
+    "records_file": "",
+    "profile_file": "",
+    "figures_dir": "",
+}
+
+
+class ResultLog:
+    """Append-only result sequence that keeps only the newest ``capacity`` items.
+
+    Every item has a cursor: its position among all items ever appended.
+    ``page`` returns the items after a cursor together with the cursor to
+    ask for next, so readers fetch only what is new; a reader that fell
+    behind the retained window is resumed at its start and told so.
+    Not thread-safe on its own; CrawlJob guards it with its lock.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_RESULT_CAPACITY):
+        self._items: deque = deque(maxlen=max(1, capacity))
+        self.end = 0
+
+    @property
+    def start(self) -> int:
+        """Cursor of the oldest retained item."""
+        return self.end - len(self._items)
+
+    def extend(self, items) -> None:
+        items = list(items)
+        self._items.extend(items)
+        self.end += len(items)
+
+    def page(self, cursor: int = 0, limit: int | None = None) -> dict:
+        start = self.start
+        truncated = cursor < start
+        cursor = min(max(cursor, start), self.end)
+        offset = cursor - start
+        stop = len(self._items) if limit is None else min(len(self._items), offset + max(0, limit))
+        items = list(islice(self._items, offset, stop))
+        return {
+            "items": items,
+            "cursor": cursor + len(items),
+            "start": start,
+            "end": self.end,
+            "truncated": truncated,
+        }
+
+
+class CrawlJob:
+    """One crawl: its parameters, status, pause/stop controls, and collected results."""
+
+    def __init__(self, job_id: str, params: dict, cost: int, result_capacity: int = DEFAULT_RESULT_CAPACITY):
+        self.job_id = job_id
+        self.params = dict(params)
+        self.cost = cost
+        self.created_at = time.time()
+        self.pause_event = threading.Event()
+        self.pause_event.set()
+        self.stop_event = threading.Event()
+        self.results = {"magnets": ResultLog(result_capacity), "urls": ResultLog(result_capacity)}
+        self.thread: threading.Thread | None = None
+        # the ForumCrawler the job runs with, set by the job target
+        self.crawler = None
+        self._lock = threading.Lock()
+        # bumped on every status change or new result; stream readers wait on it
+        self.version = 0
+        self._changed = threading.Condition(self._lock)
+        self.status = dict(DEFAULT_JOB_STATUS, running=True, message="排队中，等待空闲的并发额度")
+
+    def _touch(self) -> None:
+        # caller holds self._lock
+        self.version += 1
+        self._changed.notify_all()
+
+    def update_status(self, **kwargs) -> None:
+        with self._lock:
+            self.status.update(kwargs)
+            self._touch()
+
+    def add_magnets(self, magnets) -> None:
+        with self._lock:
+            self.results["magnets"].extend(magnets)
+            self._touch()
+
+    def add_urls(self, urls) -> None:
+        with self._lock:
+            self.results["urls"].extend(urls)
+            self._touch()
+
+    def results_page(self, kind: str, cursor: int = 0, limit: int | None = None) -> dict:
+        """Page of ``kind`` ("magnets" or "urls") results after ``cursor``; see ResultLog.page."""
+        with self._lock:
+            return self.results[kind].page(cursor, limit)
+
+    def wait_for_change(self, version: int, timeout: float) -> int:
+        """Block until the job changes after ``version`` or timeout passes; return the current version."""
+        with self._lock:
+            self._changed.wait_for(lambda: self.version != version, timeout=timeout)
+            return self.version
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            status = dict(self.status)
+        status["job_id"] = self.job_id
+        status["forum_id"] = self.params.get("forum_id", "")
+        status["pages"] = self.params.get("pages", 0)
+        status["created_at"] = self.created_at
+        status["magnet_file_name"] = os.path.basename(status["magnet_file"]) if status["magnet_file"] else ""
+        status["url_file_name"] = os.path.basename(status["url_file"]) if status["url_file"] else ""
+        status["records_file_name"] = os.path.basename(status["records_file"]) if status["records_file"] else ""
+        status["profile_file_name"] = os.path.basename(status["profile_file"]) if status["profile_file"] else ""
+        return status
+
+    @property
+    def running(self) -> bool:
+        with self._lock:
+            return self.status["running"]
+
+    def pause(self) -> bool:
+        with self._lock:
+            if not self.status["running"] or self.status["paused"]:
+                return False
+            self.pause_event.clear()
+            self.status.update(paused=True, message="爬取已暂停")
+            self._touch()
+        return True
+
+    def resume(self) -> bool:
+        with self._lock:
+            if not self.status["running"] or not self.status["paused"]:
+                return False
+            self.pause_event.set()
+            self.status.update(paused=False, message="爬取已恢复")
+            self._touch()
+        return True
+
+    def stop(self) -> bool:
+        with self._lock:
+            if not self.status["running"]:
+                return False
+            self.stop_event.set()
+            self.pause_event.set()
+            self.status.update(paused=False, message="正在停止爬虫...")
+            self._touch()
+        return True
+
+
+class JobManager:
+    """Start jobs in their own threads once the shared worker budget allows.
+
+    A job's ``cost`` is the number of worker threads it uses; jobs wait in
+    the ``queued`` state while running jobs hold the budget. Only the most
+    recent ``keep_finished`` finished jobs are retained.
+    """
+
+    def __init__(self, budget: int = 16, keep_finished: int = 20, result_capacity: int = DEFAULT_RESULT_CAPACITY):
+        self.budget = max(1, budget)
+        self.keep_finished = keep_finished
+        self.result_capacity = result_capacity
+        self._jobs: Dict[str, CrawlJob] = {}
+        self._in_use = 0
+        self._condition = threading.Condition()
+
+    def submit(self, params: dict, target: Callable[[CrawlJob], None], cost: int = 1) -> CrawlJob:
+        """Create a job and run ``target(job)`` in a thread once budget is available."""
+        job = CrawlJob(uuid.uuid4().hex[:8], params, min(max(1, cost), self.budget), self.result_capacity)
+        with self._condition:
+            self._jobs[job.job_id] = job
+            self._prune()
+        job.thread = threading.Thread(
+            target=self._run, args=(job, target), name=f"crawl-job-{job.job_id}", daemon=True
+        )
+        job.thread.start()
+        return job
+
+    def _run(self, job: CrawlJob, target: Callable[[CrawlJob], None]) -> None:
+        with self._condition:
+            while self._in_use + job.cost > self.budget and not job.stop_event.is_set():
+                self._condition.wait(timeout=0.5)
+            if job.stop_event.is_set():
+                job.update_status(state="stopped", running=False, paused=False, message="任务在排队时已取消")
+                return
+            self._in_use += job.cost
+        job.update_status(state="running", message="开始爬取...")
+        try:
+            target(job)
+        except Exception as exc:  # keep the scheduler alive whatever the job does
+            job.update_status(state="failed", message=f"爬取过程中出错: {exc}")
+        finally:
+            with self._condition:
+                self._in_use -= job.cost
+                self._condition.notify_all()
+            state = "stopped" if job.stop_event.is_set() else job.snapshot()["state"]
+            if state == "running":
+                state = "finished"
+            job.update_status(state=state, running=False, paused=False)
+            job.pause_event.set()
+
+    def _prune(self) -> None:
+        finished = [job for job in self._jobs.values() if not job.running]
+        finished.sort(key=lambda job: job.created_at)
+        for job in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self._jobs[job.job_id]
+
+    def get(self, job_id: str) -> CrawlJob | None:
+        with self._condition:
+            return self._jobs.get(job_id)
+
+    def jobs(self) -> List[CrawlJob]:
+        """All retained jobs, newest first."""
+        with self._condition:
+            return sorted(self._jobs.values(), key=lambda job: job.created_at, reverse=True)
+
+    def latest(self) -> CrawlJob | None:
+        jobs = self.jobs()
+        return jobs[0] if jobs else None
+
+    def budget_in_use(self) -> int:
+        with self._condition:
+            return self._in_use
+
+
+__all__ = ["DEFAULT_JOB_STATUS", "DEFAULT_RESULT_CAPACITY", "CrawlJob", "JobManager", "ResultLog"]
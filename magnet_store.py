@@ -0,0 +1,122 @@
+"""Global magnet de-duplication keyed by BitTorrent info-hash."""
+
+from __future__ import annotations
+
+import base64
+import hashlib
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Iterable, List
+
+DEFAULT_MAGNET_INDEX_PATH = "data/magnet_index.bin"
+_DIGEST_SIZE = 20
+_BTIH = re.compile(r"xt=urn:btih:([0-9a-zA-Z]+)", re.IGNORECASE)
+
+
+def parse_info_hash(magnet: str) -> str | None:
+    """Return the lower-case hex ``btih`` info-hash of a magnet link, or None.
+
+    Both the 40-character hex and the 32-character base32 encodings are
+    accepted.
+    """
+    match = _BTIH.search(magnet)
+    if not match:
+        return None
+    value = match.group(1)
+    if len(value) == 40:
+        try:
+            bytes.fromhex(value)
+        except ValueError:
+            return None
+        return value.lower()
+    if len(value) == 32:
+        try:
+            return base64.b32decode(value.upper()).hex()
+        except ValueError:
+            return None
+    return None
+
+
+def _magnet_key(magnet: str) -> bytes:
+    info_hash = parse_info_hash(magnet)
+    if info_hash is not None:
+        return bytes.fromhex(info_hash)
+    # magnets without a usable btih are de-duplicated by their exact text
+    return hashlib.sha1(magnet.strip().encode("utf-8")).digest()
+
+
+class MagnetDedupStore:
+    """In-memory set of 20-byte info-hashes backed by an append-only file.
+
+    The file is just the concatenated digests, so a million magnets cost
+    20 MB on disk and loading it is a single read. ``filter`` drops magnets
+    seen in this or any earlier run and remembers the new ones in memory;
+    ``commit`` appends them to the file once the output holding them has
+    been flushed, so a crash in between cannot make a resumed run skip
+    magnets that never reached the output.
+    """
+
+    def __init__(self, path: str = DEFAULT_MAGNET_INDEX_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._seen: set[bytes] = set()
+        # returned by filter but not yet written to the file
+        self._uncommitted: set[bytes] = set()
+        self.duplicates = 0
+        if self.path.exists():
+            data = self.path.read_bytes()
+            usable = len(data) - len(data) % _DIGEST_SIZE
+            self._seen.update(
+                data[offset:offset + _DIGEST_SIZE] for offset in range(0, usable, _DIGEST_SIZE)
+            )
+            if usable != len(data):
+                # drop a digest torn by a crash so later appends stay aligned
+                os.truncate(self.path, usable)
+        self._handle = self.path.open("ab")
+
+    def __enter__(self) -> "MagnetDedupStore":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self._seen)
+
+    def close(self) -> None:
+        with self._lock:
+            if not self._handle.closed:
+                self._handle.close()
+
+    def filter(self, magnets: Iterable[str]) -> List[str]:
+        """Return the magnets not seen before, in order, and remember them until ``commit``."""
+        fresh: list[str] = []
+        with self._lock:
+            for magnet in magnets:
+                key = _magnet_key(magnet)
+                if key in self._seen:
+                    self.duplicates += 1
+                    continue
+                self._seen.add(key)
+                self._uncommitted.add(key)
+                fresh.append(magnet)
+        return fresh
+
+    def commit(self, magnets: Iterable[str]) -> None:
+        """Append magnets returned by ``filter`` to the file; others are ignored."""
+        with self._lock:
+            new_keys = []
+            for magnet in magnets:
+                key = _magnet_key(magnet)
+                if key in self._uncommitted:
+                    self._uncommitted.discard(key)
+                    new_keys.append(key)
+            if new_keys:
+                self._handle.write(b"".join(new_keys))
+                self._handle.flush()
+
+
+__all__ = ["DEFAULT_MAGNET_INDEX_PATH", "MagnetDedupStore", "parse_info_hash"]
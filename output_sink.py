@@ -0,0 +1,215 @@
+"""Buffered output sinks for crawl results: plain-text lines, JSONL records, or Parquet."""
+
+from __future__ import annotations
+
+import datetime
+import json
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Iterable, List
+
+try:  # optional dependency, only needed for --format parquet
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # pragma: no cover - depends on the environment
+    pyarrow = None
+
+OUTPUT_FORMATS = ("text", "jsonl", "parquet")
+# default file suffix per format, used when no output path is given
+OUTPUT_SUFFIXES = {"text": ".txt", "jsonl": ".jsonl", "parquet": ".parquet"}
+
+
+def thread_record(
+    thread_url: str,
+    *,
+    title: str = "",
+    magnets: Iterable[str] = (),
+    image_count: int = 0,
+    fetch_seconds: float = 0.0,
+    page: int | None = None,
+) -> dict:
+    """One structured output row for a crawled thread.
+
+    ``magnets`` are the magnets this thread contributed to the output,
+    i.e. after de-duplication, so text and structured outputs agree.
+    """
+    return {
+        "thread_url": thread_url,
+        "title": title or "",
+        "magnets": list(magnets),
+        "image_count": image_count,
+        "fetch_seconds": round(fetch_seconds, 3),
+        "page": page,
+        "crawled_at": datetime.datetime.now().isoformat(timespec="seconds"),
+    }
+
+
+class OutputSink(ABC):
+    """Collects records and writes them in batches to a file kept open for the whole run.
+
+    A batch goes out once ``batch_size`` records are buffered or
+    ``flush_interval`` seconds passed since the last write; ``flush``
+    forces it, e.g. before a checkpoint records the file size. Use as a
+    context manager or call ``close``. With a ``profiler`` (see
+    crawl_profile.py) every batch written is recorded as a ``write`` span.
+    """
+
+    def __init__(
+        self,
+        path,
+        *,
+        append: bool = False,
+        batch_size: int = 64,
+        flush_interval: float = 2.0,
+        profiler=None,
+    ):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.append = append
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.records = 0
+        self.profiler = profiler
+        self._buffer: List[dict] = []
+        self._last_flush = time.monotonic()
+
+    def write(self, record: dict) -> None:
+        self._buffer.append(record)
+        self.records += 1
+        if (
+            len(self._buffer) >= self.batch_size
+            or time.monotonic() - self._last_flush >= self.flush_interval
+        ):
+            self.flush()
+
+    def flush(self) -> None:
+        started = time.perf_counter()
+        count = len(self._buffer)
+        if self._buffer:
+            self._write_batch(self._buffer)
+            self._buffer = []
+        self._sync()
+        if count and self.profiler is not None:
+            self.profiler.add("write", started, time.perf_counter() - started, file=self.path.name, records=count)
+        self._last_flush = time.monotonic()
+
+    def close(self) -> None:
+        self.flush()
+        self._close()
+
+    def __enter__(self) -> "OutputSink":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    @abstractmethod
+    def _write_batch(self, records: List[dict]) -> None:
+        """Write one batch of records to the open file."""
+
+    def _sync(self) -> None:
+        pass
+
+    def _close(self) -> None:
+        pass
+
+
+class _LineSink(OutputSink):
+    def __init__(self, path, **kwargs):
+        super().__init__(path, **kwargs)
+        self._handle = self.path.open("a" if self.append else "w", encoding="utf-8")
+
+    @abstractmethod
+    def _lines(self, record: dict) -> Iterable[str]:
+        """The output lines for one record, without line endings."""
+
+    def _write_batch(self, records: List[dict]) -> None:
+        self._handle.write("".join(line + "\n" for record in records for line in self._lines(record)))
+
+    def _sync(self) -> None:
+        self._handle.flush()
+
+    def _close(self) -> None:
+        self._handle.close()
+
+
+class TextSink(_LineSink):
+    """Plain text, one value per line: the record's ``field`` (each item when it is a list).
+
+    With the default ``field="magnets"`` the file matches the historical
+    magnet list format; ``field="thread_url"`` gives the crawled-URL list.
+    """
+
+    def __init__(self, path, *, field: str = "magnets", **kwargs):
+        super().__init__(path, **kwargs)
+        self.field = field
+
+    def _lines(self, record: dict) -> Iterable[str]:
+        value = record.get(self.field)
+        if value is None or value == "":
+            return ()
+        return value if isinstance(value, (list, tuple)) else (str(value),)
+
+
+class JsonlSink(_LineSink):
+    """One JSON object per line, every record written as is."""
+
+    def _lines(self, record: dict) -> Iterable[str]:
+        return (json.dumps(record, ensure_ascii=False),)
+
+
+class ParquetSink(OutputSink):
+    """Columnar output via pyarrow; every flushed batch becomes one row group.
+
+    Parquet files cannot be appended to, so runs that resume into an
+    existing output (checkpoints, a continued coordinator queue) need a
+    line-based format.
+    """
+
+    def __init__(self, path, *, batch_size: int = 1000, **kwargs):
+        if pyarrow is None:
+            raise RuntimeError("--format parquet requires pyarrow: pip install pyarrow")
+        if kwargs.get("append"):
+            raise ValueError("parquet output cannot be appended to; use jsonl to resume a run")
+        super().__init__(path, batch_size=batch_size, **kwargs)
+        self._schema = pyarrow.schema([
+            ("thread_url", pyarrow.string()),
+            ("title", pyarrow.string()),
+            ("magnets", pyarrow.list_(pyarrow.string())),
+            ("image_count", pyarrow.int32()),
+            ("fetch_seconds", pyarrow.float64()),
+            ("page", pyarrow.int32()),
+            ("crawled_at", pyarrow.string()),
+        ])
+        self._writer = pyarrow.parquet.ParquetWriter(str(self.path), self._schema)
+
+    def _write_batch(self, records: List[dict]) -> None:
+        columns = {name: [record.get(name) for record in records] for name in self._schema.names}
+        self._writer.write_table(pyarrow.Table.from_pydict(columns, schema=self._schema))
+
+    def _close(self) -> None:
+        self._writer.close()
+
+
+def open_output_sink(path, output_format: str = "text", **kwargs) -> OutputSink:
+    """Create the sink for ``output_format`` (one of OUTPUT_FORMATS) writing to path."""
+    if output_format == "text":
+        return TextSink(path, **kwargs)
+    if output_format == "jsonl":
+        return JsonlSink(path, **kwargs)
+    if output_format == "parquet":
+        return ParquetSink(path, **kwargs)
+    raise ValueError(f"unknown output format: {output_format}")
+
+
+__all__ = [
+    "OUTPUT_FORMATS",
+    "OUTPUT_SUFFIXES",
+    "JsonlSink",
+    "OutputSink",
+    "ParquetSink",
+    "TextSink",
+    "open_output_sink",
+    "thread_record",
+]
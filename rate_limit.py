@@ -0,0 +1,153 @@
+"""Adaptive per-host token buckets that pace every request a crawler sends."""
+
+from __future__ import annotations
+
+import email.utils
+import threading
+import time
+from dataclasses import dataclass
+from urllib.parse import urlparse
+
+# status codes that mean "slow down" rather than "this URL is broken"
+THROTTLE_STATUSES = frozenset({429, 503})
+
+
+def parse_retry_after(value: str | None, now: float | None = None) -> float | None:
+    """Return the delay in seconds requested by a ``Retry-After`` header, or None.
+
+    Both forms from RFC 9110 are accepted: delta-seconds and an HTTP-date.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when is None:
+        return None
+    now = time.time() if now is None else now
+    return max(0.0, when.timestamp() - now)
+
+
+@dataclass
+class _HostBucket:
+    rate: float
+    tokens: float
+    # time tokens were last refilled; lies in the future while a Retry-After block lasts
+    updated: float
+    requests: int = 0
+    throttled: int = 0
+
+
+class AdaptiveRateLimiter:
+    """One token bucket per host, shared by every worker of a crawler.
+
+    ``reserve`` takes a token and returns how long the caller has to wait
+    for it; tokens may go negative, which queues later callers behind
+    earlier ones in arrival order. ``observe`` feeds each response back:
+    fast successes raise the host's rate additively up to ``max_rate``,
+    slow responses and server errors lower it multiplicatively, 429/503
+    halve it, and a ``Retry-After`` blocks the host until it expires.
+    """
+
+    def __init__(
+        self,
+        rate: float = 4.0,
+        *,
+        min_rate: float = 0.25,
+        max_rate: float = 32.0,
+        burst: float = 4.0,
+        target_latency: float = 2.0,
+        increase: float = 0.5,
+    ):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.initial_rate = min(max(rate, min_rate), max_rate)
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = max(1.0, burst)
+        self.target_latency = target_latency
+        self.increase = increase
+        self._lock = threading.Lock()
+        self._buckets: dict[str, _HostBucket] = {}
+
+    @staticmethod
+    def _host(url: str) -> str:
+        return urlparse(url).netloc or url
+
+    def _bucket(self, host: str, now: float) -> _HostBucket:
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            bucket = _HostBucket(rate=self.initial_rate, tokens=self.burst, updated=now)
+            self._buckets[host] = bucket
+        elif now > bucket.updated:
+            bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated) * bucket.rate)
+            bucket.updated = now
+        return bucket
+
+    def reserve(self, url: str) -> float:
+        """Take a token for url's host and return the seconds to wait before sending."""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._bucket(self._host(url), now)
+            bucket.tokens -= 1
+            bucket.requests += 1
+            wait = -bucket.tokens / bucket.rate if bucket.tokens < 0 else 0.0
+            return wait + max(0.0, bucket.updated - now)
+
+    def acquire(self, url: str) -> float:
+        """Blocking form of ``reserve``; returns the time slept."""
+        wait = self.reserve(url)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def observe(
+        self,
+        url: str,
+        status_code: int | None,
+        latency: float | None = None,
+        retry_after: float | None = None,
+    ) -> None:
+        """Adjust url's host rate from one response; status_code None means no response."""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._bucket(self._host(url), now)
+            if status_code in THROTTLE_STATUSES:
+                bucket.throttled += 1
+                bucket.rate *= 0.5
+            elif status_code is None or status_code >= 500:
+                bucket.rate *= 0.7
+            elif latency is not None and latency > self.target_latency:
+                bucket.rate *= 0.8
+            elif status_code < 400:
+                bucket.rate += self.increase
+            bucket.rate = min(max(bucket.rate, self.min_rate), self.max_rate)
+            if retry_after is not None and now + retry_after > bucket.updated:
+                # no refill until the block ends, then one request and the bucket's normal pace
+                bucket.updated = now + retry_after
+                bucket.tokens = min(bucket.tokens, 1.0)
+
+    def rate(self, url: str) -> float:
+        """Current requests-per-second allowance for url's host."""
+        with self._lock:
+            bucket = self._buckets.get(self._host(url))
+            return bucket.rate if bucket is not None else self.initial_rate
+
+    def stats(self) -> dict[str, dict[str, float]]:
+        """Per-host rate, request count, and number of throttling responses."""
+        with self._lock:
+            return {
+                host: {
+                    "rate": round(bucket.rate, 2),
+                    "requests": bucket.requests,
+                    "throttled": bucket.throttled,
+                }
+                for host, bucket in self._buckets.items()
+            }
+
+
+__all__ = ["THROTTLE_STATUSES", "AdaptiveRateLimiter", "parse_retry_after"]
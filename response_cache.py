@@ -0,0 +1,143 @@
+"""On-disk cache of thread-page responses with ETag/Last-Modified revalidation."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def normalize_url(url: str) -> str:
+    """Canonical form used as cache key: lower-case host, no default port/fragment, sorted query."""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != _DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, parts.path or "/", query, ""))
+
+
+@dataclass
+class CachedResponse:
+    """A stored response body plus the validators needed to revalidate it."""
+
+    url: str
+    body: bytes
+    etag: str | None = None
+    last_modified: str | None = None
+    stored_at: float = 0.0
+    # parsed thread summary, so unchanged pages are not parsed again
+    parsed: dict = field(default_factory=dict)
+
+    def is_fresh(self, ttl: float | None) -> bool:
+        return ttl is not None and time.time() - self.stored_at < ttl
+
+    def conditional_headers(self) -> dict[str, str]:
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class ResponseCache:
+    """Store responses under ``directory`` as ``<sha1>.json`` metadata + ``<sha1>.body``.
+
+    Entries younger than ``ttl`` seconds are served without touching the
+    network; older ones are revalidated with a conditional GET. Counters are
+    exposed through ``stats()``.
+    """
+
+    def __init__(self, directory: str | os.PathLike, ttl: float | None = None):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "revalidated": 0}
+
+    def _paths(self, url: str) -> tuple[Path, Path]:
+        digest = hashlib.sha1(normalize_url(url).encode("utf-8")).hexdigest()
+        return self.directory / f"{digest}.json", self.directory / f"{digest}.body"
+
+    def load(self, url: str) -> CachedResponse | None:
+        meta_path, body_path = self._paths(url)
+        try:
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            body = body_path.read_bytes()
+        except (OSError, ValueError):
+            return None
+        return CachedResponse(
+            url=meta.get("url", url),
+            body=body,
+            etag=meta.get("etag"),
+            last_modified=meta.get("last_modified"),
+            stored_at=meta.get("stored_at", 0.0),
+            parsed=meta.get("parsed") or {},
+        )
+
+    def store(
+        self,
+        url: str,
+        body: bytes,
+        *,
+        etag: str | None = None,
+        last_modified: str | None = None,
+        parsed: dict | None = None,
+    ) -> None:
+        _, body_path = self._paths(url)
+        # body first, so a metadata file never points at a missing body
+        self._atomic_write(body_path, body)
+        self._write_meta(url, etag, last_modified, parsed)
+
+    def touch(self, entry: CachedResponse) -> None:
+        """Mark an entry as freshly validated (after a 304 Not Modified)."""
+        self._write_meta(entry.url, entry.etag, entry.last_modified, entry.parsed)
+
+    def _write_meta(
+        self, url: str, etag: str | None, last_modified: str | None, parsed: dict | None
+    ) -> None:
+        meta_path, _ = self._paths(url)
+        meta = {
+            "url": normalize_url(url),
+            "etag": etag,
+            "last_modified": last_modified,
+            "stored_at": time.time(),
+            "parsed": parsed or {},
+        }
+        self._atomic_write(meta_path, json.dumps(meta, ensure_ascii=False).encode("utf-8"))
+
+    def _atomic_write(self, path: Path, data: bytes) -> None:
+        fd, temp_name = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as handle:
+                handle.write(data)
+            os.replace(temp_name, path)
+        except OSError:
+            Path(temp_name).unlink(missing_ok=True)
+            raise
+
+    def record(self, outcome: str) -> None:
+        with self._lock:
+            self._stats[outcome] += 1
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            for key in self._stats:
+                self._stats[key] = 0
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return dict(self._stats)
+
+
+__all__ = ["CachedResponse", "ResponseCache", "normalize_url"]
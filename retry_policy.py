@@ -0,0 +1,127 @@
+"""Retry with exponential backoff and a per-host circuit breaker for crawler requests."""
+
+from __future__ import annotations
+
+import random
+import threading
+import time
+from dataclasses import dataclass
+from urllib.parse import urlparse
+
+import requests
+
+# responses worth another attempt; anything else (404, 403, ...) is final
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+# errors where the request most likely never reached the application
+TRANSIENT_ERRORS = (
+    requests.ConnectionError,
+    requests.Timeout,
+    requests.exceptions.ChunkedEncodingError,
+)
+
+
+class HostCircuitOpen(requests.ConnectionError):
+    """Raised instead of sending a request while the host's circuit is open."""
+
+
+@dataclass
+class RetryPolicy:
+    """How often and how patiently a failed idempotent request is repeated.
+
+    ``max_retries`` counts attempts after the first one. Delays use "full
+    jitter": a uniform draw between 0 and ``backoff * 2**(retry - 1)``,
+    capped at ``backoff_max``, so workers that failed together do not
+    retry together.
+    """
+
+    max_retries: int = 3
+    backoff: float = 0.5
+    backoff_max: float = 30.0
+
+    def delay(self, retry: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff * 2 ** (retry - 1)))
+
+
+@dataclass
+class _HostCircuit:
+    failures: int = 0
+    open_until: float = 0.0
+    probing: bool = False
+
+
+class CircuitBreaker:
+    """Stop sending to a host after ``threshold`` consecutive failures.
+
+    The circuit then stays open for ``cooldown`` seconds and requests fail
+    fast with ``HostCircuitOpen``. After the cooldown one probe request is
+    let through: success closes the circuit, failure opens it again.
+    """
+
+    def __init__(self, threshold: int = 5, cooldown: float = 30.0):
+        self.threshold = max(1, threshold)
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._circuits: dict[str, _HostCircuit] = {}
+
+    @staticmethod
+    def _host(url: str) -> str:
+        return urlparse(url).netloc or url
+
+    def allow(self, url: str) -> None:
+        """Raise HostCircuitOpen unless a request to url's host may be sent now."""
+        host = self._host(url)
+        now = time.monotonic()
+        with self._lock:
+            circuit = self._circuits.get(host)
+            if circuit is None or circuit.failures < self.threshold:
+                return
+            if now >= circuit.open_until and not circuit.probing:
+                circuit.probing = True
+                return
+            remaining = max(0.0, circuit.open_until - now)
+        raise HostCircuitOpen(f"circuit open for {host}, retry in {remaining:.0f}s")
+
+    def record_success(self, url: str) -> None:
+        with self._lock:
+            self._circuits.pop(self._host(url), None)
+
+    def release(self, url: str) -> None:
+        """End a request that neither succeeded nor failed at the transport level.
+
+        A half-open probe that ends this way (a redirect loop, an interrupt)
+        says nothing about the host, so the next request probes again.
+        """
+        with self._lock:
+            circuit = self._circuits.get(self._host(url))
+            if circuit is not None:
+                circuit.probing = False
+
+    def record_failure(self, url: str) -> bool:
+        """Count a failure; return True when it (re)opens the host's circuit."""
+        now = time.monotonic()
+        with self._lock:
+            circuit = self._circuits.setdefault(self._host(url), _HostCircuit())
+            circuit.failures += 1
+            if circuit.failures < self.threshold:
+                return False
+            circuit.open_until = now + self.cooldown
+            circuit.probing = False
+            return True
+
+    def open_hosts(self) -> list[str]:
+        now = time.monotonic()
+        with self._lock:
+            return [
+                host
+                for host, circuit in self._circuits.items()
+                if circuit.failures >= self.threshold and circuit.open_until > now
+            ]
+
+
+__all__ = [
+    "RETRY_STATUSES",
+    "TRANSIENT_ERRORS",
+    "CircuitBreaker",
+    "HostCircuitOpen",
+    "RetryPolicy",
+]
@@ -6,9 +6,41 @@
 
 from __future__ import annotations
 
+import asyncio
+import json
+import struct
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import requests
 from bs4 import BeautifulSoup
 
-from crawler_core import extract_magnet_links, extract_thread_paths, sanitize_name
+from bench_crawl import MockForum, serve
+from checkpoint import CrawlCheckpoint, latest_checkpoint
+from crawl_metrics import new_crawler_metrics
+from crawl_profile import CrawlProfiler
+from crawl_pipeline import CrawlPipeline
+from image_filter import image_dimensions
+from rate_limit import AdaptiveRateLimiter, parse_retry_after
+from retry_policy import HostCircuitOpen
+from job_manager import JobManager, ResultLog
+from output_sink import JsonlSink, TextSink, thread_record
+from magnet_store import MagnetDedupStore, parse_info_hash
+from thread_index import ThreadIndex
+from work_queue import LocalRedis, RedisWorkQueue, SQLiteWorkQueue
+from crawler_core import (
+    PARSER_BACKENDS,
+    AsyncForumCrawler,
+    CrawlerConfig,
+    ForumCrawler,
+    ThreadDetails,
+    extract_magnet_links,
+    extract_thread_paths,
+    parse_thread_html,
+    sanitize_name,
+)
 
 FORUM_HTML = """
 <html>
@@ -54,15 +86,810 @@ def test_extract_magnet_links():
     print("✓ extract_magnet_links 捕获了两个磁力链接")
 
 
+def test_parser_backends_agree():
+    thread_url = "https://example.com/thread-1-1-1.html"
+    html = THREAD_HTML.encode("utf-8")
+    expected = parse_thread_html(html, thread_url, "soup")
+    for backend in PARSER_BACKENDS:
+        magnets, images, soup = parse_thread_html(html, thread_url, backend)
+        assert magnets == expected[0] == ["magnet:?xt=urn:btih:AAA111", "magnet:?xt=urn:btih:BBB222"]
+        assert images == expected[1]
+        assert soup.title.text == "磁力合集 精选"
+        assert extract_thread_paths(FORUM_HTML, backend) == extract_thread_paths(FORUM_HTML)
+        for empty in (b"", b"  \n\t ", "", "<!-- removed -->"):
+            magnets, images, soup = parse_thread_html(empty, thread_url, backend)
+            assert (magnets, images, soup.title) == ([], [], None)
+            assert extract_thread_paths(empty, backend) == []
+    print("✓ soup / strainer / lxml 解析后端输出一致")
+
+
+def test_magnet_dedup_by_info_hash():
+    hex_hash = "c12fe1c06bba254a9dc9f519b335aa7c1367a88a"
+    base32_hash = "YEX6DQDLXISUVHOJ6UM3GNNKPQJWPKEK"
+    assert parse_info_hash(f"magnet:?xt=urn:btih:{hex_hash.upper()}&dn=a") == hex_hash
+    assert parse_info_hash(f"magnet:?xt=urn:btih:{base32_hash}") == hex_hash
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / "magnets.bin")
+        with MagnetDedupStore(path) as store:
+            fresh = store.filter([
+                f"magnet:?xt=urn:btih:{hex_hash}&dn=first",
+                f"magnet:?xt=urn:btih:{base32_hash}&dn=repost",
+                "magnet:?xt=urn:btih:AAA111",
+            ])
+            assert fresh == [f"magnet:?xt=urn:btih:{hex_hash}&dn=first", "magnet:?xt=urn:btih:AAA111"]
+            assert store.duplicates == 1
+            store.commit(fresh)
+        with MagnetDedupStore(path) as store:
+            assert store.filter([f"magnet:?xt=urn:btih:{hex_hash}"]) == []
+            assert len(store) == 2
+        # a record torn by a crash is dropped, and later appends stay aligned
+        with open(path, "ab") as handle:
+            handle.write(b"\x01" * 7)
+        with MagnetDedupStore(path) as store:
+            assert len(store) == 2
+            assert store.filter(["magnet:?xt=urn:btih:CCC333"]) == ["magnet:?xt=urn:btih:CCC333"]
+            store.commit(["magnet:?xt=urn:btih:CCC333"])
+        with MagnetDedupStore(path) as store:
+            assert len(store) == 3
+            assert store.filter([f"magnet:?xt=urn:btih:{hex_hash}", "magnet:?xt=urn:btih:CCC333"]) == []
+    print("✓ 磁力链接按 info-hash 跨运行去重")
+
+
+def test_dedup_commits_after_output_flush():
+    from CrawlSHT import commit_magnets, write_thread
+
+    magnets = ["magnet:?xt=urn:btih:AAA111", "magnet:?xt=urn:btih:BBB222"]
+    with tempfile.TemporaryDirectory() as tmp:
+        output = Path(tmp) / "magnets.txt"
+        index_path = str(Path(tmp) / "magnets.bin")
+        # the first run dies while the thread's record is still buffered in the sink
+        sink = TextSink(output, batch_size=100, flush_interval=60)
+        with MagnetDedupStore(index_path) as dedup:
+            uncommitted = []
+            assert write_thread(sink, "https://x/thread-1-1-1.html", magnets, dedup, uncommitted) == 2
+        del sink
+        assert output.read_text(encoding="utf-8") == ""
+
+        # the resumed run crawls the thread again and must still write its magnets
+        with MagnetDedupStore(index_path) as dedup, TextSink(output, append=True, batch_size=100) as sink:
+            uncommitted = []
+            assert write_thread(sink, "https://x/thread-1-1-1.html", magnets, dedup, uncommitted) == 2
+            sink.flush()
+            commit_magnets(dedup, uncommitted)
+            assert uncommitted == []
+        assert output.read_text(encoding="utf-8").splitlines() == magnets
+        with MagnetDedupStore(index_path) as dedup:
+            assert dedup.filter(magnets) == []
+    print("✓ 输出落盘后才写入去重库，崩溃恢复不会丢失磁力链接")
+
+
 def test_sanitize_name():
     assert sanitize_name(" 图片 / Test ") == "图片___Test"
     assert sanitize_name("   ") == "unnamed"
     print("✓ sanitize_name 能处理空白和非法字符")
 
 
+def test_fetch_many_thread_details():
+    crawler = ForumCrawler(CrawlerConfig(base_url="https://example.com", cookie=None))
+
+    def fake_fetch(path):
+        if path == "thread-2-1-1.html":
+            raise requests.ConnectionError("boom")
+        return ThreadDetails(path, None, (f"magnet:?xt=urn:btih:{path}",), (), 0.0, 0.0)
+
+    crawler.fetch_thread_details = fake_fetch
+    paths = ["thread-1-1-1.html", "thread-2-1-1.html", "thread-3-1-1.html"]
+    results = {path: (details, error) for path, details, error in crawler.fetch_many_thread_details(paths, max_workers=3)}
+    assert set(results) == set(paths)
+    assert results["thread-1-1-1.html"][0].magnets == ("magnet:?xt=urn:btih:thread-1-1-1.html",)
+    assert isinstance(results["thread-2-1-1.html"][1], requests.ConnectionError)
+    print("✓ fetch_many_thread_details 并发返回全部结果并保留异常")
+
+
+class _FakeImageResponse:
+    status_code = 200
+
+    def __init__(self, body: bytes, content_type: str = "image/png"):
+        self.body = body
+        self.headers = {"Content-Type": content_type, "Content-Length": str(len(body))}
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        for start in range(0, len(self.body), chunk_size):
+            yield self.body[start:start + chunk_size]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def close(self):
+        pass
+
+
+def test_download_images_parallel():
+    crawler = ForumCrawler(CrawlerConfig(cookie=None, image_workers=3))
+    responses = {
+        "https://cdn.example.com/a.png": _FakeImageResponse(b"a" * 100),
+        "https://cdn.example.com/b.png": _FakeImageResponse(b"b" * 100),
+        "https://cdn.example.com/page.html": _FakeImageResponse(b"<html>", "text/html"),
+    }
+    crawler.image_session.get = lambda url, **kwargs: responses[url]
+    with tempfile.TemporaryDirectory() as tmp:
+        saved, skipped = crawler.download_images(list(responses) + ["https://cdn.example.com/a.png"], tmp)
+        assert saved == 2
+        assert len(skipped) == 1 and "content-type text/html" in skipped[0]
+        assert sorted(path.name for path in Path(tmp).iterdir()) == ["a.png", "b.png"]
+        assert (Path(tmp) / "a.png").read_bytes() == b"a" * 100
+    print("✓ download_images 并行下载并原子落盘，返回值与原先一致")
+
+
+def test_image_store_reuses_blobs():
+    with tempfile.TemporaryDirectory() as tmp:
+        crawler = ForumCrawler(CrawlerConfig(cookie=None, image_store_dir=str(Path(tmp) / "blobs")))
+        requested = []
+
+        def fake_get(url, **kwargs):
+            requested.append(url)
+            return _FakeImageResponse(b"same-bytes")
+
+        crawler.image_session.get = fake_get
+        urls = ["https://cdn.example.com/banner.png", "https://mirror.example.com/banner.png"]
+        assert crawler.download_images(urls, str(Path(tmp) / "t1")) == (2, [])
+        assert crawler.download_images(urls[:1], str(Path(tmp) / "t2")) == (1, [])
+        assert sorted(requested) == sorted(urls)
+        assert crawler.image_store.stats() == {"url_hits": 1, "new_blobs": 1, "duplicate_blobs": 1}
+        first = Path(tmp) / "t1" / "banner.png"
+        second = Path(tmp) / "t2" / "banner.png"
+        assert first.read_bytes() == second.read_bytes() == b"same-bytes"
+        assert first.stat().st_ino == second.stat().st_ino
+        crawler.image_store.close()
+
+        # a run with a stricter filter must not take the stored blob it would have skipped
+        strict = ForumCrawler(CrawlerConfig(cookie=None, image_store_dir=str(Path(tmp) / "blobs"), image_max_bytes=5))
+        strict.image_session.get = fake_get
+        saved, skipped = strict.download_images(urls[:1], str(Path(tmp) / "t3"))
+        assert saved == 0 and len(skipped) == 1
+        assert len(requested) == 2 and not (Path(tmp) / "t3" / "banner.png").exists()
+        assert strict.metrics.summary()["crawler_images_filtered_total"] == {"reason=size": 1}
+        strict.image_store.close()
+    print("✓ 图片仓库按内容哈希只存一份，已知 URL 免下载，命中仍按本次过滤条件检查")
+
+
+class _FakeRangeResponse(_FakeImageResponse):
+    status_code = 206
+
+    def __init__(self, body: bytes, range_header: str):
+        start, _, end = range_header[len("bytes="):].partition("-")
+        start, end = int(start), int(end) + 1 if end else len(body)
+        super().__init__(body[start:end])
+        self.content = self.body
+        self.headers["Content-Range"] = f"bytes {start}-{end - 1}/{len(body)}"
+
+
+def test_image_filter_skips_before_download():
+    png = b"\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR" + struct.pack(">II", 640, 480)
+    gif = b"GIF89a" + struct.pack("<HH", 16, 16)
+    jpeg = b"\xff\xd8\xff\xe0\x00\x10JFIF\x00\x01\x01\x00\x00\x01\x00\x01\x00\x00\xff\xc0\x00\x11\x08" + struct.pack(">HH", 480, 640)
+    assert image_dimensions(png) == image_dimensions(jpeg) == (640, 480)
+    assert image_dimensions(gif) == (16, 16)
+    assert image_dimensions(b"<html>") is None
+
+    crawler = ForumCrawler(CrawlerConfig(
+        cookie=None, image_workers=1, image_min_width=100, image_min_height=100,
+        image_max_bytes=10_000, image_sniff_bytes=64,
+    ))
+    bodies = {
+        "https://cdn.example.com/photo.png": png + b"\0" * 5000,
+        "https://cdn.example.com/icon.gif": gif + b"\0" * 5000,
+        "https://cdn.example.com/huge.jpg": jpeg + b"\0" * 20_000,
+        "https://mirror.example.com/scan.png": png + b"\1" * 3000,
+    }
+    requested = []
+
+    def fake_get(url, headers=None, **kwargs):
+        range_header = (headers or {}).get("Range")
+        requested.append((url, range_header))
+        body = bodies[url]
+        # the mirror honours the probe but answers the continuation with the whole image
+        if range_header and not (url.startswith("https://mirror.") and range_header != "bytes=0-63"):
+            return _FakeRangeResponse(body, range_header)
+        return _FakeImageResponse(body)
+
+    crawler.image_session.get = fake_get
+    urls = [*bodies, "https://bbs.example.com/static/image/smiley/default/1.gif"]
+    with tempfile.TemporaryDirectory() as tmp:
+        saved, skipped = crawler.download_images(urls, tmp)
+        assert saved == 2
+        assert (Path(tmp) / "photo.png").read_bytes() == bodies["https://cdn.example.com/photo.png"]
+        assert (Path(tmp) / "scan.png").read_bytes() == bodies["https://mirror.example.com/scan.png"]
+    assert [reason.split(" (", 1)[1].split()[1] for reason in skipped] == ["dimensions", "size", "url"]
+    # the saved images continue after the probed bytes; the deny-listed one is never requested
+    assert [range_header for _, range_header in requested] == [
+        "bytes=0-63", "bytes=64-", "bytes=0-63", "bytes=0-63", "bytes=0-63", "bytes=64-",
+    ]
+    assert crawler.metrics.summary()["crawler_images_filtered_total"] == {
+        "reason=dimensions": 1, "reason=size": 1, "reason=url": 1,
+    }
+    print("✓ 图片按地址、大小、尺寸过滤，过滤掉的图片不下载正文")
+
+
+class _FakePageResponse:
+    def __init__(self, status_code: int, content: bytes = b"", headers: dict | None = None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(str(self.status_code))
+
+    def close(self):
+        pass
+
+
+def test_response_cache_revalidation():
+    with tempfile.TemporaryDirectory() as tmp:
+        crawler = ForumCrawler(CrawlerConfig(base_url="https://example.com", cookie=None, cache_dir=tmp))
+        sent_headers = []
+
+        def fake_get(url, timeout=None, headers=None):
+            sent_headers.append(headers or {})
+            if headers and headers.get("If-None-Match") == '"v1"':
+                return _FakePageResponse(304)
+            return _FakePageResponse(200, THREAD_HTML.encode("utf-8"), {"ETag": '"v1"'})
+
+        crawler.session.get = fake_get
+        first = crawler.fetch_thread_details("thread-1-1-1.html")
+        second = crawler.fetch_thread_details("https://EXAMPLE.com:443/thread-1-1-1.html#top")
+        assert (first.magnets, first.image_urls) == (second.magnets, second.image_urls)
+        assert second.title == "磁力合集 精选"
+        assert sent_headers[1] == {"If-None-Match": '"v1"'}
+        assert crawler.cache_stats() == {"hits": 1, "misses": 1, "revalidated": 1}
+    print("✓ 响应缓存通过 ETag 条件请求复用未变化的帖子")
+
+
+def test_parse_workers_match_inline_parsing():
+    crawler = ForumCrawler(
+        CrawlerConfig(base_url="https://example.com", cookie=None, parser_backend="lxml", parse_workers=2)
+    )
+    crawler.session.get = lambda url, **kwargs: _FakePageResponse(200, THREAD_HTML.encode("utf-8"))
+    try:
+        details = crawler.fetch_thread_details("thread-1-1-1.html")
+    finally:
+        crawler.close()
+    magnets, images, soup = parse_thread_html(
+        THREAD_HTML.encode("utf-8"), "https://example.com/thread-1-1-1.html", "lxml"
+    )
+    assert details.magnets == tuple(magnets) and details.image_urls == tuple(images)
+    assert details.title == soup.title.text
+    assert details.url == "https://example.com/thread-1-1-1.html" and details.parse_seconds > 0
+    assert not hasattr(details, "__dict__")
+    print("✓ 多进程解析结果与线程内解析一致")
+
+
+def test_rate_limiter_adapts_to_throttling():
+    limiter = AdaptiveRateLimiter(4.0, burst=2, max_rate=8.0)
+    url = "https://example.com/thread-1-1-1.html"
+    assert limiter.reserve(url) == 0 and limiter.reserve(url) == 0
+    assert 0.2 <= limiter.reserve(url) <= 0.3
+    limiter.observe(url, 200, latency=0.1)
+    assert limiter.rate(url) == 4.5
+    limiter.observe(url, 429, latency=0.1, retry_after=parse_retry_after("3"))
+    assert limiter.rate(url) == 2.25
+    assert limiter.reserve(url) >= 2.9
+    assert limiter.reserve("https://cdn.example.com/a.jpg") == 0
+    assert limiter.stats()["example.com"]["throttled"] == 1
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT", now=1445412470.0) == 10.0
+    print("✓ 自适应限速按主机分桶，遇到 429 降速并遵守 Retry-After")
+
+
+def test_retry_and_circuit_breaker():
+    crawler = ForumCrawler(
+        CrawlerConfig(base_url="https://example.com", cookie=None, rate_limit=0, retry_backoff=0, breaker_threshold=3)
+    )
+    replies = [requests.ConnectionError("reset"), _FakePageResponse(503), _FakePageResponse(200, THREAD_HTML.encode("utf-8"))]
+
+    def flaky_get(url, **kwargs):
+        reply = replies.pop(0) if replies else requests.ConnectionError("down")
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+
+    crawler.session.get = flaky_get
+    assert crawler.fetch_thread_details("thread-1-1-1.html").magnets
+    assert crawler.retry_stats()["retries"] == 2 and crawler.retry_stats()["recovered"] == 1
+
+    try:
+        crawler.fetch_thread_details("thread-2-1-1.html")
+    except HostCircuitOpen:
+        pass
+    else:
+        raise AssertionError("circuit should have opened")
+    stats = crawler.retry_stats()
+    assert stats["circuit_opens"] == 1 and stats["gave_up"] == 1
+    try:
+        crawler.fetch_thread_paths("103", 1)
+    except requests.RequestException as exc:
+        assert isinstance(exc, HostCircuitOpen)
+    assert crawler.retry_stats()["short_circuited"] == 2
+
+    # a probe that fails with a non-transient error must not leave the host blocked
+    crawler = ForumCrawler(CrawlerConfig(
+        base_url="https://example.com", cookie=None, rate_limit=0, max_retries=0,
+        breaker_threshold=1, breaker_cooldown=0,
+    ))
+    replies = [
+        requests.ConnectionError("reset"),
+        requests.TooManyRedirects("loop"),
+        _FakePageResponse(200, THREAD_HTML.encode("utf-8")),
+    ]
+    crawler.session.get = flaky_get
+    for expected in (requests.ConnectionError, requests.TooManyRedirects):
+        try:
+            crawler.fetch_thread_details("thread-3-1-1.html")
+        except expected:
+            pass
+        else:
+            raise AssertionError(f"expected {expected.__name__}")
+    assert crawler.retry_stats()["circuit_opens"] == 1  # the redirect loop is not a host failure
+    assert crawler.fetch_thread_details("thread-3-1-1.html").magnets
+    print("✓ 临时错误按退避重试，连续失败后熔断该主机")
+
+
+class _FakeCrawler:
+    def __init__(self):
+        self.metrics = new_crawler_metrics()
+
+    def fetch_thread_paths_from_forum_url(self, forum_url):
+        if forum_url.endswith("2.html"):
+            raise requests.HTTPError("404")
+        return ["thread-1-1-1.html", "thread-2-1-1.html"]
+
+    def fetch_thread_details(self, path):
+        return ThreadDetails(path, None, (f"magnet:?xt=urn:btih:{path}",), ("https://cdn.example.com/a.jpg",), 0.0, 0.0)
+
+    def download_images(self, image_urls, destination):
+        return len(image_urls), []
+
+
+def test_crawl_pipeline_events():
+    pipeline = CrawlPipeline(_FakeCrawler(), thread_workers=2, image_workers=2, image_root="unused")
+    events = list(pipeline.run([(1, "forum-1.html"), (2, "forum-2.html")]))
+    kinds = [(event.kind, event.page) for event in events]
+    assert kinds.count(("thread", 1)) == 2
+    assert kinds.count(("images", 1)) == 2
+    assert kinds.count(("page_done", 1)) == 1 and kinds.count(("page_done", 2)) == 1
+    assert kinds.index(("page_done", 1)) > max(i for i, k in enumerate(kinds) if k == ("thread", 1))
+    assert any(event.kind == "page" and event.error is not None for event in events)
+    print("✓ CrawlPipeline 各阶段事件完整且页面完成事件在帖子之后")
+
+
+class _BrokenCrawler(_FakeCrawler):
+    def fetch_thread_details(self, path):
+        if path.startswith("thread-2"):
+            raise ValueError("Document is empty")
+        return super().fetch_thread_details(path)
+
+    def download_images(self, image_urls, destination):
+        raise OSError("disk full")
+
+
+def test_pipeline_survives_stage_errors():
+    def thread_filter(paths):
+        raise RuntimeError("index locked")
+
+    def run(pipeline):
+        result = []
+        runner = threading.Thread(target=lambda: result.extend(pipeline.run([(1, "forum-1.html")])), daemon=True)
+        runner.start()
+        runner.join(timeout=10)
+        assert not runner.is_alive(), "pipeline hung after a stage error"
+        return result
+
+    events = run(CrawlPipeline(_BrokenCrawler(), thread_workers=2, image_root="unused"))
+    failed = {event.thread_path: str(event.error) for event in events if event.kind == "thread" and event.error}
+    assert failed == {"thread-2-1-1.html": "Document is empty"}
+    images = [event for event in events if event.kind == "images"]
+    assert len(images) == 1 and images[0].saved == 0 and "disk full" in images[0].skipped[0]
+    assert [event.kind for event in events].count("page_done") == 1
+
+    events = run(CrawlPipeline(_FakeCrawler(), thread_filter=thread_filter))
+    assert [(event.kind, str(event.error)) for event in events] == [("page", "index locked"), ("page_done", "None")]
+    print("✓ 单个页面处理出错时流水线报告错误并正常结束")
+
+
+def test_incremental_pipeline_stops_on_known_page():
+    with tempfile.TemporaryDirectory() as tmp:
+        with ThreadIndex(str(Path(tmp) / "index.sqlite3")) as index:
+            index.record("thread-1-1-1.html", ["magnet:?xt=urn:btih:AAA111"])
+            assert "thread-1-1-1.html" in index
+            assert index.unknown(["thread-1-1-1.html", "thread-2-1-1.html"]) == ["thread-2-1-1.html"]
+            index.record("thread-2-1-1.html", [])
+
+            pipeline = CrawlPipeline(_FakeCrawler(), thread_filter=index.unknown)
+            events = list(pipeline.run([(1, "forum-1.html"), (3, "forum-3.html")]))
+            assert [event.kind for event in events] == ["page", "page_done"]
+            assert events[0].exhausted and events[0].known == 2
+    print("✓ 增量模式跳过已知帖子并在整页已知时停止翻页")
+
+
+def test_checkpoint_roundtrip_and_repair():
+    with tempfile.TemporaryDirectory() as tmp:
+        output = Path(tmp) / "magnets.txt"
+        output.write_text("magnet:?xt=urn:btih:AAA\n", encoding="utf-8")
+        checkpoint = CrawlCheckpoint(path=str(Path(tmp) / "checkpoint_1.json"), next_page=1, end_page=3)
+        checkpoint.mark_listed(1, ["thread-1-1-1.html", "thread-2-1-1.html"])
+        checkpoint.mark_completed(1, "thread-1-1-1.html")
+        checkpoint.record_output(str(output))
+        checkpoint.save()
+        with output.open("a", encoding="utf-8") as handle:
+            handle.write("magnet:?xt=urn:btih:BBB\nmagnet:?xt=urn:bt")
+
+        assert latest_checkpoint(tmp) == checkpoint.path
+        restored = CrawlCheckpoint.load(checkpoint.path)
+        assert restored.next_page == 2
+        assert restored.pending_threads() == [(1, ["thread-2-1-1.html"])]
+        assert restored.is_completed("thread-1-1-1.html")
+        restored.repair_outputs()
+        # thread-2 is still pending, so everything written after the save goes
+        assert output.read_text(encoding="utf-8").splitlines() == ["magnet:?xt=urn:btih:AAA"]
+        restored.finish()
+        assert latest_checkpoint(tmp) is None
+    print("✓ 检查点可保存、恢复待爬帖子并把输出截回检查点位置")
+
+
+def test_resume_after_crash_writes_each_magnet_once():
+    from CrawlSHT import commit_magnets, write_thread
+
+    first, second = "magnet:?xt=urn:btih:AAA111", "magnet:?xt=urn:btih:BBB222"
+    with tempfile.TemporaryDirectory() as tmp:
+        output = Path(tmp) / "magnets.txt"
+        index_path = str(Path(tmp) / "magnets.bin")
+        checkpoint = CrawlCheckpoint(path=str(Path(tmp) / "checkpoint_1.json"), next_page=2, end_page=1)
+        sink = TextSink(output, batch_size=1)
+        dedup = MagnetDedupStore(index_path)
+        uncommitted = []
+
+        def sync_output():
+            sink.flush()
+            checkpoint.record_output(str(output))
+
+        checkpoint.before_save = sync_output
+        checkpoint.after_save = lambda: commit_magnets(dedup, uncommitted)
+        checkpoint.mark_listed(1, ["thread-1-1-1.html", "thread-2-1-1.html"])
+        write_thread(sink, "https://x/thread-1-1-1.html", [first], dedup, uncommitted)
+        checkpoint.mark_completed(1, "thread-1-1-1.html")
+        checkpoint.save()
+        # thread-2's line reaches the file, then the run dies before the next save
+        write_thread(sink, "https://x/thread-2-1-1.html", [second], dedup, uncommitted)
+        checkpoint.mark_completed(1, "thread-2-1-1.html")
+        dedup.close()
+        del sink
+        assert output.read_text(encoding="utf-8").splitlines() == [first, second]
+
+        restored = CrawlCheckpoint.load(checkpoint.path)
+        restored.repair_outputs()
+        assert restored.pending_threads() == [(1, ["thread-2-1-1.html"])]
+        with MagnetDedupStore(index_path) as dedup, TextSink(output, append=True) as sink:
+            assert write_thread(sink, "https://x/thread-2-1-1.html", [second], dedup, []) == 1
+        assert output.read_text(encoding="utf-8").splitlines() == [first, second]
+    print("✓ 崩溃后恢复，每个磁力链接只写一次")
+
+
+def test_pipeline_resumes_pending_threads():
+    pipeline = CrawlPipeline(_FakeCrawler(), thread_workers=2, image_workers=1, image_root="unused")
+    events = list(pipeline.run([], resume_threads=[(1, ["thread-2-1-1.html"])]))
+    threads = [event.thread_path for event in events if event.kind == "thread"]
+    assert threads == ["thread-2-1-1.html"]
+    assert [event.page for event in events if event.kind == "page_done"] == [1]
+    print("✓ 流水线直接恢复检查点中的待爬帖子")
+
+
+def test_work_queues_lease_ack_and_requeue():
+    with tempfile.TemporaryDirectory() as tmp:
+        backends = [SQLiteWorkQueue(str(Path(tmp) / "queue.sqlite3")), RedisWorkQueue(LocalRedis())]
+        for queue in backends:
+            assert queue.put("page", {"page": 1}, key="page:1")
+            assert not queue.put("page", {"page": 1}, key="page:1")
+            queue.put("page", {"page": 2}, key="page:2")
+
+            first = queue.lease("w1", lease_seconds=-1)  # expires immediately
+            assert first.payload == {"page": 1}
+            second = queue.lease("w2", lease_seconds=60)
+            assert second.payload == {"page": 1} and second.attempts == 2
+            assert queue.fail(first, "late", max_attempts=1)  # stale: the task is w2's now
+            assert not queue.ack(first) and queue.ack(second)
+
+            third = queue.lease("w1", lease_seconds=60)
+            assert queue.fail(third, "reset", max_attempts=2)
+            assert not queue.fail(queue.lease("w1", lease_seconds=60), "reset", max_attempts=2)
+            assert queue.lease("w1", lease_seconds=60) is None
+
+            queue.push_result({"kind": "thread", "magnets": ["m1"]})
+            queue.push_result({"kind": "thread", "magnets": ["m2"]})
+            assert [r["magnets"] for r in queue.read_results(1)] == [["m1"]]
+            queue.drop_results(1)
+            assert queue.counts() == {"pending": 0, "leased": 0, "done": 1, "failed": 1, "results": 1}
+            queue.mark_closed()
+            assert queue.is_closed()
+            queue.close()
+    print("✓ 共享任务队列支持租约、确认、超时重新入队和结果汇总")
+
+
+def test_worker_reports_failing_tasks():
+    from CrawlSHT import build_parser, crawl_worker
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / "queue.sqlite3")
+        with SQLiteWorkQueue(path) as queue:
+            queue.put("page", {"page": 1}, key="page:1")  # no forum_url: the task raises KeyError
+            queue.mark_closed()
+        args = build_parser().parse_args(["--role", "worker", "--queue", path, "--max-attempts", "2"])
+        crawl_worker(args)
+        with SQLiteWorkQueue(path) as queue:
+            assert queue.counts()["failed"] == 1
+            (record,) = queue.read_results()
+            assert record["kind"] == "error" and record["error"].startswith("KeyError")
+    print("✓ worker 把任意异常记为任务失败，重试耗尽后上报")
+
+
+def test_job_manager_budget_queues_jobs():
+    manager = JobManager(budget=4)
+    release = threading.Event()
+    started = []
+
+    def target(job):
+        started.append(job.job_id)
+        release.wait(5)
+
+    first = manager.submit({"forum_id": "1"}, target, cost=4)
+    second = manager.submit({"forum_id": "2"}, target, cost=2)
+    third = manager.submit({"forum_id": "3"}, target, cost=1)
+    deadline = time.time() + 5
+    while not started and time.time() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.1)
+    assert started == [first.job_id]
+    assert second.snapshot()["state"] == "queued" and manager.budget_in_use() == 4
+
+    assert third.stop()
+    third.thread.join(5)
+    assert third.snapshot()["state"] == "stopped" and third.job_id not in started
+
+    release.set()
+    first.thread.join(5)
+    second.thread.join(5)
+    assert started == [first.job_id, second.job_id]
+    assert first.snapshot()["state"] == "finished" and manager.budget_in_use() == 0
+    assert [job.job_id for job in manager.jobs()] == [third.job_id, second.job_id, first.job_id]
+    print("✓ 任务调度器按并发额度排队运行任务")
+
+
+def test_result_log_pages_by_cursor():
+    log = ResultLog(capacity=3)
+    log.extend(["a", "b"])
+    first = log.page(0, limit=1)
+    assert first["items"] == ["a"] and first["cursor"] == 1
+    assert log.page(first["cursor"])["items"] == ["b"]
+
+    log.extend(["c", "d", "e"])
+    behind = log.page(1)
+    assert behind["truncated"] and behind["items"] == ["c", "d", "e"] and behind["cursor"] == 5
+    assert log.page(5) == {"items": [], "cursor": 5, "start": 2, "end": 5, "truncated": False}
+    print("✓ 结果日志按游标分页且内存占用有上限")
+
+
+def test_output_sinks_batch_and_append():
+    with tempfile.TemporaryDirectory() as tmp:
+        text_path = Path(tmp) / "magnets.txt"
+        jsonl_path = Path(tmp) / "records.jsonl"
+        first = thread_record("https://example.com/t1.html", title="t1", magnets=["m1", "m2"], image_count=3)
+        empty = thread_record("https://example.com/t2.html", title="t2")
+
+        with TextSink(text_path, batch_size=10, flush_interval=60) as text, JsonlSink(jsonl_path, batch_size=10) as jsonl:
+            for record in (first, empty):
+                text.write(record)
+                jsonl.write(record)
+            assert text_path.read_text(encoding="utf-8") == ""  # still buffered
+            text.flush()
+            assert text_path.read_text(encoding="utf-8") == "m1\nm2\n"
+
+        with TextSink(text_path, append=True) as text:
+            text.write(thread_record("https://example.com/t3.html", magnets=["m3"]))
+        assert text_path.read_text(encoding="utf-8") == "m1\nm2\nm3\n"
+
+        rows = [json.loads(line) for line in jsonl_path.read_text(encoding="utf-8").splitlines()]
+        assert [row["thread_url"] for row in rows] == [first["thread_url"], empty["thread_url"]]
+        assert rows[0]["magnets"] == ["m1", "m2"] and rows[0]["image_count"] == 3 and rows[1]["magnets"] == []
+    print("✓ 输出 sink 批量写入，文本格式兼容旧的磁力链接文件")
+
+
+def test_mock_forum_pages_parse():
+    forum = MockForum(pages=2, threads_per_page=5, magnets=2, images=3, filler_posts=2)
+    paths = extract_thread_paths(forum.forum_page(2, 1), "lxml")
+    assert len(paths) == 5 and paths[0] == "thread-10000-1-1.html"
+    assert extract_thread_paths(forum.forum_page(2, 3), "lxml") == []
+    magnets, images, title = parse_thread_html(forum.thread_page(10000), "http://127.0.0.1/thread-10000-1-1.html", "lxml")
+    assert len(magnets) == 2 and len(set(magnets)) == 2
+    assert images[0] == "http://127.0.0.1/data/attachment/10000_0.jpg" and len(images) == 3
+    assert title.get_text() == "磁力合集 10000"
+    print("✓ 基准测试的模拟论坛页面可被正常解析")
+
+
+def test_crawl_metrics_export():
+    metrics = new_crawler_metrics()
+    for seconds in (0.02, 0.03, 0.2, 4.0):
+        metrics.observe_request("thread", 200, seconds)
+    metrics.observe_request("thread", None, 1.0)
+    metrics.observe_bytes("thread", 2048)
+    depth = metrics.add_gauge("crawler_queue_depth", lambda: 7, queue="threads")
+
+    text = metrics.render_prometheus()
+    assert "# TYPE crawler_request_seconds histogram" in text
+    assert 'crawler_request_seconds_bucket{kind="thread",le="0.05"} 2' in text
+    assert 'crawler_request_seconds_bucket{kind="thread",le="+Inf"} 5' in text
+    assert 'crawler_responses_total{kind="thread",status="error"} 1' in text
+    assert 'crawler_response_bytes_total{kind="thread"} 2048' in text
+    assert 'crawler_queue_depth{queue="threads"} 7' in text
+
+    summary = metrics.summary()
+    latency = summary["crawler_request_seconds"]["kind=thread"]
+    assert latency["count"] == 5 and latency["max"] == 4.0 and 0.025 <= latency["p50"] <= 0.25
+    assert summary["crawler_responses_total"]["kind=thread,status=200"] == 4
+    metrics.remove_gauge("crawler_queue_depth", depth)
+    assert "crawler_queue_depth" not in metrics.render_prometheus()
+    print("✓ 爬虫指标可导出为 Prometheus 文本和 JSON 摘要")
+
+
+def test_profiler_records_thread_waterfall():
+    forum = MockForum(pages=1, threads_per_page=2, magnets=1, images=2, filler_posts=1)
+    profiler = CrawlProfiler()
+    with serve(forum) as base_url, tempfile.TemporaryDirectory() as tmpdir:
+        crawler = ForumCrawler(CrawlerConfig(base_url=base_url, rate_limit=0, image_workers=1))
+        crawler.attach_profiler(profiler)
+        details = crawler.fetch_thread_details("thread-10000-1-1.html")
+        saved, _ = crawler.download_images(details.image_urls, tmpdir)
+        with JsonlSink(Path(tmpdir) / "records.jsonl", profiler=profiler) as sink:
+            sink.write(thread_record(details.url, magnets=details.magnets))
+        profiler.export_chrome_trace(Path(tmpdir) / "trace.json")
+        trace = json.loads((Path(tmpdir) / "trace.json").read_text(encoding="utf-8"))
+
+    assert saved == 2 and len(details.magnets) == 1
+    names = [event["name"] for event in trace["traceEvents"] if event["ph"] == "X"]
+    for step in ("thread", "connect", "ttfb", "download", "parse", "extract_magnet_links",
+                 "extract_image_urls", "image", "image_download", "image_write", "write"):
+        assert step in names, step
+    assert names.count("image") == 2
+    thread = next(event for event in trace["traceEvents"] if event["name"] == "thread")
+    parse = next(event for event in trace["traceEvents"] if event["name"] == "parse")
+    assert thread["ts"] <= parse["ts"] and parse["ts"] + parse["dur"] <= thread["ts"] + thread["dur"] + 1
+    summary = profiler.summary()
+    assert summary["steps"]["image"]["count"] == 2
+    assert set(summary["categories"]) >= {"network", "parse", "disk"}
+    print("✓ 性能分析模式记录每个帖子的网络、解析和写盘耗时")
+
+
+def test_iter_forum_streams_and_closes_early():
+    forum = MockForum(pages=200, threads_per_page=5, magnets=1, images=0, filler_posts=0)
+    with serve(forum) as base_url:
+        crawler = ForumCrawler(CrawlerConfig(base_url=base_url, rate_limit=0, concurrency=2))
+        stream = crawler.iter_forum("2", 1, 200)
+        results = [next(stream) for _ in range(7)]
+        stream.close()
+        time.sleep(0.5)
+        listed = crawler.metrics.summary()["crawler_responses_total"]["kind=forum,status=200"]
+
+    assert all(event.kind == "thread" and event.error is None for event in results)
+    assert all(len(event.details.magnets) == 1 for event in results)
+    # pages are listed only as the consumer drains results, not all up front
+    assert listed < 40
+    print("✓ iter_forum 按需翻页并可提前关闭")
+
+
+def test_transport_reuses_connections():
+    with serve(MockForum(pages=1, threads_per_page=12, images=0)) as base_url:
+        base_url = base_url.replace("127.0.0.1", "localhost")
+        crawler = ForumCrawler(CrawlerConfig(base_url=base_url, cookie=None, concurrency=3, rate_limit=0))
+        adapter = crawler.session.get_adapter(base_url)
+        assert sum(1 for _ in crawler.iter_forum("2", 1, 1)) == 12
+        # a cookie update keeps the pools, and a clone with the same transport shares them
+        crawler.update_config(cookie="auth=1")
+        twin = crawler.clone(concurrency=2)
+        assert crawler.session.get_adapter(base_url) is adapter is twin.session.get_adapter(base_url)
+        assert sum(1 for _ in twin.iter_forum("2", 1, 1)) == 12
+        assert crawler.session.headers["Accept-Encoding"].startswith("gzip")
+        # remounting closes the replaced pools, but never the ones a clone borrowed
+        twin.attach_profiler(CrawlProfiler())
+        assert len(adapter.poolmanager.pools) == 1
+        crawler.attach_profiler(CrawlProfiler())
+        assert len(adapter.poolmanager.pools) == 0
+    opened = crawler.metrics.summary()["crawler_connections_opened_total"]["host=localhost"]
+    assert opened <= 3 + 1
+    assert crawler.dns_cache.stats()["misses"] == 1
+    print(f"✓ 26 次请求只新建 {int(opened)} 个连接，DNS 只解析一次")
+
+
+def test_async_crawler_matches_threaded():
+    with serve(MockForum(pages=1, threads_per_page=6, images=2)) as base_url, tempfile.TemporaryDirectory() as tmp:
+        config = CrawlerConfig(base_url=base_url, cookie=None, rate_limit=0, parser_backend="lxml")
+        crawler = ForumCrawler(config)
+        paths = crawler.fetch_thread_paths("2", 1)
+        expected = {path: crawler.fetch_thread_details(path) for path in paths}
+        image_urls = expected[paths[0]].image_urls
+        assert crawler.download_images(image_urls, str(Path(tmp) / "threaded")) == (2, [])
+
+        async def crawl():
+            async with AsyncForumCrawler(config) as async_crawler:
+                async_paths = await async_crawler.fetch_thread_paths("2", 1)
+                found = {
+                    path: details
+                    async for path, details, error in async_crawler.fetch_many_thread_details(async_paths)
+                }
+                saved = await async_crawler.download_images(image_urls, str(Path(tmp) / "async"))
+            return async_paths, found, saved, async_crawler.metrics.summary()
+
+        async_paths, found, saved, metrics = asyncio.run(crawl())
+        assert async_paths == paths
+        assert saved == (2, [])
+        for name in ("crawler_responses_total", "crawler_response_bytes_total"):
+            assert metrics[name] == crawler.metrics.summary()[name]
+
+        def summary(results):
+            return {path: (details.title, details.magnets, details.image_urls) for path, details in results.items()}
+
+        assert summary(found) == summary(expected)
+        for image in (Path(tmp) / "threaded").iterdir():
+            assert (Path(tmp) / "async" / image.name).read_bytes() == image.read_bytes()
+
+        from CrawlSHT import build_parser, crawl_forum_async
+
+        output = Path(tmp) / "async.txt"
+        args = build_parser().parse_args([
+            "--engine", "async", "--forum-id", "2", "--start-page", "1", "--end-page", "1",
+            "--base-url", base_url, "--output", str(output), "--no-dedup", "--delay", "0", "--rate-limit", "0",
+        ])
+        asyncio.run(crawl_forum_async(args))
+        dumped = json.loads(output.with_suffix(".metrics.json").read_text(encoding="utf-8"))
+        assert dumped["counters"]["magnets"] == sum(len(details.magnets) for details in expected.values())
+        assert dumped["metrics"]["crawler_responses_total"] == {"kind=forum,status=200": 1, "kind=thread,status=200": 6}
+    print("✓ asyncio 引擎与线程引擎抓到的磁力链接、图片和请求指标一致")
+
+
 if __name__ == "__main__":
     print("开始执行解析逻辑单元测试...")
     test_extract_thread_paths()
     test_extract_magnet_links()
+    test_parser_backends_agree()
+    test_magnet_dedup_by_info_hash()
+    test_dedup_commits_after_output_flush()
     test_sanitize_name()
+    test_fetch_many_thread_details()
+    test_download_images_parallel()
+    test_image_store_reuses_blobs()
+    test_image_filter_skips_before_download()
+    test_response_cache_revalidation()
+    test_parse_workers_match_inline_parsing()
+    test_rate_limiter_adapts_to_throttling()
+    test_retry_and_circuit_breaker()
+    test_crawl_pipeline_events()
+    test_pipeline_survives_stage_errors()
+    test_incremental_pipeline_stops_on_known_page()
+    test_checkpoint_roundtrip_and_repair()
+    test_resume_after_crash_writes_each_magnet_once()
+    test_pipeline_resumes_pending_threads()
+    test_work_queues_lease_ack_and_requeue()
+    test_worker_reports_failing_tasks()
+    test_job_manager_budget_queues_jobs()
+    test_result_log_pages_by_cursor()
+    test_output_sinks_batch_and_append()
+    test_mock_forum_pages_parse()
+    test_crawl_metrics_export()
+    test_profiler_records_thread_waterfall()
+    test_iter_forum_streams_and_closes_early()
+    test_transport_reuses_connections()
+    test_async_crawler_matches_threaded()
     print("全部测试通过 ✅")
@@ -0,0 +1,89 @@
+"""Persistent SQLite index of crawled threads, used by incremental crawls."""
+
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Iterable, List, Sequence
+
+DEFAULT_INDEX_PATH = "data/thread_index.sqlite3"
+
+
+class ThreadIndex:
+    """Record every crawled thread path with its magnets and crawl timestamp.
+
+    Paths are the ``normalize_thread_path`` form, so the same thread found via
+    different links maps to one row. The connection is shared between
+    threads behind a lock.
+    """
+
+    def __init__(self, path: str = DEFAULT_INDEX_PATH):
+        self.path = path
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS threads ("
+            " path TEXT PRIMARY KEY,"
+            " magnets TEXT NOT NULL,"
+            " crawled_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def __enter__(self) -> "ThreadIndex":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def __contains__(self, thread_path: str) -> bool:
+        return bool(self.known([thread_path]))
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM threads").fetchone()[0]
+
+    def known(self, thread_paths: Iterable[str]) -> set[str]:
+        """Return the subset of thread_paths that is already indexed."""
+        paths = list(thread_paths)
+        found: set[str] = set()
+        with self._lock:
+            # stay well below SQLite's bound-parameter limit
+            for start in range(0, len(paths), 500):
+                chunk = paths[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT path FROM threads WHERE path IN ({placeholders})", chunk
+                )
+                found.update(row[0] for row in rows)
+        return found
+
+    def unknown(self, thread_paths: Sequence[str]) -> List[str]:
+        """Return thread_paths minus the indexed ones, keeping the original order."""
+        known = self.known(thread_paths)
+        return [path for path in thread_paths if path not in known]
+
+    def record(self, thread_path: str, magnets: Sequence[str]) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO threads (path, magnets, crawled_at) VALUES (?, ?, ?)",
+                (thread_path, json.dumps(list(magnets), ensure_ascii=False), time.time()),
+            )
+            self._conn.commit()
+
+    def magnets(self, thread_path: str) -> List[str] | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT magnets FROM threads WHERE path = ?", (thread_path,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+
+__all__ = ["DEFAULT_INDEX_PATH", "ThreadIndex"]
@@ -0,0 +1,498 @@
+"""Shared task queue for distributed crawls: leases, acks, and re-queueing on timeout.
+
+Two backends implement the same interface:
+
+* ``SQLiteWorkQueue`` keeps everything in one SQLite file. Any number of
+  worker processes on the same machine (or sharing a local disk) can use it.
+* ``RedisWorkQueue`` uses a small subset of Redis commands so workers on
+  several hosts can share one server. ``LocalRedis`` is an in-process
+  stand-in for that subset, used for tests and single-process runs.
+
+``open_work_queue`` picks a backend from a URL: ``redis://host:6379/0``,
+``memory://``, or a SQLite file path (optionally ``sqlite:///path``).
+"""
+
+from __future__ import annotations
+
+import json
+import sqlite3
+from abc import ABC, abstractmethod
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List
+
+try:  # optional dependency, only needed for redis:// queues
+    import redis
+except ImportError:  # pragma: no cover - depends on the environment
+    redis = None
+
+DEFAULT_QUEUE_PATH = "data/work_queue.sqlite3"
+
+
+@dataclass
+class Lease:
+    """A task handed to one worker until ``expires`` (wall-clock seconds)."""
+
+    task_id: str
+    kind: str
+    payload: dict
+    attempts: int
+    token: str
+    expires: float
+
+
+class WorkQueue(ABC):
+    """Interface shared by the queue backends.
+
+    Tasks are ``(kind, payload)`` pairs; ``key`` de-duplicates them, so the
+    same forum page or thread is queued only once per sweep. A leased task
+    that is neither acked nor failed before its lease expires goes back to
+    the pending tasks. Workers push small result records that the
+    coordinator reads with ``read_results`` and removes with
+    ``drop_results`` once they are merged.
+    """
+
+    @abstractmethod
+    def put(self, kind: str, payload: dict, key: str | None = None) -> bool:
+        """Queue a task; returns False when a task with the same key already exists."""
+
+    @abstractmethod
+    def lease(self, worker_id: str, lease_seconds: float) -> Lease | None:
+        """Hand the oldest pending task to worker_id for lease_seconds; None when nothing is pending."""
+
+    @abstractmethod
+    def ack(self, lease: Lease) -> bool:
+        """Mark a leased task done; False when the lease had already expired."""
+
+    @abstractmethod
+    def fail(self, lease: Lease, error: str, max_attempts: int) -> bool:
+        """Give a failed task back; returns True if it was re-queued, False if given up.
+
+        A lease that had already expired changes nothing (the task went back
+        to the queue on its own) and counts as re-queued.
+        """
+
+    @abstractmethod
+    def requeue_expired(self) -> int:
+        """Put tasks whose lease expired back in the queue; returns how many."""
+
+    @abstractmethod
+    def push_result(self, record: dict) -> None:
+        """Append a worker's result record for the coordinator."""
+
+    @abstractmethod
+    def read_results(self, limit: int = 100) -> List[dict]:
+        """The first limit result records, oldest first, without removing them."""
+
+    @abstractmethod
+    def drop_results(self, count: int) -> None:
+        """Remove the first count results, after read_results returned them."""
+
+    @abstractmethod
+    def counts(self) -> Dict[str, int]:
+        """Number of ``pending``, ``leased``, ``done``, and ``failed`` tasks and queued ``results``."""
+
+    @abstractmethod
+    def mark_closed(self, closed: bool = True) -> None:
+        """Tell workers the sweep is finished (or, with False, that a new one started)."""
+
+    @abstractmethod
+    def is_closed(self) -> bool:
+        """True once the coordinator marked the sweep finished."""
+
+    @abstractmethod
+    def reset(self) -> None:
+        """Drop all tasks and results, e.g. before a new sweep."""
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self) -> "WorkQueue":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class SQLiteWorkQueue(WorkQueue):
+    """WorkQueue in a SQLite file; leasing is one ``BEGIN IMMEDIATE`` transaction."""
+
+    def __init__(self, path: str = DEFAULT_QUEUE_PATH):
+        self.path = path
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        # autocommit mode: transactions are opened explicitly where needed
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS tasks ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " key TEXT UNIQUE,"
+            " kind TEXT NOT NULL,"
+            " payload TEXT NOT NULL,"
+            " state TEXT NOT NULL DEFAULT 'pending',"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " lease_token TEXT,"
+            " lease_owner TEXT,"
+            " lease_expires REAL,"
+            " error TEXT);"
+            "CREATE INDEX IF NOT EXISTS tasks_state ON tasks (state, id);"
+            "CREATE TABLE IF NOT EXISTS results ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " payload TEXT NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL);"
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def put(self, kind: str, payload: dict, key: str | None = None) -> bool:
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO tasks (key, kind, payload) VALUES (?, ?, ?)",
+                (key, kind, json.dumps(payload, ensure_ascii=False)),
+            )
+            return cursor.rowcount == 1
+
+    def lease(self, worker_id: str, lease_seconds: float) -> Lease | None:
+        now = time.time()
+        token = uuid.uuid4().hex
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._requeue_expired(now)
+                row = self._conn.execute(
+                    "SELECT id, kind, payload, attempts FROM tasks WHERE state = 'pending' ORDER BY id LIMIT 1"
+                ).fetchone()
+                if row is None:
+                    self._conn.execute("COMMIT")
+                    return None
+                self._conn.execute(
+                    "UPDATE tasks SET state = 'leased', attempts = attempts + 1, lease_token = ?,"
+                    " lease_owner = ?, lease_expires = ? WHERE id = ?",
+                    (token, worker_id, now + lease_seconds, row[0]),
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return Lease(str(row[0]), row[1], json.loads(row[2]), row[3] + 1, token, now + lease_seconds)
+
+    def ack(self, lease: Lease) -> bool:
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE tasks SET state = 'done', lease_token = NULL WHERE id = ? AND lease_token = ?",
+                (int(lease.task_id), lease.token),
+            )
+            return cursor.rowcount == 1
+
+    def fail(self, lease: Lease, error: str, max_attempts: int) -> bool:
+        requeue = lease.attempts < max_attempts
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE tasks SET state = ?, lease_token = NULL, error = ? WHERE id = ? AND lease_token = ?",
+                ("pending" if requeue else "failed", error, int(lease.task_id), lease.token),
+            )
+        if cursor.rowcount == 0:
+            return True  # already re-queued by a lease timeout
+        return requeue
+
+    def _requeue_expired(self, now: float) -> int:
+        cursor = self._conn.execute(
+            "UPDATE tasks SET state = 'pending', lease_token = NULL"
+            " WHERE state = 'leased' AND lease_expires < ?",
+            (now,),
+        )
+        return cursor.rowcount
+
+    def requeue_expired(self) -> int:
+        with self._lock:
+            return self._requeue_expired(time.time())
+
+    def push_result(self, record: dict) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO results (payload) VALUES (?)", (json.dumps(record, ensure_ascii=False),)
+            )
+
+    def read_results(self, limit: int = 100) -> List[dict]:
+        with self._lock:
+            rows = self._conn.execute("SELECT payload FROM results ORDER BY id LIMIT ?", (limit,)).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def drop_results(self, count: int) -> None:
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM results WHERE id IN (SELECT id FROM results ORDER BY id LIMIT ?)", (count,)
+            )
+
+    def counts(self) -> Dict[str, int]:
+        counts = {"pending": 0, "leased": 0, "done": 0, "failed": 0}
+        with self._lock:
+            for state, number in self._conn.execute("SELECT state, COUNT(*) FROM tasks GROUP BY state"):
+                counts[state] = number
+            counts["results"] = self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        return counts
+
+    def mark_closed(self, closed: bool = True) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta (name, value) VALUES ('closed', ?)", ("1" if closed else "0",)
+            )
+
+    def is_closed(self) -> bool:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE name = 'closed'").fetchone()
+        return row is not None and row[0] == "1"
+
+    def reset(self) -> None:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.execute("DELETE FROM tasks")
+            self._conn.execute("DELETE FROM results")
+            self._conn.execute("DELETE FROM meta")
+            self._conn.execute("COMMIT")
+
+
+class RedisWorkQueue(WorkQueue):
+    """WorkQueue on Redis lists, hashes, a set, and a sorted set of lease expiries.
+
+    Only plain commands are used (no Lua, no MULTI), so ``LocalRedis`` or
+    any Redis-compatible server can back it. ``client`` must return str
+    values, e.g. ``redis.Redis(decode_responses=True)``. A worker that
+    dies between popping a task and recording its lease loses that task;
+    the window is two round trips.
+    """
+
+    def __init__(self, client, prefix: str = "crawl"):
+        self.client = client
+        self.prefix = prefix
+
+    def _key(self, name: str) -> str:
+        return f"{self.prefix}:{name}"
+
+    def put(self, kind: str, payload: dict, key: str | None = None) -> bool:
+        if key is not None and not self.client.sadd(self._key("seen"), key):
+            return False
+        task_id = str(self.client.incr(self._key("seq")))
+        task = {"kind": kind, "payload": payload, "attempts": 0}
+        self.client.hset(self._key("tasks"), task_id, json.dumps(task, ensure_ascii=False))
+        self.client.lpush(self._key("pending"), task_id)
+        return True
+
+    def lease(self, worker_id: str, lease_seconds: float) -> Lease | None:
+        self.requeue_expired()
+        task_id = self.client.rpop(self._key("pending"))
+        if task_id is None:
+            return None
+        raw = self.client.hget(self._key("tasks"), task_id)
+        if raw is None:  # reset while queued
+            return None
+        task = json.loads(raw)
+        task["attempts"] += 1
+        token = uuid.uuid4().hex
+        expires = time.time() + lease_seconds
+        self.client.hset(self._key("tasks"), task_id, json.dumps(task, ensure_ascii=False))
+        self.client.hset(self._key("tokens"), task_id, token)
+        self.client.zadd(self._key("leased"), {task_id: expires})
+        return Lease(task_id, task["kind"], task["payload"], task["attempts"], token, expires)
+
+    def _release(self, lease: Lease) -> bool:
+        if self.client.hget(self._key("tokens"), lease.task_id) != lease.token:
+            return False
+        self.client.hdel(self._key("tokens"), lease.task_id)
+        return bool(self.client.zrem(self._key("leased"), lease.task_id))
+
+    def ack(self, lease: Lease) -> bool:
+        if not self._release(lease):
+            return False
+        self.client.hdel(self._key("tasks"), lease.task_id)
+        self.client.hincrby(self._key("stats"), "done", 1)
+        return True
+
+    def fail(self, lease: Lease, error: str, max_attempts: int) -> bool:
+        if not self._release(lease):
+            return True  # already re-queued by a lease timeout
+        if lease.attempts < max_attempts:
+            self.client.lpush(self._key("pending"), lease.task_id)
+            return True
+        self.client.hdel(self._key("tasks"), lease.task_id)
+        self.client.hincrby(self._key("stats"), "failed", 1)
+        return False
+
+    def requeue_expired(self) -> int:
+        requeued = 0
+        for task_id in self.client.zrangebyscore(self._key("leased"), "-inf", time.time()):
+            # zrem succeeds for exactly one caller, so each task is re-queued once
+            if self.client.zrem(self._key("leased"), task_id):
+                self.client.hdel(self._key("tokens"), task_id)
+                self.client.rpush(self._key("pending"), task_id)
+                requeued += 1
+        return requeued
+
+    def push_result(self, record: dict) -> None:
+        self.client.rpush(self._key("results"), json.dumps(record, ensure_ascii=False))
+
+    def read_results(self, limit: int = 100) -> List[dict]:
+        return [json.loads(item) for item in self.client.lrange(self._key("results"), 0, limit - 1)]
+
+    def drop_results(self, count: int) -> None:
+        if count > 0:
+            self.client.ltrim(self._key("results"), count, -1)
+
+    def counts(self) -> Dict[str, int]:
+        stats = self.client.hgetall(self._key("stats")) or {}
+        return {
+            "pending": self.client.llen(self._key("pending")),
+            "leased": self.client.zcard(self._key("leased")),
+            "done": int(stats.get("done", 0)),
+            "failed": int(stats.get("failed", 0)),
+            "results": self.client.llen(self._key("results")),
+        }
+
+    def mark_closed(self, closed: bool = True) -> None:
+        self.client.set(self._key("closed"), "1" if closed else "0")
+
+    def is_closed(self) -> bool:
+        return self.client.get(self._key("closed")) == "1"
+
+    def reset(self) -> None:
+        names = ("seen", "seq", "tasks", "pending", "tokens", "leased", "results", "stats", "closed")
+        self.client.delete(*(self._key(name) for name in names))
+
+
+class LocalRedis:
+    """Thread-safe in-memory stand-in for the Redis commands RedisWorkQueue uses."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data: dict = {}
+
+    def _get(self, key: str, factory):
+        value = self._data.get(key)
+        if value is None:
+            value = self._data[key] = factory()
+        return value
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            value = int(self._data.get(key, 0)) + 1
+            self._data[key] = str(value)
+            return value
+
+    def get(self, key: str):
+        with self._lock:
+            return self._data.get(key)
+
+    def set(self, key: str, value: str) -> None:
+        with self._lock:
+            self._data[key] = value
+
+    def delete(self, *keys: str) -> int:
+        with self._lock:
+            return sum(self._data.pop(key, None) is not None for key in keys)
+
+    def sadd(self, key: str, member: str) -> int:
+        with self._lock:
+            members = self._get(key, set)
+            if member in members:
+                return 0
+            members.add(member)
+            return 1
+
+    def hset(self, key: str, field: str, value: str) -> None:
+        with self._lock:
+            self._get(key, dict)[field] = value
+
+    def hget(self, key: str, field: str):
+        with self._lock:
+            return self._data.get(key, {}).get(field)
+
+    def hgetall(self, key: str) -> dict:
+        with self._lock:
+            return dict(self._data.get(key, {}))
+
+    def hdel(self, key: str, field: str) -> int:
+        with self._lock:
+            return int(self._data.get(key, {}).pop(field, None) is not None)
+
+    def hincrby(self, key: str, field: str, amount: int) -> int:
+        with self._lock:
+            fields = self._get(key, dict)
+            fields[field] = str(int(fields.get(field, 0)) + amount)
+            return int(fields[field])
+
+    def lpush(self, key: str, value: str) -> None:
+        with self._lock:
+            self._get(key, list).insert(0, value)
+
+    def rpush(self, key: str, value: str) -> None:
+        with self._lock:
+            self._get(key, list).append(value)
+
+    def rpop(self, key: str):
+        with self._lock:
+            items = self._data.get(key)
+            return items.pop() if items else None
+
+    def lrange(self, key: str, start: int, end: int) -> list:
+        with self._lock:
+            items = self._data.get(key, [])
+            return list(items[start:] if end == -1 else items[start:end + 1])
+
+    def ltrim(self, key: str, start: int, end: int) -> None:
+        with self._lock:
+            items = self._data.get(key, [])
+            self._data[key] = items[start:] if end == -1 else items[start:end + 1]
+
+    def llen(self, key: str) -> int:
+        with self._lock:
+            return len(self._data.get(key, []))
+
+    def zadd(self, key: str, mapping: Dict[str, float]) -> None:
+        with self._lock:
+            self._get(key, dict).update(mapping)
+
+    def zrem(self, key: str, member: str) -> int:
+        with self._lock:
+            return int(self._data.get(key, {}).pop(member, None) is not None)
+
+    def zrangebyscore(self, key: str, low, high) -> list:
+        low = float(low)
+        high = float(high)
+        with self._lock:
+            scores = self._data.get(key, {})
+            ordered = sorted(scores.items(), key=lambda item: item[1])
+            return [member for member, score in ordered if low <= score <= high]
+
+    def zcard(self, key: str) -> int:
+        with self._lock:
+            return len(self._data.get(key, {}))
+
+
+def open_work_queue(url: str = DEFAULT_QUEUE_PATH) -> WorkQueue:
+    """Open a queue from ``redis://...``, ``memory://``, ``sqlite:///path``, or a plain path."""
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        if redis is None:
+            raise RuntimeError("redis:// queues require the redis package: pip install redis")
+        return RedisWorkQueue(redis.Redis.from_url(url, decode_responses=True))
+    if url.startswith("memory://"):
+        return RedisWorkQueue(LocalRedis())
+    if url.startswith("sqlite:///"):
+        url = url[len("sqlite:///"):]
+    return SQLiteWorkQueue(url)
+
+
+__all__ = [
+    "DEFAULT_QUEUE_PATH",
+    "Lease",
+    "LocalRedis",
+    "RedisWorkQueue",
+    "SQLiteWorkQueue",
+    "WorkQueue",
+    "open_work_queue",
+]